@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any
+
+DEFAULT_TARGET = "valutatrade_hub.cli.interface"
+
+# Модули, которые не должны загружаться при старте CLI: они нужны только отдельным командам.
+DEFAULT_FORBIDDEN = (
+    "requests",
+    "prettytable",
+    "sqlite3",
+    "valutatrade_hub.core.usecases",
+    "valutatrade_hub.parser_service",
+)
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """Строки `-X importtime` -> {модуль: (собственное время, накопленное время), мкс}."""
+    result: dict[str, tuple[int, int]] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        result[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return result
+
+
+def measure(target: str, runs: int) -> dict[str, tuple[float, float]]:
+    """Медиана по runs запускам чистого интерпретатора: {модуль: (self, cumulative)}, мкс."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    samples: dict[str, list[tuple[int, int]]] = {}
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+            capture_output=True,
+            text=True,
+            env=env,
+            check=True,
+        )
+        for module, times in parse_importtime(proc.stderr).items():
+            samples.setdefault(module, []).append(times)
+    return {
+        module: (statistics.median(t[0] for t in values), statistics.median(t[1] for t in values))
+        for module, values in samples.items()
+    }
+
+
+def check_budget(
+    timings: dict[str, tuple[float, float]],
+    target: str,
+    budget_ms: float,
+    forbidden: tuple[str, ...],
+) -> list[str]:
+    """Нарушения: накопленное время target больше бюджета или загружен запрещённый модуль."""
+    problems = []
+    total_ms = timings.get(target, (0.0, 0.0))[1] / 1000
+    if total_ms > budget_ms:
+        problems.append(f"{target}: {total_ms:.1f} ms > бюджета {budget_ms:.1f} ms")
+    for module in sorted(timings):
+        if any(module == name or module.startswith(name + ".") for name in forbidden):
+            problems.append(f"при старте загружен {module} ({timings[module][1] / 1000:.1f} ms)")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Бюджет времени импорта CLI (python -X importtime)")
+    parser.add_argument("--target", default=DEFAULT_TARGET)
+    parser.add_argument("--budget-ms", type=float, default=25.0, help="накопленное время импорта target, мс")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="сколько самых дорогих модулей показать")
+    parser.add_argument("--forbid", nargs="*", default=list(DEFAULT_FORBIDDEN))
+    args = parser.parse_args(argv)
+
+    timings = measure(args.target, args.runs)
+    # накопленное время считаем только для модулей, загруженных ради target (без site и .pth)
+    own: dict[str, Any] = {m: t for m, t in timings.items() if m == args.target or m.startswith("valutatrade_hub")}
+
+    print(f"{args.target}: {timings.get(args.target, (0, 0))[1] / 1000:.1f} ms (медиана {args.runs} запусков)")
+    print(f"  {'module':<48} {'self, ms':>9} {'cum, ms':>9}")
+    for module, (self_us, cum_us) in sorted(timings.items(), key=lambda x: -x[1][0])[: args.top]:
+        print(f"  {module:<48} {self_us / 1000:>9.2f} {cum_us / 1000:>9.2f}")
+    print(f"Модулей проекта: {len(own)}")
+
+    problems = check_budget(timings, args.target, args.budget_ms, tuple(args.forbid))
+    if problems:
+        print("Бюджет нарушен:")
+        for line in problems:
+            print(f"  {line}")
+        raise SystemExit(1)
+    print(f"Бюджет соблюдён ({args.budget_ms:.1f} ms, запрещённых модулей нет).")
+
+
+if __name__ == "__main__":
+    main()
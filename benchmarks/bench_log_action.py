@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import argparse
+import inspect
+import logging
+import os
+import queue
+import tempfile
+import time
+from functools import wraps
+from logging.handlers import QueueListener, RotatingFileHandler
+from typing import Any, Callable
+
+from valutatrade_hub.core.utils import now_iso
+from valutatrade_hub.decorators import log_action
+from valutatrade_hub.logging_config import _InProcessQueueHandler, _IsoFormatter
+
+
+def legacy_log_action(action: str, verbose: bool = False) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Прежняя версия декоратора: signature() и now_iso() на каждый вызов."""
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            logger = logging.getLogger("valutatrade")
+            ts = now_iso()
+            data = inspect.signature(func).bind_partial(*args, **kwargs).arguments
+            user = data.get("username", data.get("user_id"))
+            currency = data.get("currency", data.get("currency_code"))
+            if currency is None and "from_currency" in data and "to_currency" in data:
+                currency = f"{data['from_currency']}->{data['to_currency']}"
+            result = func(*args, **kwargs)
+            logger.info(
+                f"{ts} {action} user='{user}' currency='{currency}' amount={data.get('amount')} "
+                f"rate={data.get('rate')} base='{data.get('base')}' result=OK"
+            )
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _target(from_currency: str, to_currency: str, max_age_seconds: int | None = None) -> int:
+    return 1
+
+
+def _per_call_us(func: Callable[..., Any], calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        func("BTC", "USD")
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Накладные расходы log_action на вызов")
+    parser.add_argument("--calls", type=int, default=50_000)
+    args = parser.parse_args(argv)
+
+    logger = logging.getLogger("valutatrade")
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    fmt = _IsoFormatter("%(levelname)s %(asctime)s %(message)s")
+
+    with tempfile.TemporaryDirectory() as root:
+        bare = _per_call_us(_target, args.calls)
+
+        sync_handler = RotatingFileHandler(os.path.join(root, "before.log"), maxBytes=200_000, backupCount=3)
+        sync_handler.setFormatter(fmt)
+        logger.handlers = [sync_handler]
+        before = _per_call_us(legacy_log_action("GET_RATE")(_target), args.calls)
+        sync_handler.close()
+
+        file_handler = RotatingFileHandler(os.path.join(root, "after.log"), maxBytes=200_000, backupCount=3)
+        file_handler.setFormatter(fmt)
+        log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+        listener = QueueListener(log_queue, file_handler)
+        logger.handlers = [_InProcessQueueHandler(log_queue)]
+        listener.start()
+        after = _per_call_us(log_action("GET_RATE")(_target), args.calls)
+        listener.stop()
+        file_handler.close()
+        logger.handlers = []
+
+    print(f"{'variant':<32} {'us/call':>10}")
+    print(f"{'undecorated':<32} {bare:>10.2f}")
+    print(f"{'before (sync file handler)':<32} {before - bare:>10.2f}")
+    print(f"{'after (plan + queue listener)':<32} {after - bare:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from typing import Any
+
+from valutatrade_hub.infra.database import make_store
+
+
+class _BenchSettings:
+    """Настройки, указывающие во временный каталог."""
+
+    def __init__(self, root: str, shards: int) -> None:
+        self._data = {
+            "USERS_PATH": f"{root}/users.json",
+            "USERS_SEQ_PATH": f"{root}/users.seq",
+            "PORTFOLIOS_PATH": f"{root}/portfolios.json",
+            "PORTFOLIOS_SHARD_DIR": f"{root}/portfolios",
+            "PORTFOLIO_SHARDS": shards,
+            "RATES_PATH": f"{root}/rates.json",
+        }
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+
+def _make_portfolios(count: int, rnd: random.Random) -> list[dict[str, Any]]:
+    codes = ["USD", "EUR", "RUB", "BTC", "ETH"]
+    return [
+        {
+            "user_id": uid,
+            "wallets": {
+                code: {"balance": round(rnd.uniform(0, 10_000), 4)}
+                for code in rnd.sample(codes, rnd.randint(1, len(codes)))
+            },
+        }
+        for uid in range(1, count + 1)
+    ]
+
+
+def bench_layout(backend: str, count: int, ops: int, shards: int, seed: int = 42) -> dict[str, float]:
+    rnd = random.Random(seed)
+    with tempfile.TemporaryDirectory() as root:
+        store = make_store(_BenchSettings(root, shards), backend)
+        store.write_portfolios(_make_portfolios(count, rnd))
+
+        user_ids = [rnd.randint(1, count) for _ in range(ops)]
+        start = time.perf_counter()
+        for uid in user_ids:
+            wallets = store.read_portfolio(uid) or {}
+            wallets["USD"] = {"balance": rnd.uniform(0, 10_000)}
+            store.write_portfolio(uid, wallets)
+        elapsed = time.perf_counter() - start
+
+    return {"per_trade_ms": elapsed / ops * 1000, "total_s": elapsed}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Сравнение раскладки портфелей: один файл vs корзины")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--ops", type=int, default=20)
+    parser.add_argument("--shards", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    print(f"{'portfolios':>10} {'layout':>8} {'ms/trade':>10}")
+    for size in args.sizes:
+        for backend in ("json", "sharded"):
+            res = bench_layout(backend, size, args.ops, args.shards)
+            print(f"{size:>10} {backend:>8} {res['per_trade_ms']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
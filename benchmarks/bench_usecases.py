@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable
+
+from benchmarks.datagen import BASE_RATES, BENCH_PASSWORD, DataSpec, generate
+
+
+class _StubClient:
+    """Локальный источник курсов: без сети, каждый вызов — новый timestamp."""
+
+    def __init__(self, name: str, pairs: list[str], latency: float) -> None:
+        self.name = name
+        self.not_modified = False
+        self._pairs = pairs
+        self._latency = latency
+        self._calls = 0
+        self._rnd = random.Random(name)
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, dict[str, Any]]:
+        if self._latency:
+            time.sleep(self._latency)
+        self._calls += 1
+        ts = (datetime.now(timezone.utc) + timedelta(seconds=self._calls)).replace(microsecond=0)
+        stamp = ts.isoformat().replace("+00:00", "Z")
+        return {
+            pair: {
+                "rate": BASE_RATES[pair] * (1 + self._rnd.gauss(0, 0.001)),
+                "updated_at": stamp,
+                "source": self.name,
+                "meta": {"request_ms": int(self._latency * 1000), "status_code": 200},
+            }
+            for pair in self._pairs
+        }
+
+
+def _reset_singletons() -> None:
+    """Новый набор данных — новые синглтоны (они держат пути и снимки предыдущего каталога)."""
+    from valutatrade_hub.infra.database import DatabaseManager
+    from valutatrade_hub.infra.metrics import MetricsRegistry
+    from valutatrade_hub.infra.rates_cache import RatesCache
+    from valutatrade_hub.infra.settings import SettingsLoader
+
+    for cls in (SettingsLoader, DatabaseManager, RatesCache, MetricsRegistry):
+        cls._instance = None
+
+
+def _stats(samples: list[float]) -> dict[str, float]:
+    ms = [s * 1000 for s in samples]
+    cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {
+        "n": len(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p50_ms": cuts[49],
+        "p90_ms": cuts[89],
+        "p99_ms": cuts[98],
+        "max_ms": max(ms),
+    }
+
+
+def _measure(calls: list[Callable[[], Any]]) -> dict[str, float]:
+    samples = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return _stats(samples)
+
+
+def _prepare_backend(backend: str) -> None:
+    from valutatrade_hub.infra.migrate import migrate_json_to_sharded, migrate_json_to_sqlite
+
+    if backend == "sqlite":
+        migrate_json_to_sqlite()
+    elif backend == "sharded":
+        migrate_json_to_sharded()
+
+
+def bench_scale(spec: DataSpec, backend: str, iterations: int, update_runs: int, latency: float) -> dict[str, Any]:
+    """Генерирует данные во временном каталоге и замеряет сценарии на них."""
+    rnd = random.Random(spec.seed)
+    cwd = os.getcwd()
+    previous_backend = os.environ.get("VALUTATRADE_STORAGE_BACKEND")
+
+    with tempfile.TemporaryDirectory() as root:
+        gen_start = time.perf_counter()
+        counts = generate(root, spec)
+        gen_seconds = time.perf_counter() - gen_start
+
+        os.chdir(root)
+        os.environ["VALUTATRADE_STORAGE_BACKEND"] = backend
+        try:
+            _reset_singletons()
+            _prepare_backend(backend)
+
+            from valutatrade_hub.core import usecases
+            from valutatrade_hub.parser_service.storage import RatesStorage
+            from valutatrade_hub.parser_service.updater import RatesUpdater
+
+            user_ids = [rnd.randint(1, spec.users) for _ in range(iterations)]
+            pairs = [rnd.sample(["USD", "EUR", "RUB", "BTC", "ETH"], 2) for _ in range(iterations)]
+            results: dict[str, Any] = {}
+
+            results["register_user"] = _measure(
+                [lambda i=i: usecases.register_user(f"bench{i}", BENCH_PASSWORD) for i in range(iterations)]
+            )
+            results["login_user"] = _measure(
+                [lambda uid=uid: usecases.login_user(f"user{uid}", BENCH_PASSWORD) for uid in user_ids]
+            )
+            results["get_rate"] = _measure([lambda p=p: usecases.get_rate(p[0], p[1]) for p in pairs])
+            results["show_portfolio"] = _measure([lambda uid=uid: usecases.show_portfolio(uid) for uid in user_ids])
+            results["buy_currency"] = _measure(
+                [lambda uid=uid: usecases.buy_currency(uid, "BTC", 0.001) for uid in user_ids]
+            )
+            results["sell_currency"] = _measure(
+                [lambda uid=uid: usecases.sell_currency(uid, "BTC", 0.0005) for uid in user_ids]
+            )
+
+            crypto = [p for p in BASE_RATES if p.split("_")[0] in {"BTC", "ETH", "SOL"}]
+            fiat = [p for p in BASE_RATES if p not in crypto]
+            updater = RatesUpdater(
+                [_StubClient("stub-crypto", crypto, latency), _StubClient("stub-fiat", fiat, latency)],
+                RatesStorage(),
+            )
+            results["run_update_cold"] = _measure([updater.run_update])
+            results["run_update"] = _measure([updater.run_update for _ in range(update_runs)])
+        finally:
+            os.chdir(cwd)
+            if previous_backend is None:
+                os.environ.pop("VALUTATRADE_STORAGE_BACKEND", None)
+            else:
+                os.environ["VALUTATRADE_STORAGE_BACKEND"] = previous_backend
+            _reset_singletons()
+
+    return {"data": counts, "generate_s": gen_seconds, "ops": results}
+
+
+def check_regressions(
+    current: dict[str, Any],
+    baseline: dict[str, Any],
+    threshold: float,
+    metric: str,
+) -> list[str]:
+    """Операции, у которых metric вырос больше чем на threshold (доля) относительно baseline."""
+    problems = []
+    for scale, data in current["scales"].items():
+        base_ops = baseline.get("scales", {}).get(scale, {}).get("ops", {})
+        for op, stats in data["ops"].items():
+            old = base_ops.get(op, {}).get(metric)
+            new = stats.get(metric)
+            if old is None or new is None or old <= 0:
+                continue
+            if new > old * (1 + threshold):
+                problems.append(f"{scale} {op}: {metric} {old:.3f} -> {new:.3f} ms (+{(new / old - 1) * 100:.0f}%)")
+    return problems
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк сценариев на синтетических данных")
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000])
+    parser.add_argument("--history-days", type=int, default=30)
+    parser.add_argument("--history-step", type=int, default=60, help="шаг истории, минуты")
+    parser.add_argument("--backend", choices=("json", "sharded", "sqlite"), default="json")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--update-runs", type=int, default=20)
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="задержка stub-клиентов, с")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="JSON прошлого запуска для проверки регрессий")
+    parser.add_argument("--threshold", type=float, default=0.25, help="допустимый рост, доля (0.25 = 25%%)")
+    parser.add_argument("--metric", default="p50_ms", choices=("mean_ms", "p50_ms", "p90_ms", "p99_ms"))
+    args = parser.parse_args(argv)
+
+    output = os.path.abspath(args.output)
+    report: dict[str, Any] = {
+        "created_at": datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "params": vars(args),
+        "scales": {},
+    }
+
+    for users in args.users:
+        spec = DataSpec(users, args.history_days, args.history_step)
+        res = bench_scale(spec, args.backend, args.iterations, args.update_runs, args.stub_latency)
+        report["scales"][str(users)] = res
+
+        print(f"users={users} history={res['data']['history']} (генерация {res['generate_s']:.1f} с)")
+        print(f"  {'op':<16} {'p50, ms':>10} {'p99, ms':>10} {'mean, ms':>10}")
+        for op, st in res["ops"].items():
+            print(f"  {op:<16} {st['p50_ms']:>10.3f} {st['p99_ms']:>10.3f} {st['mean_ms']:>10.3f}")
+
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Результаты: {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = check_regressions(report, baseline, args.threshold, args.metric)
+        if problems:
+            print("Регрессии:")
+            for line in problems:
+                print(f"  {line}")
+            raise SystemExit(1)
+        print(f"Регрессий нет (порог {args.threshold:.0%} по {args.metric}).")
+
+
+if __name__ == "__main__":
+    main()
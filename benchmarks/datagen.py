@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable
+
+from valutatrade_hub.core.utils import hash_password
+
+BENCH_PASSWORD = "bench-pass"
+
+BASE_RATES: dict[str, float] = {
+    "EUR_USD": 1.08,
+    "RUB_USD": 0.011,
+    "GBP_USD": 1.27,
+    "BTC_USD": 60_000.0,
+    "ETH_USD": 3_000.0,
+    "SOL_USD": 150.0,
+}
+
+WALLET_CODES = ("USD", "EUR", "RUB", "BTC", "ETH")
+
+
+@dataclass
+class DataSpec:
+    """Размер синтетического набора данных."""
+
+    users: int = 1_000
+    history_days: int = 365
+    history_step_minutes: int = 60
+    seed: int = 42
+
+
+def _iso(dt: datetime) -> str:
+    return dt.replace(microsecond=0).isoformat().replace("+00:00", "Z")
+
+
+def _write_array(path: str, items: Iterable[Any]) -> int:
+    """Потоковая запись JSON-массива в формате save_json (indent=2), без сборки списка в памяти."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for item in items:
+            block = json.dumps(item, ensure_ascii=False, indent=2)
+            f.write(("\n" if count == 0 else ",\n") + "\n".join(f"  {line}" for line in block.splitlines()))
+            count += 1
+        f.write("\n]" if count else "]")
+    return count
+
+
+def _users(spec: DataSpec, rnd: random.Random, now: datetime) -> Iterable[dict[str, Any]]:
+    for uid in range(1, spec.users + 1):
+        salt = f"{rnd.getrandbits(64):016x}"
+        yield {
+            "user_id": uid,
+            "username": f"user{uid}",
+            "hashed_password": hash_password(BENCH_PASSWORD, salt),
+            "salt": salt,
+            "registration_date": (now - timedelta(minutes=uid)).replace(microsecond=0).isoformat(),
+        }
+
+
+def _portfolios(spec: DataSpec, rnd: random.Random) -> Iterable[dict[str, Any]]:
+    for uid in range(1, spec.users + 1):
+        codes = ["USD", *rnd.sample(WALLET_CODES[1:], rnd.randint(0, len(WALLET_CODES) - 1))]
+        yield {
+            "user_id": uid,
+            "wallets": {
+                code: {"balance": round(rnd.uniform(1_000_000, 2_000_000) if code == "USD" else rnd.uniform(10, 1_000), 6)}
+                for code in codes
+            },
+        }
+
+
+def _history(spec: DataSpec, rnd: random.Random, now: datetime) -> Iterable[dict[str, Any]]:
+    steps = spec.history_days * 24 * 60 // spec.history_step_minutes
+    start = now - timedelta(minutes=steps * spec.history_step_minutes)
+    prices = dict(BASE_RATES)
+    for step in range(steps):
+        ts = _iso(start + timedelta(minutes=step * spec.history_step_minutes))
+        for pair in BASE_RATES:
+            prices[pair] *= 1 + rnd.gauss(0, 0.002)
+            source = "CoinGecko" if pair.split("_")[0] in {"BTC", "ETH", "SOL"} else "ExchangeRate-API"
+            yield {
+                "id": f"{pair}_{ts}",
+                "from_currency": pair.split("_")[0],
+                "to_currency": pair.split("_")[1],
+                "rate": round(prices[pair], 8),
+                "timestamp": ts,
+                "source": source,
+                "meta": {"request_ms": rnd.randint(50, 500), "status_code": 200},
+            }
+
+
+def generate(root: str, spec: DataSpec) -> dict[str, int]:
+    """Пишет root/data/{users,portfolios,rates,exchange_rates}.json; возвращает число записей."""
+    rnd = random.Random(spec.seed)
+    now = datetime.now(timezone.utc)
+    data_dir = os.path.join(root, "data")
+
+    counts = {
+        "users": _write_array(os.path.join(data_dir, "users.json"), _users(spec, rnd, now)),
+        "portfolios": _write_array(os.path.join(data_dir, "portfolios.json"), _portfolios(spec, rnd)),
+        "history": _write_array(os.path.join(data_dir, "exchange_rates.json"), _history(spec, rnd, now)),
+    }
+
+    refresh = _iso(now)
+    rates = {
+        "pairs": {
+            pair: {"rate": rate, "updated_at": refresh, "source": "Synthetic"}
+            for pair, rate in BASE_RATES.items()
+        },
+        "last_refresh": refresh,
+    }
+    with open(os.path.join(data_dir, "rates.json"), "w", encoding="utf-8") as f:
+        json.dump(rates, f, ensure_ascii=False, indent=2)
+    counts["pairs"] = len(BASE_RATES)
+    return counts
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Синтетические данные ValutaTrade Hub")
+    parser.add_argument("root", help="каталог, в котором будет создан data/")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--history-days", type=int, default=365)
+    parser.add_argument("--history-step", type=int, default=60, help="шаг истории, минуты")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    counts = generate(args.root, DataSpec(args.users, args.history_days, args.history_step, args.seed))
+    print(", ".join(f"{name}={value}" for name, value in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+
+def reset_singletons() -> None:
+    """Синглтоны держат пути и снимки каталога предыдущего теста."""
+    from valutatrade_hub.core.currencies import reload_registry
+    from valutatrade_hub.infra.database import DatabaseManager
+    from valutatrade_hub.infra.metrics import MetricsRegistry
+    from valutatrade_hub.infra.rates_cache import RatesCache
+    from valutatrade_hub.infra.settings import SettingsLoader
+
+    for cls in (SettingsLoader, DatabaseManager, RatesCache, MetricsRegistry):
+        cls._instance = None
+    reload_registry()
+
+
+@pytest.fixture
+def workdir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Path]:
+    """Пустой каталог данных (пути настроек относительные) и свежие синглтоны."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("VALUTATRADE_STORAGE_BACKEND", raising=False)
+    reset_singletons()
+    yield tmp_path
+    reset_singletons()
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.server.api import ApiServer, HttpError, Request
+
+
+def _read(server: ApiServer, raw: bytes) -> Request | None:
+    async def run() -> Request | None:
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await server._read_request(reader)
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize(
+    ("length", "status"),
+    [("abc", 400), ("-5", 400), ("1e3", 400), ("²", 400), ("2000", 413)],
+)
+def test_bad_content_length(workdir: Path, length: str, status: int) -> None:
+    server = ApiServer(max_body=1000)
+    raw = f"POST /login HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode("latin-1")
+    with pytest.raises(HttpError) as info:
+        _read(server, raw)
+    assert info.value.status == status
+
+
+def test_body_is_read_by_content_length(workdir: Path) -> None:
+    server = ApiServer(max_body=1000)
+    request = _read(server, b'POST /login HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}GET')
+    assert request is not None
+    assert (request.method, request.path, request.body) == ("POST", "/login", b"{}")
+
+
+def _call(server: ApiServer, method: str, path: str, body: bytes = b"", token: str = "") -> tuple[int, dict[str, Any]]:
+    headers = {"authorization": f"Bearer {token}"} if token else {}
+    return asyncio.run(server.dispatch(Request(method, path, {}, headers, body)))
+
+
+def test_login_and_portfolio_run_in_pool(workdir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    threads: dict[str, str] = {}
+    for name in ("login_user", "show_portfolio"):
+        original = getattr(usecases, name)
+
+        def spy(*args: Any, _name: str = name, _original: Any = original) -> Any:
+            threads[_name] = threading.current_thread().name
+            return _original(*args)
+
+        monkeypatch.setattr(usecases, name, spy)
+
+    server = ApiServer(workers=2)
+    credentials = b'{"username": "alice", "password": "secret123"}'
+    status, _ = _call(server, "POST", "/register", credentials)
+    assert status == 200
+
+    status, body = _call(server, "POST", "/login", credentials)
+    assert status == 200
+    status, body = _call(server, "GET", "/portfolio", token=body["result"]["token"])
+    assert status == 200, body
+
+    status, body = _call(server, "POST", "/login", b'{"username": "alice", "password": "wrong-pass"}')
+    assert (status, body["error"]["message"]) == (400, "Неверный пароль")
+    assert all(thread.startswith("api-worker") for thread in threads.values()), threads
+    assert set(threads) == {"login_user", "show_portfolio"}
+
+
+def test_oversized_request_line_and_headers(workdir: Path) -> None:
+    server = ApiServer()
+    with pytest.raises(HttpError) as info:
+        _read(server, b"GET /" + b"a" * 70_000 + b" HTTP/1.1\r\n\r\n")
+    assert info.value.status == 400
+
+    with pytest.raises(HttpError) as info:
+        _read(server, b"GET / HTTP/1.1\r\nX-Big: " + b"a" * 70_000 + b"\r\n\r\n")
+    assert info.value.status == 431
+
+    many = b"".join(b"X-H%d: 1\r\n" % i for i in range(200))
+    with pytest.raises(HttpError) as info:
+        _read(server, b"GET / HTTP/1.1\r\n" + many + b"\r\n")
+    assert info.value.status == 431
+
+
+def test_sessions_expire_and_are_evicted(workdir: Path) -> None:
+    now = [1000.0]
+    server = ApiServer(session_ttl=60)
+    server._clock = lambda: now[0]
+    credentials = b'{"username": "alice", "password": "secret123"}'
+    assert _call(server, "POST", "/register", credentials)[0] == 200
+
+    first = _call(server, "POST", "/login", credentials)[1]["result"]["token"]
+    now[0] += 30
+    second = _call(server, "POST", "/login", credentials)[1]["result"]["token"]
+    assert _call(server, "GET", "/portfolio", token=first)[0] == 200
+
+    now[0] += 31
+    assert _call(server, "GET", "/portfolio", token=first)[0] == 401
+    assert _call(server, "GET", "/portfolio", token=second)[0] == 200
+    assert _call(server, "GET", "/health")[1]["result"]["sessions"] == 1
+    now[0] += 30
+    assert _call(server, "GET", "/health")[1]["result"]["sessions"] == 0
+
+
+@pytest.mark.parametrize(
+    ("exc", "status"),
+    [(ValueError("bad"), 400), (KeyError("x"), 500), (TypeError("x"), 500), (RuntimeError("x"), 500)],
+)
+def test_error_status_keeps_programming_errors_at_500(
+    workdir: Path, monkeypatch: pytest.MonkeyPatch, exc: Exception, status: int
+) -> None:
+    def failing(*args: Any) -> Any:
+        raise exc
+
+    monkeypatch.setattr(usecases, "get_rate", failing)
+    server = ApiServer()
+    code, body = asyncio.run(server.dispatch(Request("GET", "/rate", {"from": "BTC", "to": "USD"}, {})))
+    assert code == status
+    if status == 500:
+        assert body["error"]["message"] == "Внутренняя ошибка сервера"
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import time
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.parser_service.api_clients import ExchangeRateApiClient
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.storage import RatesStorage
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, payload: dict[str, Any] | None = None, etag: str = "") -> None:
+        self.status_code = status_code
+        self._payload = payload or {}
+        self.headers = {"ETag": etag} if etag else {}
+        self.text = ""
+
+    def json(self) -> dict[str, Any]:
+        return self._payload
+
+
+class FakeSession:
+    """Отвечает по очереди заготовленными ответами; запоминает заголовки и таймауты запросов."""
+
+    def __init__(self, responses: list[FakeResponse], latency: float = 0.0) -> None:
+        self.responses = responses
+        self.latency = latency
+        self.calls: list[dict[str, Any]] = []
+
+    def get(self, url: str, params: Any = None, headers: Any = None, timeout: float | None = None) -> FakeResponse:
+        self.calls.append({"headers": dict(headers or {}), "timeout": timeout})
+        time.sleep(self.latency)
+        return self.responses.pop(0)
+
+
+def _client(session: FakeSession) -> ExchangeRateApiClient:
+    config = ParserConfig(EXCHANGERATE_API_KEY="key", INGEST_FULL_UNIVERSE=False, FIAT_CURRENCIES=())
+    client = ExchangeRateApiClient(config)
+    client.session = session  # type: ignore[assignment]
+    return client
+
+
+def _ok(etag: str) -> FakeResponse:
+    return FakeResponse(200, {"result": "success", "conversion_rates": {"USD": 1}}, etag=etag)
+
+
+def test_request_timeout_is_limited_by_deadline(workdir: Any) -> None:
+    session = FakeSession([_ok('"v1"')])
+    _client(session).fetch_rates(deadline=time.monotonic() + 2.0)
+    assert 0 < session.calls[0]["timeout"] <= 2.0
+
+
+def test_late_answer_does_not_touch_client_state(workdir: Any) -> None:
+    session = FakeSession([_ok('"v1"'), _ok('"v2"'), FakeResponse(304)], latency=0.05)
+    client = _client(session)
+
+    with pytest.raises(ApiRequestError, match="после дедлайна"):
+        client.fetch_rates(deadline=time.monotonic() + 0.01)
+    assert client._validators == {}
+
+    # брошенный ответ не запомнен: следующий опрос — обычный GET, не условный
+    client.fetch_rates()
+    assert "If-None-Match" not in session.calls[1]["headers"]
+    assert client.not_modified is False
+
+    client.fetch_rates()
+    assert session.calls[2]["headers"]["If-None-Match"] == '"v2"'
+    assert client.not_modified is True
+
+
+def test_not_modified_confirms_pairs_of_previous_answer(workdir: Any) -> None:
+    payload = {"result": "success", "conversion_rates": {"EUR": 0.5, "GBP": 0.25}}
+    codes = FakeResponse(200, {"supported_codes": [["EUR", "Euro"], ["GBP", "Pound"]]})
+    session = FakeSession([FakeResponse(200, payload, etag='"v1"'), codes, FakeResponse(304)])
+    client = _client(session)
+    client.config.FIAT_CURRENCIES = ("EUR", "GBP")
+
+    assert set(client.fetch_rates()) == {"EUR_USD", "GBP_USD"}
+    assert client.confirmed == []
+    assert client.fetch_rates() == {}
+    assert sorted(client.confirmed) == ["EUR_USD", "GBP_USD"]
+
+
+class ConfirmingClient:
+    name = "Stub"
+
+    def __init__(self) -> None:
+        self.not_modified = False
+        self.confirmed: list[str] = []
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, Any]:
+        self.not_modified, self.confirmed = True, ["EUR_USD"]
+        return {}
+
+
+def test_not_modified_refreshes_cached_timestamp(workdir: Any) -> None:
+    storage = RatesStorage()
+    old = {"rate": 1.1, "updated_at": "2020-01-01T00:00:00Z", "source": "ExchangeRate-API"}
+    storage.write_cache({"EUR_USD": old}, "2020-01-01T00:00:00Z")
+
+    result = RatesUpdater([ConfirmingClient()], storage).run_update()
+    assert (result["updated_count"], result["confirmed_count"], result["unchanged"]) == (0, 1, ["Stub"])
+
+    entry = storage.read_cache()["pairs"]["EUR_USD"]
+    assert entry["rate"] == 1.1
+    assert entry["updated_at"] == result["last_refresh"] > old["updated_at"]
+    assert list(storage.iter_history()) == []
+
+
+class StaticClient:
+    def __init__(self, name: str, data: dict[str, Any] | None = None, error: Exception | None = None) -> None:
+        self.name, self.data, self.error = name, data or {}, error
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, Any]:
+        if self.error is not None:
+            raise self.error
+        return self.data
+
+
+def test_unexpected_client_error_fails_only_that_source(workdir: Any) -> None:
+    good = StaticClient("Good", {"EUR_USD": {"rate": 1.1, "updated_at": "2024-01-01T00:00:00Z", "source": "Good"}})
+    broken = StaticClient("Broken", error=KeyError("conversion_rates"))
+
+    result = RatesUpdater([broken, good], RatesStorage()).run_update()
+
+    assert result["updated_count"] == 1
+    assert len(result["errors"]) == 1
+    assert "Broken" in result["errors"][0] and "KeyError" in result["errors"][0]
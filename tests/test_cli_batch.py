@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import io
+import json
+import tomllib
+from importlib import import_module
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.cli import interface
+from valutatrade_hub.cli.interface import (
+    EXIT_AUTH,
+    EXIT_BUSY,
+    EXIT_IO,
+    EXIT_OK,
+    EXIT_USAGE,
+    main,
+    run_batch,
+)
+from valutatrade_hub.infra.locks import LockTimeoutError, VersionConflictError
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _run(lines: list[str], **kwargs: object) -> tuple[int, list[dict]]:
+    out = io.StringIO()
+    code = run_batch(lines, out=out, **kwargs)
+    return code, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_batch_success_keeps_login_between_lines(workdir: Path) -> None:
+    code, records = _run([
+        "# комментарий",
+        "register --username alice --password 1234",
+        "",
+        "login --username alice --password 1234",
+        "show-portfolio",
+    ])
+    assert code == EXIT_OK
+    assert [r["line"] for r in records] == [2, 4, 5]
+    assert [r["command"] for r in records] == ["register", "login", "show-portfolio"]
+    assert all(r["ok"] and r["exit_code"] == EXIT_OK for r in records)
+
+
+def test_batch_partial_failure_returns_first_error_code(workdir: Path) -> None:
+    code, records = _run([
+        "show-portfolio",
+        "fly --to moon",
+        "register --username bob --password 1234",
+    ])
+    assert code == EXIT_AUTH
+    assert [r["exit_code"] for r in records] == [EXIT_AUTH, EXIT_USAGE, EXIT_OK]
+    assert records[0]["error"]["type"] == "LoginRequiredError"
+    assert records[2]["ok"] is True
+
+
+def test_batch_stop_on_error(workdir: Path) -> None:
+    code, records = _run(["fly", "register --username bob --password 1234"], stop_on_error=True)
+    assert code == EXIT_USAGE
+    assert len(records) == 1
+
+
+def test_broken_quoting_is_a_usage_error(workdir: Path) -> None:
+    code, records = _run(['login --username "alice'])
+    assert code == EXIT_USAGE
+    assert records[0]["error"]["message"] == "Некорректная команда"
+
+
+@pytest.mark.parametrize(
+    ("exc", "expected"),
+    [
+        (LockTimeoutError("data/users.json", 10.0), EXIT_BUSY),
+        (VersionConflictError("data/users.json", 5), EXIT_BUSY),
+        (PermissionError(13, "Permission denied", "data/users.json"), EXIT_IO),
+    ],
+)
+def test_storage_errors_have_their_own_exit_codes(
+    workdir: Path, monkeypatch: pytest.MonkeyPatch, exc: Exception, expected: int
+) -> None:
+    def failing(session: object, tokens: list[str]) -> None:
+        raise exc
+
+    monkeypatch.setattr(interface, "execute", failing)
+    code, records = _run(["show-portfolio"])
+    assert code == expected
+    assert records[0]["error"]["type"] == type(exc).__name__
+
+
+def test_main_script_and_single_command(workdir: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    script = workdir / "commands.txt"
+    script.write_text("register --username alice --password 1234\nshow-portfolio\n", encoding="utf-8")
+    assert main(["--script", str(script)]) == EXIT_AUTH
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["ok"] for line in lines] == [True, False]
+
+    assert main(["--script", "nope.txt"]) == EXIT_IO
+    assert main(["--script", str(script), "help"]) == EXIT_USAGE
+    assert main(["--json", "fly"]) == EXIT_USAGE
+
+
+def test_pyproject_entry_point_resolves_to_cli() -> None:
+    with open(ROOT / "pyproject.toml", "rb") as f:
+        scripts = tomllib.load(f)["tool"]["poetry"]["scripts"]
+    module, _, attr = scripts["project"].partition(":")
+    entry = getattr(import_module(module), attr)
+    assert entry is interface.cli
+
+    with pytest.raises(SystemExit) as exit_info:
+        import sys
+
+        argv, sys.argv = sys.argv, ["project", "--json", "fly"]
+        try:
+            entry()
+        finally:
+            sys.argv = argv
+    assert exit_info.value.code == EXIT_USAGE
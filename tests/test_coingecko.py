@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import Any
+from urllib.parse import urlencode
+
+import pytest
+
+from valutatrade_hub.core import currencies
+from valutatrade_hub.parser_service.api_clients import CoinGeckoClient
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.registry import merge_registry, read_registry
+from valutatrade_hub.parser_service.storage import RatesStorage
+from valutatrade_hub.parser_service.updater import RatesUpdater
+
+
+class FakeResponse:
+    def __init__(self, payload: Any) -> None:
+        self.status_code = 200
+        self._payload = payload
+        self.headers: dict[str, str] = {}
+        self.text = ""
+
+    def json(self) -> Any:
+        return self._payload
+
+
+class CoinGeckoSession:
+    """Отвечает как /coins/markets (страницы из coins) и simple/price (цена 1.0 на каждый id)."""
+
+    def __init__(self, config: ParserConfig, coins: list[dict[str, Any]]) -> None:
+        self.config = config
+        self.coins = coins
+        self.pages: list[int] = []
+        self.price_urls: list[str] = []
+
+    def get(self, url: str, params: Any = None, headers: Any = None, timeout: float | None = None) -> FakeResponse:
+        if url == self.config.COINGECKO_MARKETS_URL:
+            page, size = int(params["page"]), int(params["per_page"])
+            self.pages.append(page)
+            return FakeResponse(self.coins[(page - 1) * size : page * size])
+        self.price_urls.append(f"{url}?{urlencode(params)}")
+        return FakeResponse({raw_id: {"usd": 1.0} for raw_id in params["ids"].split(",")})
+
+
+def _coins(count: int) -> list[dict[str, Any]]:
+    return [{"id": f"coin-{i}", "symbol": f"c{i}", "name": f"Coin {i}", "market_cap": 1e9 - i} for i in range(count)]
+
+
+def _client(coins: list[dict[str, Any]], **overrides: Any) -> tuple[CoinGeckoClient, CoinGeckoSession]:
+    config = ParserConfig(INGEST_FULL_UNIVERSE=True, CRYPTO_CURRENCIES=(), **overrides)
+    client = CoinGeckoClient(config)
+    session = CoinGeckoSession(config, coins)
+    client.session = session  # type: ignore[assignment]
+    return client, session
+
+
+def test_full_universe_is_opt_in() -> None:
+    assert ParserConfig().INGEST_FULL_UNIVERSE is False
+
+
+def test_chunks_respect_url_limit_and_keep_all_ids(workdir: Any) -> None:
+    client, _ = _client([], MAX_URL_LENGTH=200)
+    ids = [f"coin-with-a-long-id-{i}" for i in range(40)]
+    chunks = client._chunks(ids, "usd")
+
+    assert len(chunks) > 1
+    assert [raw_id for chunk in chunks for raw_id in chunk] == ids
+    for chunk in chunks:
+        url = f"{client.config.COINGECKO_URL}?{urlencode({'ids': ','.join(chunk), 'vs_currencies': 'usd'})}"
+        assert len(url) <= client.config.MAX_URL_LENGTH
+
+
+def test_fetch_rates_splits_long_id_lists(workdir: Any) -> None:
+    client, session = _client(_coins(500), MAX_URL_LENGTH=500)
+    rates = client.fetch_rates()
+
+    assert len(rates) == 500
+    assert len(session.price_urls) > 1
+    assert all(len(url) <= 500 for url in session.price_urls)
+
+
+def test_top_universe_is_fetched_in_pages(workdir: Any) -> None:
+    client, session = _client(_coins(600))
+    rates = client.fetch_rates()
+
+    assert sorted(session.pages) == [1, 2]
+    assert len(rates) == 500
+    assert "C0_USD" in rates and "C499_USD" in rates and "C500_USD" not in rates
+    assert client.pop_discovered()["C0"]["coingecko_id"] == "coin-0"
+
+    # список монет не запрашивается повторно до UNIVERSE_REFRESH_SECONDS
+    client.fetch_rates()
+    assert len(session.pages) == 2
+
+
+def test_coin_with_fiat_ticker_is_skipped(workdir: Any) -> None:
+    coins = [
+        {"id": "stasis-eurs", "symbol": "eur", "name": "STASIS EURO"},
+        {"id": "gbp-coin", "symbol": "gbp", "name": "GBP Coin"},
+        {"id": "solana", "symbol": "sol", "name": "Solana"},
+    ]
+    client, _ = _client(coins, CRYPTO_UNIVERSE_SIZE=3)
+    rates = client.fetch_rates()
+
+    # EUR — фиат реестра, GBP — из FIAT_CURRENCIES
+    assert set(rates) == {"SOL_USD"}
+    assert set(client.pop_discovered()) == {"SOL"}
+
+
+def test_registry_keeps_fiat_on_ticker_collision(workdir: Any) -> None:
+    path = "currencies.json"
+    merge_registry(path, {"XAU": {"type": "fiat", "name": "Gold"}})
+    merge_registry(path, {"XAU": {"type": "crypto", "name": "Gold Token", "coingecko_id": "xau-token"}})
+    assert read_registry(path)["XAU"] == {"type": "fiat", "name": "Gold"}
+
+    merge_registry(path, {"ABC": {"type": "crypto", "name": "Abc", "coingecko_id": "abc"}})
+    merge_registry(path, {"ABC": {"type": "fiat", "name": "Abc Dollar"}})
+    assert read_registry(path)["ABC"] == {"type": "fiat", "name": "Abc Dollar"}
+
+
+class StubClient:
+    def __init__(self, name: str, asset_type: str, rate: float, info: dict[str, Any]) -> None:
+        self.name, self.ASSET_TYPE, self.rate, self.info = name, asset_type, rate, info
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, Any]:
+        return {"XAU_USD": {"rate": self.rate, "updated_at": "2024-01-01T00:00:00Z", "source": self.name}}
+
+    def pop_discovered(self) -> dict[str, dict[str, Any]]:
+        return {"XAU": self.info}
+
+
+@pytest.mark.parametrize("fiat_first", [True, False])
+def test_fiat_source_wins_pair_collision(workdir: Any, fiat_first: bool) -> None:
+    fiat = StubClient("Fiat", "fiat", 2000.0, {"type": "fiat", "name": "Gold"})
+    crypto = StubClient("Crypto", "crypto", 1.5, {"type": "crypto", "name": "Gold Token", "coingecko_id": "xau"})
+    storage = RatesStorage()
+
+    result = RatesUpdater([fiat, crypto] if fiat_first else [crypto, fiat], storage).run_update()
+
+    assert result["updated_count"] == 1
+    assert storage.read_cache()["pairs"]["XAU_USD"]["source"] == "Fiat"
+    assert [r["source"] for r in storage.iter_history()] == ["Fiat"]
+    assert currencies.get_currency("XAU").__class__ is currencies.FiatCurrency
+
+
+def test_registry_file_is_stat_at_most_once_per_interval(workdir: Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    clock = [1000.0]
+    calls: list[str] = []
+    real_stamp = currencies.file_stamp
+
+    def counting_stamp(path: str) -> Any:
+        calls.append(path)
+        return real_stamp(path)
+
+    monkeypatch.setattr(currencies, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    monkeypatch.setattr(currencies, "file_stamp", counting_stamp)
+
+    for _ in range(100):
+        currencies.get_currency("USD")
+    assert len(calls) == 1
+
+    clock[0] += currencies._RELOAD_CHECK_SECONDS / 2
+    currencies.list_supported_codes()
+    assert len(calls) == 1
+
+    clock[0] += currencies._RELOAD_CHECK_SECONDS
+    currencies.list_supported_codes()
+    assert len(calls) == 2
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from valutatrade_hub.core.utils import from_epoch
+from valutatrade_hub.parser_service.columnar import COLUMNS, META_FILE, ColumnarHistory
+from valutatrade_hub.parser_service.history import HistoryLog
+
+T0 = 1_770_000_000
+
+
+def _rec(pair: str, ts: int, rate: float, source: str = "CoinGecko") -> dict[str, object]:
+    base, quote = pair.split("_")
+    stamp = from_epoch(ts)
+    return {
+        "id": f"{pair}_{stamp}",
+        "from_currency": base,
+        "to_currency": quote,
+        "rate": rate,
+        "timestamp": stamp,
+        "source": source,
+        "meta": {"status_code": 200, "n": ts - T0},
+    }
+
+
+def _setup(tmp_path: Path) -> tuple[HistoryLog, ColumnarHistory]:
+    return HistoryLog(str(tmp_path / "history"), segment_bytes=1 << 20), ColumnarHistory(str(tmp_path / "columns"))
+
+
+def test_sync_copies_records_incrementally(tmp_path: Path) -> None:
+    log, columns = _setup(tmp_path)
+    records = [_rec("BTC_USD", T0, 1.5), _rec("EUR_USD", T0, 1.1, "ExchangeRate-API"), _rec("BTC_USD", T0 + 60, 2.5)]
+    log.append(records[:2])
+    assert columns.sync(log) == 2
+    log.append(records[2:])
+    assert columns.sync(log) == 1
+    assert columns.sync(log) == 0
+
+    with columns.open() as view:
+        assert view.rows == 3
+        assert [view.record(i) for i in range(view.rows)] == sorted(records, key=lambda r: str(r["timestamp"]))
+        assert list(view.scan(pair="BTC_USD", since=T0 + 1)) == [2]
+        assert list(view.scan(source="ExchangeRate-API")) == [1]
+
+
+def test_torn_column_tail_is_ignored_and_truncated(tmp_path: Path) -> None:
+    log, columns = _setup(tmp_path)
+    log.append([_rec("BTC_USD", T0, 1.0), _rec("BTC_USD", T0 + 60, 2.0)])
+    columns.sync(log)
+
+    # сбой посреди _append: колонки и meta дописаны частично, state.json старый
+    for fname in [fname for fname, _ in COLUMNS.values()] + [META_FILE]:
+        with open(tmp_path / "columns" / fname, "ab") as f:
+            f.write(b"\x07" * 5)
+
+    with columns.open() as view:
+        assert view.rows == 2
+        assert view.record(1)["rate"] == 2.0
+
+    log.append([_rec("BTC_USD", T0 + 120, 3.0)])
+    assert columns.sync(log) == 1
+    with columns.open() as view:
+        assert [view.record(i)["rate"] for i in range(view.rows)] == [1.0, 2.0, 3.0]
+        assert view.record(2)["meta"] == {"status_code": 200, "n": 120}
+    for name, (fname, code) in COLUMNS.items():
+        width = {"q": 8, "d": 8, "I": 4, "H": 2}[code]
+        assert (tmp_path / "columns" / fname).stat().st_size == 3 * width, name
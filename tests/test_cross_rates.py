@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.core.cross_rates import CrossRateMatrix
+
+
+def _entry(rate: Any, updated_at: str = "2026-02-13T12:00:00Z") -> dict[str, Any]:
+    return {"rate": rate, "updated_at": updated_at, "source": "test"}
+
+
+PAIRS = {
+    "EUR_USD": _entry(1.25, "2026-02-13T12:00:00Z"),
+    "BTC_USD": _entry(60000.0, "2026-02-13T11:00:00Z"),
+    "SOL_BTC": _entry(0.002, "2026-02-13T10:00:00Z"),
+    # компонента без USD: опорная — валюта с наибольшим числом котировок
+    "KRW_JPY": _entry(0.1),
+    "CNY_JPY": _entry(20.0),
+    # некорректные записи пропускаются
+    "GBP_USD": _entry(0),
+    "CHF_USD": _entry(True),
+    "CAD_USD": _entry(0.7, "not a date"),
+    "BROKEN": _entry(1.0),
+}
+
+
+@pytest.fixture
+def matrix() -> CrossRateMatrix:
+    return CrossRateMatrix(PAIRS)
+
+
+def test_direct_inverse_and_cross_via_pivot(matrix: CrossRateMatrix) -> None:
+    assert matrix.lookup("EUR", "USD")["rate"] == pytest.approx(1.25)
+    assert matrix.lookup("USD", "EUR")["rate"] == pytest.approx(0.8)
+    btc_eur = matrix.lookup("BTC", "EUR")
+    assert btc_eur["rate"] == pytest.approx(48000.0)
+    assert btc_eur["source"] == "cross via USD"
+    # два шага от опорной: SOL -> BTC -> USD
+    assert matrix.lookup("SOL", "EUR")["rate"] == pytest.approx(96.0)
+
+
+def test_updated_at_is_oldest_leg(matrix: CrossRateMatrix) -> None:
+    assert matrix.lookup("BTC", "EUR")["updated_at"] == "2026-02-13T11:00:00+00:00"
+    assert matrix.lookup("EUR", "SOL")["updated_at"] == "2026-02-13T10:00:00+00:00"
+    assert matrix.lookup("EUR", "USD")["updated_at"] == "2026-02-13T12:00:00+00:00"
+
+
+def test_components_do_not_mix(matrix: CrossRateMatrix) -> None:
+    assert matrix.lookup("KRW", "CNY")["rate"] == pytest.approx(0.005)
+    assert matrix.lookup("KRW", "CNY")["source"] == "cross via JPY"
+    assert matrix.lookup("KRW", "USD") is None
+    assert matrix.lookup("XXX", "USD") is None
+
+
+def test_invalid_entries_are_skipped(matrix: CrossRateMatrix) -> None:
+    assert "GBP" not in matrix and "CHF" not in matrix and "CAD" not in matrix
+    assert sorted(matrix.codes) == ["BTC", "CNY", "EUR", "JPY", "KRW", "SOL", "USD"]
+    assert len(matrix) == 7
+
+
+def test_identity_is_one(matrix: CrossRateMatrix) -> None:
+    assert matrix.lookup("USD", "USD")["rate"] == 1.0
+    assert matrix.lookup("SOL", "SOL")["rate"] == 1.0
+
+
+def test_extra_pivots_take_precedence() -> None:
+    matrix = CrossRateMatrix(PAIRS, pivots=("USD", "KRW"))
+    assert matrix.lookup("CNY", "JPY")["source"] == "cross via KRW"
+    assert matrix.lookup("CNY", "JPY")["rate"] == pytest.approx(20.0)
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.utils import from_epoch
+from valutatrade_hub.parser_service.history import HistoryLog
+
+T0 = 1_770_000_000
+
+
+def _rec(pair: str, ts: int, rate: float) -> dict[str, object]:
+    base, quote = pair.split("_")
+    return {"from_currency": base, "to_currency": quote, "rate": rate, "timestamp": from_epoch(ts), "source": "test"}
+
+
+def _rates(log: HistoryLog) -> list[float]:
+    return [float(r["rate"]) for r in log.iter_records()]
+
+
+def test_duplicates_and_stale_ticks_are_skipped(tmp_path: Path) -> None:
+    log = HistoryLog(str(tmp_path), segment_bytes=1 << 20)
+    assert log.append([_rec("BTC_USD", T0, 1.0), _rec("BTC_USD", T0 + 60, 2.0)]) == 2
+    assert log.append([_rec("BTC_USD", T0 + 60, 2.0), _rec("BTC_USD", T0 + 30, 9.0), _rec("ETH_USD", T0, 3.0)]) == 1
+    assert _rates(log) == [1.0, 2.0, 3.0]
+
+
+def test_lines_written_before_index_save_are_recovered(tmp_path: Path) -> None:
+    HistoryLog(str(tmp_path), segment_bytes=1 << 20).append([_rec("BTC_USD", T0, 1.0)])
+    committed = (tmp_path / "index.json").read_text(encoding="utf-8")
+    HistoryLog(str(tmp_path), segment_bytes=1 << 20).append([_rec("BTC_USD", T0 + 60, 2.0)])
+
+    # сбой между дозаписью сегмента и сохранением индекса: индекс отстал на строку
+    (tmp_path / "index.json").write_text(committed, encoding="utf-8")
+
+    log = HistoryLog(str(tmp_path), segment_bytes=1 << 20)
+    assert log.append([_rec("BTC_USD", T0 + 60, 2.0), _rec("BTC_USD", T0 + 120, 3.0)]) == 1
+    assert _rates(log) == [1.0, 2.0, 3.0]
+    assert json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))["records"] == 3
+
+
+def test_torn_last_line_is_truncated(tmp_path: Path) -> None:
+    log = HistoryLog(str(tmp_path), segment_bytes=1 << 20)
+    log.append([_rec("BTC_USD", T0, 1.0)])
+    segment = next(tmp_path.glob("segment-*.jsonl"))
+    with open(segment, "ab") as f:
+        f.write(b'{"from_currency":"BTC","to_cur')  # недописанная строка
+
+    assert _rates(log) == [1.0]
+    log = HistoryLog(str(tmp_path), segment_bytes=1 << 20)
+    assert log.append([_rec("BTC_USD", T0 + 60, 2.0)]) == 1
+    assert _rates(log) == [1.0, 2.0]
+    assert all(line.endswith("}") for line in segment.read_text(encoding="utf-8").splitlines())
+
+
+def test_segments_rotate_by_size(tmp_path: Path) -> None:
+    log = HistoryLog(str(tmp_path), segment_bytes=100)
+    for i in range(5):
+        log.append([_rec("BTC_USD", T0 + i * 60, float(i))])
+    assert len(log.segment_paths()) > 1
+    assert _rates(log) == [0.0, 1.0, 2.0, 3.0, 4.0]
+    positions = [pos for _, pos in log.read_from(1, 0)]
+    # чтение с позиции после второй записи продолжает с третьей, через границу сегментов
+    assert [float(r["rate"]) for r, _ in log.read_from(*positions[1])] == [2.0, 3.0, 4.0]
+
+
+def test_dedup_compares_time_not_strings(tmp_path: Path) -> None:
+    log = HistoryLog(str(tmp_path), segment_bytes=1 << 20)
+    assert log.append([_rec("BTC_USD", T0, 1.0)]) == 1
+    same_tick = {**_rec("BTC_USD", T0, 5.0), "timestamp": from_epoch(T0).replace("Z", "+00:00")}
+    broken = {"from_currency": "BTC", "rate": 1.0, "timestamp": from_epoch(T0 + 60)}
+    assert log.append([same_tick, broken, _rec("BTC_USD", T0 + 60, 2.0)]) == 1
+    assert _rates(log) == [1.0, 2.0]
+    index = json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))
+    assert index["rejected"] == {"duplicate": 1, "invalid": 1}
+    assert index["last_ts"] == {"BTC_USD": T0 + 60}
+
+
+def test_old_index_with_iso_last_ts_is_upgraded(tmp_path: Path) -> None:
+    HistoryLog(str(tmp_path), segment_bytes=1 << 20).append([_rec("BTC_USD", T0, 1.0)])
+    index = json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))
+    index["last_ts"] = {"BTC_USD": from_epoch(T0)}
+    del index["rejected"]
+    (tmp_path / "index.json").write_text(json.dumps(index), encoding="utf-8")
+
+    log = HistoryLog(str(tmp_path), segment_bytes=1 << 20)
+    assert log.append([_rec("BTC_USD", T0, 9.0), _rec("BTC_USD", T0 + 60, 2.0)]) == 1
+    assert _rates(log) == [1.0, 2.0]
+
+
+def test_recovery_skips_a_bad_complete_line_and_keeps_the_rest(tmp_path: Path) -> None:
+    HistoryLog(str(tmp_path), segment_bytes=1 << 20).append([_rec("BTC_USD", T0, 1.0)])
+    committed = (tmp_path / "index.json").read_text(encoding="utf-8")
+    segment = next(tmp_path.glob("segment-*.jsonl"))
+    with open(segment, "ab") as f:
+        f.write(b"garbage\n")
+        f.write((json.dumps(_rec("BTC_USD", T0 + 60, 2.0)) + "\n").encode())
+        f.write(b'{"from_cur')
+    (tmp_path / "index.json").write_text(committed, encoding="utf-8")
+
+    log = HistoryLog(str(tmp_path), segment_bytes=1 << 20)
+    assert log.append([_rec("BTC_USD", T0 + 60, 2.0), _rec("BTC_USD", T0 + 120, 3.0)]) == 1
+    assert _rates(log) == [1.0, 2.0, 3.0]
+    assert segment.read_bytes().count(b"garbage\n") == 1
+    assert json.loads((tmp_path / "index.json").read_text(encoding="utf-8"))["records"] == 3
+
+
+def test_legacy_import_sorts_the_whole_file(workdir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from valutatrade_hub.parser_service import storage
+
+    legacy = [_rec("BTC_USD", T0 + 180, 4.0), _rec("BTC_USD", T0, 1.0), _rec("ETH_USD", T0, 7.0),
+              _rec("BTC_USD", T0 + 120, 3.0), _rec("BTC_USD", T0 + 60, 2.0), _rec("BTC_USD", T0, 1.0),
+              {"from_currency": "BTC", "to_currency": "USD", "rate": 1.0}]
+    (workdir / "data").mkdir()
+    (workdir / "data" / "exchange_rates.json").write_text(json.dumps(legacy), encoding="utf-8")
+    monkeypatch.setattr(storage, "_IMPORT_BATCH", 2)
+
+    rates = storage.RatesStorage()
+    rates._ensure_journal()
+    assert [float(r["rate"]) for r in rates.iter_history(pair="BTC_USD")] == [1.0, 2.0, 3.0, 4.0]
+    assert [float(r["rate"]) for r in rates.iter_history(pair="ETH_USD")] == [7.0]
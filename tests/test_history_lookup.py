@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.cli.interface import Session, UsageError, execute
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.utils import from_epoch
+from valutatrade_hub.parser_service.columnar import ColumnarHistory
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+T0 = 1_770_000_000 - 1_770_000_000 % 3600
+
+
+def _tick(pair: str, ts: int, rate: float) -> dict[str, Any]:
+    base, quote = pair.split("_")
+    stamp = from_epoch(ts)
+    return {
+        "id": f"{pair}_{stamp}",
+        "from_currency": base,
+        "to_currency": quote,
+        "rate": rate,
+        "timestamp": stamp,
+        "source": "CoinGecko",
+        "meta": {"status_code": 200},
+    }
+
+
+def _write_legacy(workdir: Path, ticks: list[dict[str, Any]]) -> None:
+    (workdir / "data").mkdir(exist_ok=True)
+    (workdir / "data" / "exchange_rates.json").write_text(json.dumps(ticks, indent=2), encoding="utf-8")
+
+
+def test_rate_at_reads_legacy_history_before_first_update(workdir: Path) -> None:
+    _write_legacy(workdir, [_tick("BTC_USD", T0 + i * 600, 100.0 + i) for i in range(6)])
+
+    info = usecases.get_rate_at("BTC", "USD", T0 + 1300)
+    assert float(info["rate"]) == 102.0
+    assert info["updated_at"] == from_epoch(T0 + 1200)
+
+    linear = usecases.get_rate_at("BTC", "USD", T0 + 1500, "linear")
+    assert float(linear["rate"]) == 102.5
+    nearest = usecases.get_rate_at("BTC", "USD", T0 + 1700, "nearest")
+    assert nearest["updated_at"] == from_epoch(T0 + 1800)
+
+
+def test_cross_rate_at_via_pivot(workdir: Path) -> None:
+    _write_legacy(workdir, [_tick("BTC_USD", T0, 60000.0), _tick("EUR_USD", T0, 1.2)])
+    info = usecases.get_rate_at("BTC", "EUR", T0 + 5)
+    assert float(info["rate"]) == 50000.0
+    assert info["source"] == "cross via USD"
+
+
+def test_bars_computed_from_existing_history(workdir: Path) -> None:
+    _write_legacy(workdir, [_tick("BTC_USD", T0 + i * 900, float(i)) for i in range(8)])
+    storage = RatesStorage()
+
+    bars = storage.read_bars("BTC_USD", "1h")
+    assert [(b["open"], b["high"], b["low"], b["close"], b["count"]) for b in bars] == [
+        (0.0, 3.0, 0.0, 3.0, 4),
+        (4.0, 7.0, 4.0, 7.0, 4),
+    ]
+    assert [b["closed"] for b in bars] == [True, False]
+    assert storage.read_bars("BTC_USD", "1h", since=T0 + 3600) == bars[1:]
+
+    # чтение ничего не пишет: бары и журнал создаёт обновление курсов
+    assert not (workdir / "data" / "rollups").exists()
+    assert not (workdir / "data" / "history").exists()
+
+    # обычное обновление после засева: старые тики не учитываются повторно
+    new = [_tick("BTC_USD", T0 + 8 * 900, 8.0)]
+    storage.append_history(new)
+    storage.update_rollups(new)
+    bars = storage.read_bars("BTC_USD", "1h")
+    assert [b["count"] for b in bars] == [4, 4, 1]
+
+
+def test_index_tail_from_interrupted_sync_is_truncated(workdir: Path) -> None:
+    storage = RatesStorage()
+    storage.append_history([_tick("BTC_USD", T0 + i * 60, float(i)) for i in range(3)])
+    storage.open_columns().close()
+
+    # сбой после записи индекса, но до state.json: в файле индекса лишние записи
+    index = next((workdir / "data").rglob("index/*.i64"))
+    committed = index.read_bytes()
+    index.write_bytes(committed + committed[-16:] * 2)
+
+    storage.append_history([_tick("BTC_USD", T0 + 300, 5.0)])
+    columns = storage.open_columns()
+    try:
+        assert index.stat().st_size == len(committed) + 16
+        assert columns.rate_at("BTC_USD", T0 + 200)["rate"] == 2.0
+        assert columns.rate_at("BTC_USD", T0 + 400)["rate"] == 5.0
+    finally:
+        columns.close()
+
+
+@pytest.mark.parametrize("pair", ["../../x_y", "BTC_../..", "BTC", "BTC_USD_EUR", "B/C_USD"])
+def test_rate_bars_rejects_malformed_pair(workdir: Path, pair: str) -> None:
+    with pytest.raises(UsageError):
+        execute(Session(), ["rate-bars", "--pair", pair])
+    assert not (workdir / "data").exists()
+
+
+def test_rate_at_reads_without_writing(workdir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    storage = RatesStorage()
+    storage.append_history([_tick("BTC_USD", T0 + i * 60, float(i)) for i in range(3)])
+    state = next((workdir / "data").rglob("state.json"))
+    before = state.stat().st_mtime_ns
+
+    def no_sync(*args: Any) -> int:
+        raise AssertionError("колонки уже синхронны: sync не нужен")
+
+    monkeypatch.setattr(ColumnarHistory, "sync", no_sync)
+    for _ in range(3):
+        assert float(usecases.get_rate_at("BTC", "USD", T0 + 90)["rate"]) == 1.0
+    assert state.stat().st_mtime_ns == before
+
+
+def test_rate_at_catches_up_when_columns_are_behind(workdir: Path) -> None:
+    storage = RatesStorage()
+    storage.append_history([_tick("BTC_USD", T0, 1.0)])
+
+    # журнал дописан в обход колонок (например, другим процессом до синхронизации)
+    storage._history.append([_tick("BTC_USD", T0 + 60, 2.0)])
+    assert float(usecases.get_rate_at("BTC", "USD", T0 + 90)["rate"]) == 2.0
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.core.utils import from_epoch, iter_json_array, iter_json_lines
+from valutatrade_hub.parser_service.history import iter_history, main
+
+T0 = 1_770_000_000
+
+DOCUMENTS = [
+    "[]",
+    "  [ \n ]  \n",
+    '[{"name": "Ёж \\"колючий\\" \\\\ \\u00e9 \\ud83d\\ude00", "tags": ["a,b", "]", "["]}]',
+    "[[1, [2, [3]]], [], {}, [[]]]",
+    "[2.5, -1e-3, 10, 1E+10, 0, true, false, null]",
+    '[\n  {"rate": 60000.125, "timestamp": "2026-02-13T12:00:00Z"},\n  {"rate": 1}\n]\n',
+]
+
+
+def _write(tmp_path: Path, text: str, name: str = "doc.json") -> str:
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.mark.parametrize("text", DOCUMENTS)
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 16])
+def test_array_matches_json_loads_for_any_chunking(tmp_path: Path, text: str, chunk_size: int) -> None:
+    assert list(iter_json_array(_write(tmp_path, text), chunk_size)) == json.loads(text)
+
+
+def test_missing_or_empty_file_yields_nothing(tmp_path: Path) -> None:
+    assert list(iter_json_array(str(tmp_path / "missing.json"))) == []
+    assert list(iter_json_array(_write(tmp_path, " \n"))) == []
+
+
+@pytest.mark.parametrize(
+    ("text", "items"),
+    [
+        ("[1, 2] x", [1, 2]),
+        ("[1] []", [1]),
+        ("[1,]", [1]),
+        ("[,1]", []),
+        ("[1 2]", [1]),
+        ("[1,,2]", [1]),
+        ('{"a": 1}', []),
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 16])
+def test_malformed_array_raises_after_valid_items(tmp_path: Path, text: str, items: list[Any], chunk_size: int) -> None:
+    stream = iter_json_array(_write(tmp_path, text), chunk_size)
+    got: list[Any] = []
+    with pytest.raises(ValueError):
+        for item in stream:
+            got.append(item)
+    assert got == items
+
+
+@pytest.mark.parametrize(
+    ("text", "items"),
+    [("[1, 2", [1, 2]), ('[1, {"a": "b', [1]), ("[1, 2.", [1]), ("[1, tru", [1]), ("[", [])],
+)
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+def test_truncated_array_raises(tmp_path: Path, text: str, items: list[Any], chunk_size: int) -> None:
+    got: list[Any] = []
+    with pytest.raises(ValueError):
+        for item in iter_json_array(_write(tmp_path, text), chunk_size):
+            got.append(item)
+    assert got == items
+
+
+def test_number_split_at_chunk_boundary_is_not_cut(tmp_path: Path) -> None:
+    # "[12345.678, 1]" кусками по 4: "[123", "45.6", "78, ", "1]"
+    assert list(iter_json_array(_write(tmp_path, "[12345.678, 1]"), 4)) == [12345.678, 1]
+
+
+def test_json_lines_skip_bad_and_torn_lines(tmp_path: Path) -> None:
+    path = tmp_path / "segment.jsonl"
+    path.write_bytes(b'{"a": 1}\nnot json\n[2]\n{"a": 3')
+    assert list(iter_json_lines(str(path))) == [{"a": 1}, [2]]
+    assert list(iter_json_lines(str(tmp_path / "missing.jsonl"))) == []
+
+
+def _rec(pair: str, ts: int, source: str = "CoinGecko") -> dict[str, Any]:
+    base, quote = pair.split("_")
+    return {"from_currency": base, "to_currency": quote, "rate": 1.0, "timestamp": from_epoch(ts), "source": source}
+
+
+RECORDS = [
+    _rec("BTC_USD", T0),
+    _rec("ETH_USD", T0 + 60),
+    _rec("BTC_USD", T0 + 120, "ExchangeRate-API"),
+    _rec("BTC_USD", T0 + 180),
+]
+
+
+@pytest.fixture
+def history_files(tmp_path: Path) -> list[str]:
+    legacy = _write(tmp_path, json.dumps(RECORDS[:2] + ["junk", {**_rec("BTC_USD", 0), "timestamp": "bad"}]))
+    segment = tmp_path / "segment-000001.jsonl"
+    segment.write_text("".join(json.dumps(r) + "\n" for r in RECORDS[2:]), encoding="utf-8")
+    return [legacy, str(segment)]
+
+
+def test_iter_history_filters(history_files: list[str]) -> None:
+    def times(**filters: Any) -> list[str]:
+        return [r["timestamp"] for r in iter_history(history_files, **filters)]
+
+    assert len(times()) == 5  # строка 'junk' пропущена, запись с плохим временем — без фильтра по времени
+    assert times(pair="btc_usd", since=T0) == [from_epoch(T0 + s) for s in (0, 120, 180)]
+    assert times(pair="BTC_USD", source="CoinGecko", since=0) == [from_epoch(T0), from_epoch(T0 + 180)]
+    # [since, until): нижняя граница включается, верхняя — нет
+    assert times(since=T0 + 60, until=T0 + 180) == [from_epoch(T0 + 60), from_epoch(T0 + 120)]
+    assert times(pair="XRP_USD") == []
+
+
+def test_export_cli(history_files: list[str], tmp_path: Path) -> None:
+    out = tmp_path / "out.jsonl"
+    main(["export", "--path", *history_files, "--pair", "BTC_USD", "--since", from_epoch(T0 + 1), "--out", str(out)])
+    assert [json.loads(line)["timestamp"] for line in out.read_text(encoding="utf-8").splitlines()] == [
+        from_epoch(T0 + 120),
+        from_epoch(T0 + 180),
+    ]
+
+    main(["export", "--path", *history_files, "--limit", "1", "--out", str(out)])
+    assert len(out.read_text(encoding="utf-8").splitlines()) == 1
+
+
+def test_validate_cli(history_files: list[str], capsys: pytest.CaptureFixture[str]) -> None:
+    with pytest.raises(SystemExit) as exit_info:
+        main(["validate", "--path", *history_files])
+    report = json.loads(capsys.readouterr().out)
+    assert exit_info.value.code == 1
+    assert (report["records"], report["invalid"], report["out_of_order"], report["pairs"]) == (5, 1, 0, 2)
+
+    with pytest.raises(SystemExit) as exit_info:
+        main(["validate", "--path", history_files[1]])
+    assert exit_info.value.code == 0
+    capsys.readouterr()
+
+    with pytest.raises(SystemExit) as exit_info:
+        main(["validate", "--path", history_files[1], history_files[0]])
+    assert exit_info.value.code == 1
+    assert json.loads(capsys.readouterr().out)["out_of_order"] == 1
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import multiprocessing
+import threading
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.utils import load_json
+from valutatrade_hub.infra.json_store import JsonStore
+from valutatrade_hub.infra.locks import (
+    LockTimeoutError,
+    VersionConflictError,
+    bump_version,
+    file_lock,
+    read_version,
+)
+from valutatrade_hub.infra.settings import SettingsLoader
+
+INCREMENTS = 25
+
+
+def _store(retries: int = 10_000) -> JsonStore:
+    settings = SettingsLoader()
+    settings._data["OPTIMISTIC_RETRIES"] = retries
+    return JsonStore(settings)
+
+
+def _increment(doc: dict[str, int]) -> dict[str, int]:
+    doc["n"] = doc.get("n", 0) + 1
+    return doc
+
+
+def _optimistic_worker(path: str) -> None:
+    store = _store()
+    for _ in range(INCREMENTS):
+        store._update(path, {}, _increment)
+
+
+def _locked_worker(path: str) -> None:
+    from valutatrade_hub.core.utils import save_json
+
+    for _ in range(INCREMENTS):
+        with file_lock(path, timeout=30):
+            save_json(path, _increment(load_json(path, {})))
+            bump_version(path)
+
+
+@pytest.mark.parametrize("worker", [_optimistic_worker, _locked_worker])
+def test_threads_do_not_lose_updates(workdir: Path, worker: object) -> None:
+    path = str(workdir / "counter.json")
+    threads = [threading.Thread(target=worker, args=(path,)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert load_json(path, {}) == {"n": 6 * INCREMENTS}
+    assert read_version(path) == 6 * INCREMENTS
+
+
+@pytest.mark.parametrize("worker", [_optimistic_worker, _locked_worker])
+def test_processes_do_not_lose_updates(workdir: Path, worker: object) -> None:
+    path = str(workdir / "counter.json")
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=worker, args=(path,)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(timeout=60)
+        assert p.exitcode == 0
+    assert load_json(path, {}) == {"n": 4 * INCREMENTS}
+    assert read_version(path) == 4 * INCREMENTS
+
+
+def test_lock_is_reentrant_in_one_thread(workdir: Path) -> None:
+    path = str(workdir / "doc.json")
+    with file_lock(path, timeout=0.05):
+        with file_lock(path, timeout=0.05):
+            assert bump_version(path) == 1
+        # внутренний выход не снимает внешнюю блокировку
+        assert bump_version(path) == 2
+    with pytest.raises(RuntimeError):
+        bump_version(path)
+
+    # транзакция хранилища держит документ, и _update внутри неё не блокируется сам о себя
+    store = _store()
+    with store.transaction():
+        store._update(path, {}, _increment)
+        store._update(path, {}, _increment)
+    assert load_json(path, {}) == {"n": 2}
+
+
+def test_lock_timeout(workdir: Path) -> None:
+    path = str(workdir / "doc.json")
+    held, release = threading.Event(), threading.Event()
+
+    def holder() -> None:
+        with file_lock(path):
+            held.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=holder)
+    thread.start()
+    try:
+        held.wait(5)
+        with pytest.raises(LockTimeoutError, match="заблокирован"):
+            with file_lock(path, timeout=0.05):
+                pass
+    finally:
+        release.set()
+        thread.join()
+    with file_lock(path, timeout=0.05):
+        pass
+
+
+def test_update_gives_up_after_retries(workdir: Path) -> None:
+    path = str(workdir / "doc.json")
+    store = _store(retries=3)
+    calls = []
+
+    def racing(doc: dict[str, int]) -> dict[str, int]:
+        # пока мы готовим запись, другой писатель успевает поменять документ
+        calls.append(1)
+        with file_lock(path):
+            bump_version(path)
+        return _increment(doc)
+
+    with pytest.raises(VersionConflictError):
+        store._update(path, {}, racing)
+    assert len(calls) == 3
+    assert load_json(path, None) is None
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import logging
+import queue
+import sys
+
+from valutatrade_hub.logging_config import _InProcessQueueHandler
+
+
+def test_prepare_formats_message_and_keeps_traceback() -> None:
+    handler = _InProcessQueueHandler(queue.SimpleQueue())
+    args = {"amount": 1}
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.getLogger("valutatrade").makeRecord(
+            "valutatrade", logging.ERROR, __file__, 1, "buy %(amount)s", (args,), sys.exc_info()
+        )
+
+    prepared = handler.prepare(record)
+    args["amount"] = 2  # запись в очереди не зависит от дальнейших изменений аргументов
+    assert (prepared.msg, prepared.args, prepared.exc_info) == ("buy 1", None, None)
+    assert "ValueError: boom" in prepared.exc_text
+
+    line = logging.Formatter("%(levelname)s %(message)s").format(prepared)
+    assert line.startswith("ERROR buy 1\nTraceback")
+    assert record.args is args  # исходная запись не изменена
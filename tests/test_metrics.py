@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.cli.interface import Session, UsageError, execute, render
+from valutatrade_hub.infra.metrics import Counter, Histogram, MetricsRegistry, parse_prometheus, timed
+
+
+def test_registry_is_singleton_and_checks_kind(workdir: Path) -> None:
+    registry = MetricsRegistry()
+    assert MetricsRegistry() is registry
+    assert registry.counter("x_total") is registry.counter("x_total")
+    with pytest.raises(ValueError):
+        registry.gauge("x_total")
+
+
+def test_histogram_quantiles(workdir: Path) -> None:
+    hist = MetricsRegistry().histogram("h_seconds", buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        hist.observe(value, op="a")
+    counts, total, count = hist.series()[(("op", "a"),)]
+    assert counts == [2, 1, 1] and count == 4 and total == pytest.approx(5.6)
+    assert hist.quantile(0.5, op="a") == pytest.approx(0.1)
+    assert hist.quantile(0.99, op="a") == 1.0  # корзина +Inf: нижняя граница
+    assert hist.quantile(0.5, op="missing") is None
+
+
+def test_render_prometheus_format(workdir: Path) -> None:
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Вызовы").inc(2, op='say "hi"\n')
+    registry.gauge("temp").set(1.5)
+    registry.histogram("lat_seconds", buckets=(0.5,)).observe(0.25)
+    assert registry.render_prometheus().splitlines() == [
+        "# HELP calls_total Вызовы",
+        "# TYPE calls_total counter",
+        'calls_total{op="say \\"hi\\"\\n"} 2',
+        "# TYPE lat_seconds histogram",
+        'lat_seconds_bucket{le="0.5"} 1',
+        'lat_seconds_bucket{le="+Inf"} 1',
+        "lat_seconds_sum 0.25",
+        "lat_seconds_count 1",
+        "# TYPE temp gauge",
+        "temp 1.5",
+    ]
+
+
+def test_parse_prometheus_round_trip(workdir: Path) -> None:
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Вызовы").inc(3, op='a "b"\\c')
+    hist = registry.histogram("lat_seconds", "Задержка", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 2.0):
+        hist.observe(value, op="x")
+    families = {f.name: f for f in parse_prometheus(registry.render_prometheus())}
+
+    assert isinstance(families["calls_total"], Counter)
+    assert families["calls_total"].value(op='a "b"\\c') == 3
+    parsed = families["lat_seconds"]
+    assert isinstance(parsed, Histogram) and parsed.help == "Задержка"
+    assert parsed.series() == hist.series()
+    assert parsed.summary() == hist.summary()
+
+
+def test_timed_records_outcomes_into_current_registry(workdir: Path) -> None:
+    @timed("job", "Задача")
+    def job(fail: bool = False) -> str:
+        if fail:
+            raise RuntimeError("boom")
+        return "done"
+
+    # реестр сбросили уже после декорирования
+    MetricsRegistry._instance = None
+    assert job() == "done"
+    with pytest.raises(RuntimeError):
+        job(fail=True)
+    registry = MetricsRegistry()
+    calls = registry.counter("job_total")
+    assert calls.value(op="job", result="ok") == 1
+    assert calls.value(op="job", result="error") == 1
+    assert registry.histogram("job_seconds").series()[(("op", "job"),)][2] == 2
+
+
+def test_metrics_command_reads_daemon_file_without_overwriting(workdir: Path) -> None:
+    MetricsRegistry().counter("daemon_runs_total").inc(7)
+    daemon_file = workdir / "data" / "metrics.prom"
+    MetricsRegistry().export(str(daemon_file))
+    exported = daemon_file.read_text(encoding="utf-8")
+
+    MetricsRegistry().reset()
+    result = execute(Session(), ["metrics"])
+    assert daemon_file.read_text(encoding="utf-8") == exported
+    assert result.data["source"] == "data/metrics.prom"
+    assert result.data["values"] == [{"metric": "daemon_runs_total", "labels": {}, "value": 7.0}]
+
+    out = io.StringIO()
+    render(result, out)
+    assert "daemon_runs_total" in out.getvalue()
+
+
+def test_metrics_command_exports_process_metrics_elsewhere(workdir: Path) -> None:
+    MetricsRegistry().gauge("local").set(1)
+    result = execute(Session(), ["metrics", "--export", "out.prom"])
+    assert result.data["source"] is None
+    assert "local 1" in (workdir / "out.prom").read_text(encoding="utf-8")
+    assert not (workdir / "data" / "metrics.prom").exists()
+    with pytest.raises(UsageError):
+        execute(Session(), ["metrics", "--export", "data/metrics.prom"])
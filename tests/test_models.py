@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.exceptions import InsufficientFundsError
+from valutatrade_hub.core.models import (
+    Portfolio,
+    Wallet,
+    convert_minor,
+    format_minor,
+    from_minor,
+    rounded_to_scale,
+    to_minor,
+)
+from valutatrade_hub.core.utils import now_iso
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.migrate import round_balances
+
+
+def test_minor_units_round_trip() -> None:
+    assert to_minor(12.345, 2) == 1234  # 12.345 во float чуть меньше 12.345
+    assert to_minor(7, 8) == 700_000_000
+    assert from_minor(1234, 2) == 12.34
+    assert rounded_to_scale(0.1, 2) is None
+    assert rounded_to_scale(94.06387272943132, 2) == 94.06
+
+
+def test_wallet_arithmetic_has_no_float_drift() -> None:
+    wallet = Wallet("USD", 0.0, scale=2)
+    for _ in range(10):
+        wallet.deposit(0.1)
+    assert wallet.balance == 1.0 and wallet.balance_minor == 100
+
+    wallet.withdraw(0.3)
+    assert wallet.balance == 0.7
+    with pytest.raises(InsufficientFundsError):
+        wallet.withdraw(0.71)
+    with pytest.raises(ValueError, match="меньше минимальной единицы"):
+        wallet.deposit(0.001)
+    with pytest.raises(ValueError):
+        Wallet("USD", -1.0, scale=2)
+
+
+def test_convert_minor_is_exact_with_bankers_rounding() -> None:
+    # 0.00012345 BTC * 60000.5 USD = 7.4071... USD
+    assert convert_minor(12345, 8, "60000.5", 2) == 741
+    assert convert_minor(5, 2, "0.1", 2) == 0  # 0.5 -> 0
+    assert convert_minor(15, 2, "0.1", 2) == 2  # 1.5 -> 2
+    assert convert_minor(3, 2, 1.1, 2) == 3  # курс берётся как десятичная строка, без хвоста float
+
+
+def test_format_minor_has_no_float_rounding() -> None:
+    assert format_minor(102, 2, 2) == "1.02"
+    assert format_minor(12345678, 8, 4) == "0.1235"
+    assert format_minor(5, 3, 2) == "0.00"  # 0.005 -> 0.00, банковское округление
+    assert format_minor(123_456_789_012_345_678, 2) == "1234567890123456.78"
+
+
+def test_total_value_uses_given_rates_exactly() -> None:
+    portfolio = Portfolio(1, {"USD": Wallet("USD", 0.1), "EUR": Wallet("EUR", 2.03), "BTC": Wallet("BTC", 0.00012345)})
+    rates = {"EUR_USD": {"rate": "0.5"}, "BTC_USD": 60000.5}
+
+    assert portfolio.value_minor("EUR", "USD", rates) == 102  # 1.015 -> 1.02, во float было бы 1.01
+    assert portfolio.get_total_minor("USD", rates) == 10 + 102 + 741
+    assert portfolio.get_total_value("usd", rates) == 8.53
+    with pytest.raises(ValueError, match="Нет курса для BTC->USD"):
+        portfolio.get_total_value("USD", {"EUR_USD": 0.5})
+
+
+def test_total_value_falls_back_to_rates_cache(workdir: Path) -> None:
+    DatabaseManager().merge_rates({"EUR_USD": {"rate": 0.5, "updated_at": now_iso(), "source": "test"}}, now_iso())
+    portfolio = Portfolio(1, {"EUR": Wallet("EUR", 2.03)})
+
+    assert portfolio.get_total_value("USD") == 1.02
+    assert portfolio.get_total_minor("EUR") == 203  # кошелёк в базовой валюте — без курса
+
+
+def test_show_portfolio_totals_are_exact(workdir: Path) -> None:
+    _write_portfolios(workdir, {"USD": 0.1, "EUR": 2.03})
+    DatabaseManager().merge_rates({"EUR_USD": {"rate": 0.5, "updated_at": now_iso(), "source": "test"}}, now_iso())
+
+    result = usecases.show_portfolio(1, "USD")
+    assert [(r["currency"], r["balance"], r["value_in_base"]) for r in result["rows"]] == [
+        ("EUR", "2.03", "1.02"),
+        ("USD", "0.10", "0.10"),
+    ]
+    assert result["total"] == "1.12"
+
+
+def _write_portfolios(workdir: Path, wallets: dict[str, float]) -> Path:
+    path = workdir / "data" / "portfolios.json"
+    path.parent.mkdir(exist_ok=True)
+    path.write_text(
+        json.dumps([{"user_id": 1, "wallets": {code: {"balance": b} for code, b in wallets.items()}}]),
+        encoding="utf-8",
+    )
+    return path
+
+
+def test_round_balances_reports_then_applies(workdir: Path) -> None:
+    path = _write_portfolios(workdir, {"USD": 94.06387272943132, "EUR": 10.5})
+
+    changes = round_balances()
+    assert [(c["currency"], c["old"], c["new"]) for c in changes] == [("USD", 94.06387272943132, 94.06)]
+    assert json.loads(path.read_text(encoding="utf-8"))[0]["wallets"]["USD"]["balance"] == 94.06387272943132
+
+    assert len(round_balances(apply=True)) == 1
+    assert json.loads(path.read_text(encoding="utf-8"))[0]["wallets"]["USD"]["balance"] == 94.06
+    assert round_balances() == []
+
+
+def test_load_flags_rounded_balance(workdir: Path, caplog: pytest.LogCaptureFixture) -> None:
+    _write_portfolios(workdir, {"USD": 94.06387272943132})
+    with caplog.at_level("WARNING", logger="valutatrade"):
+        portfolio = usecases.load_portfolio(1)
+    assert portfolio.get_wallet("USD").balance == 94.06
+    assert "94.06387272943132 -> 94.06" in caplog.text
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.utils import now_iso
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.parser_service.storage import RatesStorage
+
+
+@pytest.fixture
+def user_id(workdir: Path) -> int:
+    uid, _ = usecases.register_user("trader", "secret123")
+    DatabaseManager().write_portfolio(uid, {"USD": {"balance": 1000.0}, "BTC": {"balance": 0.01}})
+    stamp = now_iso()
+    RatesStorage().write_cache(
+        {
+            "BTC_USD": {"rate": 50000.0, "updated_at": stamp, "source": "test"},
+            "EUR_USD": {"rate": 1.25, "updated_at": stamp, "source": "test"},
+        },
+        stamp,
+    )
+    return uid
+
+
+def _balances(uid: int) -> dict[str, float]:
+    return {code: w.balance for code, w in usecases.load_portfolio(uid).wallets.items()}
+
+
+ORDERS: list[dict[str, Any]] = [
+    {"side": "buy", "currency": "EUR", "amount": 400},  # 500 USD
+    {"side": "sell", "currency": "BTC", "amount": 0.005},  # +250 USD
+    {"side": "buy", "currency": "BTC", "amount": 1},  # 50000 USD — не хватит
+]
+
+
+def test_atomic_batch_rolls_back_everything_on_one_failure(user_id: int) -> None:
+    before = _balances(user_id)
+    result = usecases.execute_orders(user_id, ORDERS, atomic=True)
+
+    assert (result["saved"], result["applied"], result["failed"]) == (False, 0, 1)
+    assert [r["status"] for r in result["results"]] == ["rolled_back", "rolled_back", "error"]
+    assert result["results"][2]["error_type"] == "InsufficientFundsError"
+    assert _balances(user_id) == before
+
+
+def test_partial_batch_keeps_successful_orders(user_id: int) -> None:
+    result = usecases.execute_orders(user_id, ORDERS + [{"side": "hold", "currency": "EUR", "amount": 1}], atomic=False)
+
+    assert (result["saved"], result["applied"], result["failed"]) == (True, 2, 2)
+    assert [r["status"] for r in result["results"]] == ["ok", "ok", "error", "error"]
+    # неудачная заявка не оставила следов: откат к контрольной точке перед ней
+    assert _balances(user_id) == {"USD": 750.0, "BTC": 0.005, "EUR": 400.0}
+
+
+def test_atomic_batch_saves_when_all_orders_succeed(user_id: int) -> None:
+    result = usecases.execute_orders(user_id, ORDERS[:2], atomic=True)
+    assert (result["saved"], result["applied"]) == (True, 2)
+    assert _balances(user_id) == {"USD": 750.0, "BTC": 0.005, "EUR": 400.0}
+
+
+def test_empty_batch_is_rejected(user_id: int) -> None:
+    with pytest.raises(ValueError, match="хотя бы одна заявка"):
+        usecases.execute_orders(user_id, [])
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import json
+import random
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.core.rate_book import RateBook
+from valutatrade_hub.infra.rates_cache import RatesCache
+
+CODES = ["USD", "EUR", "BTC", "ETH", "SOL", "JPY"]
+
+
+def _entry(rate: Any, updated_at: str = "2026-02-13T12:00:00+00:00") -> dict[str, Any]:
+    return {"rate": rate, "updated_at": updated_at, "source": "test"}
+
+
+def _random_pairs(seed: int) -> dict[str, dict[str, Any]]:
+    rnd = random.Random(seed)
+    pairs = {}
+    for base in CODES:
+        for quote in CODES:
+            if base != quote and rnd.random() < 0.7:
+                # мало различных курсов — много равенств, проверяется порядок по имени
+                pairs[f"{base}_{quote}"] = _entry(float(rnd.choice([1, 2, 3, 5, 8])))
+    return pairs
+
+
+def _expected_top(pairs: dict[str, dict[str, Any]], keys: list[str], k: int) -> list[str]:
+    return sorted(keys, key=lambda key: (-pairs[key]["rate"], key))[:k]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_top_all_matches_full_sort(seed: int) -> None:
+    pairs = _random_pairs(seed)
+    book = RateBook(pairs)
+    for k in range(1, len(pairs) + 3):
+        assert [key for key, _ in book.top(k)] == _expected_top(pairs, list(pairs), k)
+    assert book.top(0) == []
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_filters_match_brute_force(seed: int) -> None:
+    pairs = _random_pairs(seed)
+    book = RateBook(pairs)
+    for code in CODES + ["XXX"]:
+        by_base = [key for key in pairs if key.split("_")[0] == code]
+        by_quote = [key for key in pairs if key.split("_")[1] == code]
+        assert sorted(book.by_base(code.lower())) == sorted(by_base)
+        assert sorted(book.by_quote(code)) == sorted(by_quote)
+
+        either = sorted(set(by_base) | set(by_quote))
+        assert [key for key, _ in book.select(currency=code)] == either
+        assert [key for key, _ in book.select(quote=code)] == sorted(by_quote)
+        assert [key for key, _ in book.top(3, currency=code)] == _expected_top(pairs, either, 3)
+        assert [key for key, _ in book.top(3, quote=code)] == _expected_top(pairs, by_quote, 3)
+        for quote in CODES:
+            got = [key for key, _ in book.select(currency=code, quote=quote)]
+            if code == quote:
+                assert got == sorted(by_quote)
+            else:
+                assert got == ([f"{code}_{quote}"] if f"{code}_{quote}" in pairs else [])
+
+
+def test_invalid_entries_are_skipped() -> None:
+    book = RateBook(
+        {
+            "BTC_USD": _entry(60000),
+            "BROKEN": _entry(1.0),
+            "ETH_USD": "not a dict",
+            "SOL_USD": {"updated_at": "2026-02-13T12:00:00+00:00"},
+            "XRP_USD": _entry("0.5"),
+            "DOGE_USD": _entry(True),
+        },
+        "2026-02-13T12:00:00+00:00",
+    )
+    assert len(book) == 1 and "BTC_USD" in book and "XRP_USD" not in book
+    assert book.lookup("BTC", "USD")["rate"] == 60000
+    assert book.lookup("USD", "BTC") is None
+    assert book.by_quote("USD") == ["BTC_USD"]
+    assert book.last_refresh == "2026-02-13T12:00:00+00:00"
+
+
+def _write_rates(workdir: Path, pairs: dict[str, Any]) -> None:
+    (workdir / "data").mkdir(exist_ok=True)
+    (workdir / "data" / "rates.json").write_text(
+        json.dumps({"pairs": pairs, "last_refresh": None}), encoding="utf-8"
+    )
+
+
+def _ago(seconds: int) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds)).replace(microsecond=0).isoformat()
+
+
+def test_stale_direct_entry_falls_back_to_fresh_cross_rate(workdir: Path) -> None:
+    oldest_leg = _ago(20)
+    _write_rates(
+        workdir,
+        {
+            "BTC_EUR": _entry(1.0, _ago(3600)),
+            "BTC_USD": _entry(60000.0, _ago(10)),
+            "EUR_USD": _entry(1.25, oldest_leg),
+        },
+    )
+    info = usecases.get_rate("BTC", "EUR")
+    assert float(info["rate"]) == pytest.approx(48000.0)
+    assert info["source"] == "cross via USD"
+    assert info["updated_at"] == oldest_leg
+
+
+def test_stale_entries_without_fresh_cross_raise(workdir: Path) -> None:
+    _write_rates(workdir, {"BTC_USD": _entry(60000.0, _ago(3600)), "EUR_USD": _entry(1.25, _ago(10))})
+    with pytest.raises(ApiRequestError, match="устарели"):
+        usecases.get_rate("BTC", "EUR")
+    with pytest.raises(ApiRequestError):
+        usecases.get_rate("BTC", "USD")
+    assert float(usecases.get_rate("EUR", "USD")["rate"]) == 1.25
+
+
+def test_book_is_rebuilt_for_a_new_snapshot(workdir: Path) -> None:
+    _write_rates(workdir, {"BTC_USD": _entry(1.0)})
+    first = RatesCache().rate_book()
+    assert RatesCache().rate_book() is first
+
+    RatesCache().invalidate()
+    _write_rates(workdir, {"BTC_USD": _entry(2.0), "ETH_USD": _entry(3.0)})
+    second = RatesCache().rate_book()
+    assert second is not first
+    assert [key for key, _ in second.top(5)] == ["ETH_USD", "BTC_USD"]
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import random
+import time as real_time
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.parser_service import resilience
+from valutatrade_hub.parser_service.resilience import CircuitBreaker, HedgedClient, ResilientClient, RetryPolicy
+
+
+class FakeTime:
+    """Подменяет модуль time в resilience: monotonic — управляемые часы, sleep их сдвигает."""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class FlakyClient:
+    """Падает первые failures вызовов; вызов «длится» duration секунд, но не дольше дедлайна."""
+
+    name = "Flaky"
+
+    def __init__(self, clock: FakeTime, failures: int, duration: float = 0.0, retryable: bool = True) -> None:
+        self.clock = clock
+        self.failures = failures
+        self.duration = duration
+        self.retryable = retryable
+        self.deadlines: list[float | None] = []
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, Any]:
+        self.deadlines.append(deadline)
+        self.clock.now += self.duration if deadline is None else min(self.duration, deadline - self.clock.now)
+        if len(self.deadlines) <= self.failures:
+            raise ApiRequestError("boom", retryable=self.retryable)
+        return {"BTC_USD": {"rate": 1.0}}
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeTime:
+    fake = FakeTime()
+    monkeypatch.setattr(resilience, "time", fake)
+    return fake
+
+
+def _resilient(client: FlakyClient, attempts: int = 3, budget: float = 25.0, threshold: int = 2) -> ResilientClient:
+    return ResilientClient(
+        client,
+        retry=RetryPolicy(attempts=attempts, base_delay=1.0, max_delay=4.0, budget=budget),
+        breaker=CircuitBreaker(failure_threshold=threshold, reset_timeout=60.0),
+        rng=random.Random(1),
+    )
+
+
+def test_retries_until_success(clock: FakeTime) -> None:
+    client = FlakyClient(clock, failures=2)
+    wrapped = _resilient(client)
+    assert wrapped.fetch_rates() == {"BTC_USD": {"rate": 1.0}}
+    assert len(client.deadlines) == 3
+    assert wrapped.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_non_retryable_error_is_not_retried(clock: FakeTime) -> None:
+    client = FlakyClient(clock, failures=5, retryable=False)
+    with pytest.raises(ApiRequestError):
+        _resilient(client).fetch_rates()
+    assert len(client.deadlines) == 1
+
+
+def test_request_timeout_fits_retry_budget(clock: FakeTime) -> None:
+    # попытки по 10 с: третья укорачивается до остатка бюджета, четвёртой нет
+    client = FlakyClient(clock, failures=5, duration=10.0)
+    start = clock.now
+    with pytest.raises(ApiRequestError):
+        _resilient(client, attempts=5, budget=25.0).fetch_rates()
+    assert all(deadline == start + 25.0 for deadline in client.deadlines)
+    assert clock.now - start == 25.0
+    assert len(client.deadlines) == 3
+
+
+def test_caller_deadline_wins_over_budget(clock: FakeTime) -> None:
+    client = FlakyClient(clock, failures=0)
+    _resilient(client).fetch_rates(deadline=clock.now + 5.0)
+    assert client.deadlines == [clock.now + 5.0]
+
+
+def test_breaker_opens_half_opens_and_closes(clock: FakeTime) -> None:
+    client = FlakyClient(clock, failures=3, retryable=False)
+    wrapped = _resilient(client, threshold=2)
+
+    for _ in range(2):
+        with pytest.raises(ApiRequestError):
+            wrapped.fetch_rates()
+    assert wrapped.breaker.state == CircuitBreaker.OPEN
+
+    # разомкнут: источник не опрашивается
+    with pytest.raises(ApiRequestError, match="временно отключён"):
+        wrapped.fetch_rates()
+    assert len(client.deadlines) == 2
+
+    # после reset_timeout — одна пробная попытка; неудача снова размыкает
+    clock.now += 60.0
+    with pytest.raises(ApiRequestError):
+        wrapped.fetch_rates()
+    assert wrapped.breaker.state == CircuitBreaker.OPEN
+    assert len(client.deadlines) == 3
+
+    clock.now += 60.0
+    assert wrapped.fetch_rates() == {"BTC_USD": {"rate": 1.0}}
+    assert wrapped.breaker.state == CircuitBreaker.CLOSED
+
+
+class SleepyClient:
+    """Отвечает через delay секунд реального времени; помнит найденные валюты."""
+
+    def __init__(self, name: str, delay: float, code: str) -> None:
+        self.name = name
+        self.delay = delay
+        self.not_modified = False
+        self._discovered = {code: {"type": "crypto"}}
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, Any]:
+        real_time.sleep(self.delay)
+        return {"BTC_USD": {"rate": 1.0, "source": self.name}}
+
+    def pop_discovered(self) -> dict[str, dict[str, Any]]:
+        discovered, self._discovered = self._discovered, {}
+        return discovered
+
+
+def _hedged(primary_delay: float, secondary_delay: float) -> HedgedClient:
+    return HedgedClient(
+        ResilientClient(SleepyClient("primary", primary_delay, "AAA")),
+        ResilientClient(SleepyClient("secondary", secondary_delay, "BBB")),
+        fallback_delay=0.05,
+    )
+
+
+def test_slow_primary_loses_to_secondary() -> None:
+    hedged = _hedged(primary_delay=1.0, secondary_delay=0.0)
+    start = real_time.monotonic()
+    assert hedged.fetch_rates()["BTC_USD"]["source"] == "secondary"
+    assert real_time.monotonic() - start < 0.5
+    assert set(hedged.pop_discovered()) == {"AAA", "BBB"}
+    assert hedged.sample_count() == 0  # атрибуты основного клиента доступны через обёртку
+
+
+def test_fast_primary_needs_no_hedge() -> None:
+    hedged = _hedged(primary_delay=0.0, secondary_delay=0.0)
+    assert hedged.fetch_rates()["BTC_USD"]["source"] == "primary"
+    assert set(hedged.pop_discovered()) == {"AAA", "BBB"}
+
+
+def test_hedged_wait_is_bounded_by_deadline() -> None:
+    hedged = _hedged(primary_delay=1.0, secondary_delay=1.0)
+    start = real_time.monotonic()
+    with pytest.raises(ApiRequestError, match="до дедлайна"):
+        hedged.fetch_rates(deadline=start + 0.2)
+    assert real_time.monotonic() - start < 0.5
+
+
+def test_build_updater_hedges_only_when_enabled(workdir: Any) -> None:
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.updater import build_updater
+
+    assert not any(isinstance(c, HedgedClient) for c in build_updater(ParserConfig()).clients)
+    hedged = build_updater(ParserConfig(HEDGE_REQUESTS=True)).clients
+    assert all(isinstance(c, HedgedClient) for c in hedged)
+    assert [c.name for c in hedged] == ["CoinGeckoClient", "ExchangeRateApiClient"]
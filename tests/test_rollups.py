@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.utils import from_epoch, parse_time
+from valutatrade_hub.parser_service.rollups import RollupStore
+
+T0 = 1_770_000_000 - 1_770_000_000 % 3600
+
+
+def _tick(ts: int, rate: float) -> dict[str, object]:
+    return {"from_currency": "BTC", "to_currency": "USD", "rate": rate, "timestamp": from_epoch(ts)}
+
+
+def _ohlc(bars: list[dict[str, object]]) -> list[tuple[object, ...]]:
+    return [(b["open"], b["high"], b["low"], b["close"], b["count"], b["closed"]) for b in bars]
+
+
+def test_bars_aggregate_and_ignore_late_ticks(tmp_path: Path) -> None:
+    store = RollupStore(str(tmp_path), intervals=["1h"])
+    assert store.update([_tick(T0 + 60, 2.0), _tick(T0, 1.0), _tick(T0 + 120, 0.5)]) == 0
+    assert store.update([_tick(T0 + 30, 9.0), _tick(T0 + 3600, 4.0)]) == 1  # T0+30 опоздал
+    assert _ohlc(store.bars("BTC_USD", "1h")) == [(1.0, 2.0, 0.5, 0.5, 3, True), (4.0, 4.0, 4.0, 4.0, 1, False)]
+    assert _ohlc(store.bars("BTC_USD", "1h", since=T0 + 1)) == [(4.0, 4.0, 4.0, 4.0, 1, False)]
+    assert _ohlc(store.bars("BTC_USD", "1h", limit=1)) == [(4.0, 4.0, 4.0, 4.0, 1, False)]
+
+
+def test_bar_closed_twice_after_crash_is_read_once(tmp_path: Path) -> None:
+    store = RollupStore(str(tmp_path), intervals=["1h"])
+    for hour in range(3):
+        store.update([_tick(T0 + hour * 3600, float(hour))])
+    saved = tmp_path / "saved-open.json"
+    shutil.copy(tmp_path / "open.json", saved)
+    store.update([_tick(T0 + 3 * 3600, 3.0)])
+
+    # сбой после дозаписи закрытого бара, но до сохранения open.json: бар закроется повторно
+    shutil.copy(saved, tmp_path / "open.json")
+    store.update([_tick(T0 + 3 * 3600, 3.0)])
+    assert len((tmp_path / "1h" / "BTC_USD.jsonl").read_text(encoding="utf-8").splitlines()) == 4
+
+    bars = store.bars("BTC_USD", "1h")
+    assert [b["start"] for b in bars] == [from_epoch(T0 + h * 3600) for h in range(4)]
+    assert _ohlc(store.bars("BTC_USD", "1h", since=T0 + 2 * 3600))[0] == (2.0, 2.0, 2.0, 2.0, 1, True)
+
+
+def test_torn_bar_line_is_skipped(tmp_path: Path) -> None:
+    store = RollupStore(str(tmp_path), intervals=["1h"])
+    store.update([_tick(T0, 1.0), _tick(T0 + 3600, 2.0)])
+    with open(tmp_path / "1h" / "BTC_USD.jsonl", "ab") as f:
+        f.write(b'{"t":')
+    assert [b["count"] for b in store.bars("BTC_USD", "1h")] == [1, 1]
+    assert [b["count"] for b in store.bars("BTC_USD", "1h", since=T0 + 1)] == [1]
+
+
+def test_parse_time() -> None:
+    assert parse_time("90m", now=10_000) == 10_000 - 5400
+    assert parse_time("2026-02-13T00:00:00Z") == parse_time("2026-02-13T00:00:00")
+    with pytest.raises(ValueError, match="Некорректное время"):
+        parse_time("yesterday")
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.infra.locks import LockTimeoutError
+from valutatrade_hub.parser_service.scheduler import RatesScheduler, SourceSchedule
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeStop:
+    """Вместо ожидания Event двигает фейковые часы."""
+
+    def __init__(self, clock: FakeClock) -> None:
+        self.clock = clock
+
+    def wait(self, timeout: float) -> bool:
+        self.clock.now += timeout
+        return False
+
+    def is_set(self) -> bool:
+        return False
+
+    def set(self) -> None:
+        pass
+
+
+class MaxRng:
+    def uniform(self, a: float, b: float) -> float:
+        return b
+
+
+class FakeUpdater:
+    def __init__(self, clock: FakeClock, durations: list[float], outcomes: list[Any] | None = None) -> None:
+        self.clock = clock
+        self.durations = durations
+        self.outcomes = outcomes or []
+        self.started: list[float] = []
+
+    def run_update(self, source: str | None = None) -> dict[str, Any]:
+        self.started.append(self.clock.now)
+        n = len(self.started) - 1
+        self.clock.now += self.durations[n] if n < len(self.durations) else 1.0
+        outcome = self.outcomes[n] if n < len(self.outcomes) else "ok"
+        if isinstance(outcome, Exception):
+            raise outcome
+        if outcome == "api_error":
+            return {"updated_count": 0, "errors": ["нет ответа"], "last_refresh": None, "unchanged": []}
+        return {"updated_count": 3, "errors": [], "last_refresh": "x", "unchanged": []}
+
+
+def _scheduler(updater: FakeUpdater, clock: FakeClock, **kwargs: Any) -> RatesScheduler:
+    sched = RatesScheduler(updater, [SourceSchedule("coingecko", 60.0, **kwargs)], clock=clock, rng=MaxRng())
+    sched._stop = FakeStop(clock)  # type: ignore[assignment]
+    return sched
+
+
+def test_grid_does_not_drift_with_run_duration(workdir: Any) -> None:
+    clock = FakeClock()
+    updater = FakeUpdater(clock, [7.0, 13.0, 2.0, 30.0])
+    _scheduler(updater, clock).run(max_runs=4)
+    assert updater.started == [1000.0, 1060.0, 1120.0, 1180.0]
+
+
+@pytest.mark.parametrize(
+    ("policy", "expected", "skipped"),
+    [
+        # первое обновление длится 200 с: пропущены окна 1060, 1120, 1180
+        ("skip", [1000.0, 1240.0], 3),
+        ("run_once", [1000.0, 1200.0, 1240.0], 2),
+        ("catch_up", [1000.0, 1200.0, 1201.0, 1202.0], 0),
+    ],
+)
+def test_missed_policies(workdir: Any, policy: str, expected: list[float], skipped: int) -> None:
+    clock = FakeClock()
+    updater = FakeUpdater(clock, [200.0, 1.0, 1.0, 1.0])
+    sched = _scheduler(updater, clock, missed_policy=policy)
+    sched.run(max_runs=len(expected))
+    assert updater.started == expected
+    assert sched.metrics()["coingecko"]["skipped_slots"] == skipped
+
+
+def test_storage_error_does_not_stop_scheduler_and_keeps_grid(workdir: Any) -> None:
+    clock = FakeClock()
+    updater = FakeUpdater(
+        clock,
+        [1.0, 1.0, 1.0, 1.0],
+        ["ok", LockTimeoutError("data/rates.json", 10), "ok", "ok"],
+    )
+    sched = _scheduler(updater, clock, max_backoff=900.0)
+    sched.run(max_runs=4)
+
+    # повтор через backoff (60 * 2 = 120 с после окончания), затем снова окна сетки 1000 + 60k
+    assert updater.started == [1000.0, 1060.0, 1181.0, 1240.0]
+    stats = sched.metrics()["coingecko"]
+    assert stats["failures"] == 1
+    assert stats["consecutive_failures"] == 0
+    assert sched.history[1]["status"] == "error"
+    assert "LockTimeoutError" in sched.history[1]["errors"][0]
+
+
+def test_backoff_grows_and_is_capped(workdir: Any) -> None:
+    clock = FakeClock()
+    updater = FakeUpdater(clock, [0.0] * 5, ["api_error"] * 4 + ["ok"])
+    sched = _scheduler(updater, clock, max_backoff=300.0)
+    sched.run(max_runs=5)
+    gaps = [b - a for a, b in zip(updater.started, updater.started[1:])]
+    assert gaps == [120.0, 240.0, 300.0, 300.0]
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.infra.database import make_store
+from valutatrade_hub.infra.migrate import migrate_json_to_sharded
+from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.infra.sharded_store import ShardedJsonStore
+
+SHARDS = Path("data/portfolios")
+
+
+def _shard_files() -> list[str]:
+    return sorted(p.name for p in SHARDS.glob("*.json"))
+
+
+def test_portfolios_are_placed_by_user_id_mod_shards(workdir: Path) -> None:
+    store = ShardedJsonStore(SettingsLoader())
+    for user_id in (1, 257, 2, 511):
+        store.add_portfolio(user_id)
+    store.write_portfolio(257, {"USD": {"balance": 10.5}})
+    with pytest.raises(ValueError):
+        store.write_portfolio(3, {})
+
+    assert _shard_files() == ["0001.json", "0002.json", "0255.json", "_meta.json"]
+    assert json.loads((SHARDS / "0001.json").read_text(encoding="utf-8")) == {"1": {}, "257": {"USD": {"balance": 10.5}}}
+    assert json.loads((SHARDS / "_meta.json").read_text(encoding="utf-8")) == {"shards": 256}
+    assert store.read_portfolio(257) == {"USD": {"balance": 10.5}}
+    assert store.read_portfolio(3) is None
+    assert [p["user_id"] for p in store.read_portfolios()] == [1, 2, 257, 511]
+    assert store.portfolio_document(513) == str(SHARDS / "0001.json")
+    assert store.read_portfolio_document(str(SHARDS / "0001.json")) == {1: {}, 257: {"USD": {"balance": 10.5}}}
+
+
+def test_shard_count_is_pinned_by_meta(workdir: Path) -> None:
+    settings = SettingsLoader()
+    settings._data["PORTFOLIO_SHARDS"] = 4
+    ShardedJsonStore(settings).add_portfolio(5)
+
+    # смена настройки не переносит портфели в другие корзины: действует _meta.json
+    settings._data["PORTFOLIO_SHARDS"] = 16
+    store = ShardedJsonStore(settings)
+    assert store.read_portfolio(5) == {}
+    assert store.portfolio_document(5) == str(SHARDS / "0001.json")
+
+
+def test_invalid_shard_count(workdir: Path) -> None:
+    settings = SettingsLoader()
+    settings._data["PORTFOLIO_SHARDS"] = 0
+    with pytest.raises(ValueError, match="PORTFOLIO_SHARDS"):
+        ShardedJsonStore(settings)
+
+
+def test_migration_round_trip(workdir: Path) -> None:
+    settings = SettingsLoader()
+    source = make_store(settings, "json")
+    portfolios = [{"user_id": uid, "wallets": {"USD": {"balance": float(uid)}}} for uid in (1, 2, 257, 1000)]
+    source.write_portfolios(portfolios)
+
+    target = ShardedJsonStore(settings)
+    target.add_portfolio(42)  # устаревшая корзина, которой нет в источнике
+    assert migrate_json_to_sharded(settings) == {"portfolios": 4}
+
+    assert target.read_portfolios() == portfolios
+    assert _shard_files() == ["0001.json", "0002.json", "0232.json", "_meta.json"]
+    # повторная миграция ничего не меняет
+    assert migrate_json_to_sharded(settings) == {"portfolios": 4}
+    assert make_store(settings, "sharded").read_portfolios() == portfolios
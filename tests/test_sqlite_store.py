@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from valutatrade_hub.infra.database import make_store
+from valutatrade_hub.infra.migrate import migrate_json_to_sqlite
+from valutatrade_hub.infra.settings import SettingsLoader
+
+DB = "data/valutatrade.db"
+
+
+def _scenario(store: Any) -> list[Any]:
+    """Одна и та же последовательность операций; результат сравнивается между бэкендами."""
+    out: list[Any] = []
+    alice = store.add_user("alice", "hash-a", "salt-a", "2026-01-01T00:00:00")
+    bob = store.add_user("bob", "hash-b", "salt-b", "2026-01-02T00:00:00")
+    with pytest.raises(ValueError):
+        store.add_user("alice", "x", "y", "2026-01-03T00:00:00")
+    out += [alice, bob, store.find_user("bob"), store.find_user("nobody")]
+
+    store.add_portfolio(alice)
+    store.add_portfolio(bob)
+    # балансы в пределах scale валют — так их пишет Portfolio
+    store.write_portfolio(alice, {"USD": {"balance": 1234.56}, "BTC": {"balance": 0.12345678}})
+    with pytest.raises(ValueError):
+        store.write_portfolio(999, {})
+    out += [store.read_portfolio(alice), store.read_portfolio(bob), store.read_portfolio(999)]
+    out.append(sorted(store.read_portfolios(), key=lambda p: p["user_id"]))
+
+    store.merge_rates({"BTC_USD": {"rate": 60000.5, "updated_at": "2026-02-13T12:00:00Z", "source": "CoinGecko"}},
+                      "2026-02-13T12:00:00Z")
+    store.merge_rates({"BTC_USD": {"rate": 1.0, "updated_at": "2026-02-13T11:00:00Z", "source": "old"},
+                       "EUR_USD": {"rate": 1.08, "updated_at": "2026-02-13T12:00:00Z", "source": "ExchangeRate"}},
+                      "2026-02-13T12:05:00Z")
+    store.touch_rates(["EUR_USD", "XRP_USD"], "2026-02-13T12:10:00Z")
+    out.append(store.read_rates())
+    return out
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "sharded"])
+def test_backends_behave_the_same(workdir: Path, backend: str) -> None:
+    settings = SettingsLoader()
+    json_result = _scenario(make_store(settings, "json"))
+    settings._data["USERS_PATH"] = "data/other/users.json"
+    settings._data["USERS_SEQ_PATH"] = "data/other/users.seq"
+    settings._data["RATES_PATH"] = "data/other/rates.json"
+    assert _scenario(make_store(settings, backend)) == json_result
+    assert json_result[4] == {"USD": {"balance": 1234.56}, "BTC": {"balance": 0.12345678}}
+
+
+def test_balances_are_integer_minor_units(workdir: Path) -> None:
+    store = make_store(SettingsLoader(), "sqlite")
+    user_id = store.add_user("alice", "h", "s", "2026-01-01T00:00:00")
+    store.add_portfolio(user_id)
+    store.write_portfolio(user_id, {"usd": {"balance": 0.1 + 0.2}, "BTC": {"balance": 1e-8}, "ETH": "junk"})
+
+    with sqlite3.connect(DB) as conn:
+        rows = conn.execute(
+            "SELECT currency_code, balance_minor, scale, typeof(balance_minor) FROM wallets ORDER BY currency_code"
+        ).fetchall()
+    assert rows == [("BTC", 1, 8, "integer"), ("ETH", 0, 8, "integer"), ("USD", 30, 2, "integer")]
+    assert store.read_portfolio(user_id)["USD"] == {"balance": 0.3}
+
+
+def test_legacy_real_balances_are_upgraded(workdir: Path) -> None:
+    (workdir / "data").mkdir()
+    with sqlite3.connect(DB) as conn:
+        conn.executescript(
+            """
+            CREATE TABLE portfolios (user_id INTEGER PRIMARY KEY);
+            CREATE TABLE wallets (
+                user_id INTEGER NOT NULL, currency_code TEXT NOT NULL, balance REAL NOT NULL,
+                PRIMARY KEY (user_id, currency_code)
+            ) WITHOUT ROWID;
+            INSERT INTO portfolios VALUES (1);
+            INSERT INTO wallets VALUES (1, 'USD', 0.30000000000000004), (1, 'BTC', 0.123456789);
+            """
+        )
+
+    store = make_store(SettingsLoader(), "sqlite")
+    assert store.read_portfolio(1) == {"USD": {"balance": 0.3}, "BTC": {"balance": 0.12345679}}
+    with sqlite3.connect(DB) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+        columns = [r[1] for r in conn.execute("PRAGMA table_info(wallets)")]
+    assert columns == ["user_id", "currency_code", "balance_minor", "scale"]
+
+
+def test_migration_copies_json_store(workdir: Path) -> None:
+    settings = SettingsLoader()
+    source = make_store(settings, "json")
+    expected = _scenario(source)
+
+    assert migrate_json_to_sqlite(settings) == {"users": 2, "portfolios": 2, "rates": 2}
+    target = make_store(settings, "sqlite")
+    assert target.read_users() == source.read_users()
+    assert target.read_portfolios() == source.read_portfolios()
+    assert target.read_rates() == expected[-1]
+    # id продолжаются после перенесённых
+    assert target.add_user("carol", "h", "s", "2026-01-04T00:00:00") == 3
+
+
+def test_failed_migration_rolls_back(workdir: Path) -> None:
+    settings = SettingsLoader()
+    target = make_store(settings, "sqlite")
+    target.add_user("existing", "h", "s", "2026-01-01T00:00:00")
+
+    source = make_store(settings, "json")
+    source.add_user("alice", "h", "s", "2026-01-01T00:00:00")
+    source.add_portfolio(1)
+    # битый курс: перенос падает на последнем шаге, после пользователей и портфелей
+    source.write_rates({"pairs": {"BTC_USD": {"rate": "oops", "updated_at": "2026-02-13T12:00:00Z"}}})
+
+    with pytest.raises(ValueError):
+        migrate_json_to_sqlite(settings)
+    target = make_store(settings, "sqlite")
+    assert [u["username"] for u in target.read_users()] == ["existing"]
+    assert target.read_portfolios() == []
+    assert target.read_rates() == {"pairs": {}, "last_refresh": None}
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.utils import append_json_item
+from valutatrade_hub.infra import users as users_module
+from valutatrade_hub.infra.users import UserRepository
+
+
+def _repo(tmp_path: Path) -> UserRepository:
+    return UserRepository(str(tmp_path / "users.json"), str(tmp_path / "user_seq.json"))
+
+
+def test_add_and_get(tmp_path: Path) -> None:
+    repo = _repo(tmp_path)
+    assert repo.add("alice", "h", "s", "2026-01-01T00:00:00") == 1
+    assert repo.add("bob", "h", "s", "2026-01-01T00:00:00") == 2
+    assert repo.get("bob")["user_id"] == 2
+    with pytest.raises(ValueError, match="уже занято"):
+        repo.add("alice", "h", "s", "2026-01-01T00:00:00")
+    assert _repo(tmp_path).get("alice")["user_id"] == 1
+
+
+def test_external_change_is_checked_once_per_interval(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [100.0]
+    monkeypatch.setattr(users_module.time, "monotonic", lambda: now[0])
+    repo = _repo(tmp_path)
+    repo.add("alice", "h", "s", "2026-01-01T00:00:00")
+    assert repo.get("alice") is not None
+
+    # запись другим процессом
+    append_json_item(str(tmp_path / "users.json"), {"user_id": 7, "username": "eve"})
+    assert repo.get("eve") is None
+    now[0] += users_module._RELOAD_CHECK_SECONDS
+    assert repo.get("eve")["user_id"] == 7
+
+
+def test_add_always_sees_external_users(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(users_module.time, "monotonic", lambda: 100.0)
+    repo = _repo(tmp_path)
+    repo.add("alice", "h", "s", "2026-01-01T00:00:00")
+    append_json_item(str(tmp_path / "users.json"), {"user_id": 7, "username": "eve"})
+    with pytest.raises(ValueError):
+        repo.add("eve", "h", "s", "2026-01-01T00:00:00")
+    assert repo.add("mallory", "h", "s", "2026-01-01T00:00:00") == 8
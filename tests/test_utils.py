@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core.utils import append_json_item, file_stamp, iter_json_array
+
+
+def test_append_json_item_keeps_array_valid(tmp_path: Path) -> None:
+    path = tmp_path / "users.json"
+    append_json_item(str(path), {"user_id": 1})
+    append_json_item(str(path), {"user_id": 2, "name": "Ёж"})
+    assert json.loads(path.read_text(encoding="utf-8")) == [{"user_id": 1}, {"user_id": 2, "name": "Ёж"}]
+
+    path.write_text("[]\n", encoding="utf-8")
+    append_json_item(str(path), {"user_id": 3})
+    assert json.loads(path.read_text(encoding="utf-8")) == [{"user_id": 3}]
+
+
+def test_append_json_item_replaces_file_atomically(tmp_path: Path) -> None:
+    path = tmp_path / "portfolios.json"
+    path.write_text(json.dumps([{"user_id": 1}], indent=2), encoding="utf-8")
+
+    # читатель, открывший файл до дозаписи, дочитывает старый массив целиком
+    with open(path, encoding="utf-8") as reader:
+        append_json_item(str(path), {"user_id": 2})
+        assert json.load(reader) == [{"user_id": 1}]
+    assert [u["user_id"] for u in iter_json_array(str(path))] == [1, 2]
+    assert [p.name for p in tmp_path.iterdir()] == ["portfolios.json"]
+
+
+def test_append_json_item_rejects_non_array(tmp_path: Path) -> None:
+    path = tmp_path / "broken.json"
+    path.write_text('{"a": 1}', encoding="utf-8")
+    with pytest.raises(ValueError, match="не является JSON-массивом"):
+        append_json_item(str(path), {"user_id": 1})
+    assert path.read_text(encoding="utf-8") == '{"a": 1}'
+    assert [p.name for p in tmp_path.iterdir()] == ["broken.json"]
+
+
+def test_append_json_item_returns_stamp_of_new_file(tmp_path: Path) -> None:
+    path = tmp_path / "users.json"
+    assert append_json_item(str(path), {"user_id": 1}) == file_stamp(str(path))
+    assert append_json_item(str(path), {"user_id": 2}) == file_stamp(str(path))
@@ -1,28 +1,100 @@
 from __future__ import annotations
 
+import json
+import os
 import shlex
+import sys
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Iterable, TextIO
 
-from prettytable import PrettyTable
-
-from valutatrade_hub.core.currencies import list_supported_codes
 from valutatrade_hub.core.exceptions import (
     ApiRequestError,
     CurrencyNotFoundError,
     InsufficientFundsError,
 )
-from valutatrade_hub.core.usecases import (
-    buy_currency,
-    get_rate,
-    login_user,
-    register_user,
-    sell_currency,
-    show_portfolio,
+from valutatrade_hub.infra.locks import LockTimeoutError, VersionConflictError
+from valutatrade_hub.infra.settings import SettingsLoader
+
+if TYPE_CHECKING:
+    from prettytable import PrettyTable
+
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+# Сценарии, парсер курсов, prettytable и логирование импортируются в обработчиках команд:
+# короткий вызов (help, get-rate) не платит за модули, которые ему не нужны.
+# Бюджет времени импорта проверяет benchmarks/bench_import_time.py.
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_AUTH = 3
+EXIT_FUNDS = 4
+EXIT_CURRENCY = 5
+EXIT_API = 6
+EXIT_BUSY = 7
+EXIT_IO = 8
+
+HELP_LINES = (
+    "register --username <str> --password <str>",
+    "login --username <str> --password <str>",
+    "show-portfolio [--base <str>]",
+    "buy --currency <str> --amount <float>",
+    "sell --currency <str> --amount <float>",
+    "orders (--file <path> | --orders \"buy BTC 0.01; sell ETH 0.5\") [--mode atomic|partial]",
+    "get-rate --from <str> --to <str> [--at <ISO|7d> [--mode last|nearest|linear]]",
+    "update-rates [--source <coingecko|exchangerate>]",
+    "show-rates [--currency <str>] [--top <int>] [--base <str>]",
+    "rate-bars --pair <FROM_TO> [--interval 1m|1h|1d] [--since <ISO|7d>] [--until <ISO|1h>] [--limit <int>]",
+    "metrics [--file <path>] [--export <path>]",
+    "exit",
 )
-from valutatrade_hub.logging_config import setup_logging
-from valutatrade_hub.parser_service.api_clients import CoinGeckoClient, ExchangeRateApiClient
-from valutatrade_hub.parser_service.config import ParserConfig
-from valutatrade_hub.parser_service.storage import RatesStorage
-from valutatrade_hub.parser_service.updater import RatesUpdater
+
+_updater: RatesUpdater | None = None
+
+# реестр валют может содержать сотни кодов: в подсказке об ошибке — только первые
+_SHOWN_CODES = 30
+
+
+class UsageError(ValueError):
+    """Неизвестная команда или неверные аргументы."""
+
+
+class LoginRequiredError(Exception):
+    """Команда требует входа."""
+
+    def __init__(self) -> None:
+        super().__init__("Сначала выполните login")
+
+
+@dataclass
+class Session:
+    """Состояние между командами: вошедший пользователь."""
+
+    user_id: int | None = None
+    username: str | None = None
+
+    def require_login(self) -> int:
+        if self.user_id is None:
+            raise LoginRequiredError()
+        return self.user_id
+
+
+@dataclass
+class CommandResult:
+    command: str
+    data: dict[str, Any] = field(default_factory=dict)
+    exit_code: int = 0
+
+
+def _get_updater() -> RatesUpdater:
+    """Один набор клиентов на процесс: HTTP-сессии, ETag и размыкатели живут между командами."""
+    global _updater
+    if _updater is None:
+        from valutatrade_hub.parser_service.updater import build_updater
+
+        _updater = build_updater()
+    return _updater
+
 
 def _parse_kv(parts: list[str]) -> dict[str, str]:
     args: dict[str, str] = {}
@@ -30,31 +102,437 @@ def _parse_kv(parts: list[str]) -> dict[str, str]:
     while i < len(parts):
         key = parts[i]
         if not key.startswith("--"):
-            raise ValueError(f"Неизвестный аргумент: {key}")
+            raise UsageError(f"Неизвестный аргумент: {key}")
         if i + 1 >= len(parts):
-            raise ValueError(f"Нет значения для {key}")
+            raise UsageError(f"Нет значения для {key}")
         args[key] = parts[i + 1]
         i += 2
     return args
 
 
-def _print_help() -> None:
-    print("Команды:")
-    print("  register --username <str> --password <str>")
-    print("  login --username <str> --password <str>")
-    print("  show-portfolio [--base <str>]")
-    print("  buy --currency <str> --amount <float>")
-    print("  sell --currency <str> --amount <float>")
-    print("  get-rate --from <str> --to <str>")
-    print("  update-rates [--source <coingecko|exchangerate>]")
-    print("  show-rates [--currency <str>] [--top <int>] [--base <str>]")
-    print("  exit")
+def _ms(value: float | None) -> str:
+    return "-" if value is None else f"{value * 1000:.3f}"
+
+
+def _table(field_names: list[str]) -> PrettyTable:
+    from prettytable import PrettyTable
+
+    table = PrettyTable()
+    table.field_names = field_names
+    return table
+
+
+def _collect_metrics(source_path: str, export_path: str | None = None) -> dict[str, Any]:
+    """Метрики из файла, выгруженного планировщиком, а если его нет — метрики этого процесса.
+
+    Файл демона только читается: --export пишет метрики процесса в отдельный путь.
+    """
+    from valutatrade_hub.infra.metrics import Histogram, MetricsRegistry, parse_prometheus
+
+    registry = MetricsRegistry()
+    if export_path is not None:
+        if os.path.abspath(export_path) == os.path.abspath(source_path):
+            raise UsageError(f"{source_path} пишет планировщик: укажите для --export другой путь")
+        registry.export(export_path)
+
+    if os.path.exists(source_path):
+        with open(source_path, "r", encoding="utf-8") as f:
+            families = parse_prometheus(f.read())
+        source = source_path
+    else:
+        families = registry.families()
+        source = None
+
+    histograms: list[dict[str, Any]] = []
+    values: list[dict[str, Any]] = []
+    for family in families:
+        if isinstance(family, Histogram):
+            for row in family.summary():
+                histograms.append({"metric": family.name, **row})
+        else:
+            for name, labels, value in family.samples():
+                values.append({"metric": name, "labels": dict(labels), "value": value})
+    return {"histograms": histograms, "values": values, "source": source, "export_path": export_path}
+
+
+_ORDER_ERROR_CODES = {
+    "InsufficientFundsError": EXIT_FUNDS,
+    "CurrencyNotFoundError": EXIT_CURRENCY,
+    "ApiRequestError": EXIT_API,
+}
+
+
+def _parse_order_lines(lines: Iterable[str]) -> list[dict[str, Any]]:
+    """Заявки в виде 'buy BTC 0.01 [USD]', по одной на строку или через ';'."""
+    orders: list[dict[str, Any]] = []
+    for raw in lines:
+        for chunk in raw.split(";"):
+            chunk = chunk.strip()
+            if chunk == "" or chunk.startswith("#"):
+                continue
+            fields = chunk.split()
+            if len(fields) not in (3, 4):
+                raise UsageError(f"Некорректная заявка: '{chunk}' (ожидается: <buy|sell> <currency> <amount> [base])")
+            order = {"side": fields[0], "currency": fields[1], "amount": fields[2]}
+            if len(fields) == 4:
+                order["base"] = fields[3]
+            orders.append(order)
+    return orders
+
+
+def _load_orders(args: dict[str, str]) -> list[dict[str, Any]]:
+    if "--orders" in args:
+        return _parse_order_lines([args["--orders"]])
+    path = args["--file"]
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as e:
+            raise UsageError(f"Файл {path}: некорректный JSON ({e})") from e
+    return _parse_order_lines(text.splitlines())
+
+
+def execute(session: Session, tokens: list[str]) -> CommandResult:
+    """Выполняет одну команду и возвращает данные результата (без вывода на экран)."""
+    cmd, parts = tokens[0], tokens[1:]
+
+    if cmd == "help":
+        return CommandResult(cmd, {"commands": list(HELP_LINES)})
+
+    if cmd == "register":
+        from valutatrade_hub.core.usecases import register_user
+
+        args = _parse_kv(parts)
+        uid, uname = register_user(args["--username"], args["--password"])
+        return CommandResult(cmd, {"user_id": uid, "username": uname})
+
+    if cmd == "login":
+        from valutatrade_hub.core.usecases import login_user
+
+        args = _parse_kv(parts)
+        user = login_user(args["--username"], args["--password"])
+        session.user_id = user.user_id
+        session.username = user.username
+        return CommandResult(cmd, {"user_id": user.user_id, "username": user.username})
+
+    if cmd == "show-portfolio":
+        from valutatrade_hub.core.usecases import show_portfolio
+
+        user_id = session.require_login()
+        args = _parse_kv(parts)
+        data = show_portfolio(user_id, args.get("--base", "USD"))
+        return CommandResult(cmd, {"username": session.username, **data})
+
+    if cmd in {"buy", "sell"}:
+        from valutatrade_hub.core.usecases import buy_currency, sell_currency
+
+        user_id = session.require_login()
+        args = _parse_kv(parts)
+        action = buy_currency if cmd == "buy" else sell_currency
+        return CommandResult(cmd, action(user_id, args["--currency"], float(args["--amount"])))
+
+    if cmd == "orders":
+        from valutatrade_hub.core.usecases import execute_orders
+
+        user_id = session.require_login()
+        args = _parse_kv(parts)
+        mode = args.get("--mode", "atomic")
+        if mode not in {"atomic", "partial"}:
+            raise UsageError("--mode должен быть: atomic или partial")
+
+        try:
+            orders = _load_orders(args)
+        except OSError as e:
+            raise UsageError(f"Не удалось прочитать файл заявок: {e}") from e
+        report = execute_orders(user_id, orders, atomic=mode == "atomic")
+
+        errors = [r for r in report["results"] if r["status"] == "error"]
+        code = _ORDER_ERROR_CODES.get(errors[0]["error_type"], EXIT_ERROR) if errors else EXIT_OK
+        return CommandResult(cmd, report, code)
+
+    if cmd == "update-rates":
+        args = _parse_kv(parts)
+        source = args.get("--source")
+        if source is not None and source not in {"coingecko", "exchangerate"}:
+            raise UsageError("source должен быть: coingecko или exchangerate")
+
+        result = _get_updater().run_update(source=source)
+        failed = result["updated_count"] == 0 and bool(result["errors"])
+        return CommandResult(cmd, result, EXIT_API if failed else EXIT_OK)
+
+    if cmd == "show-rates":
+        args = _parse_kv(parts)
+        top: int | None = None
+        if args.get("--top") is not None:
+            top = int(args["--top"])
+            if top <= 0:
+                raise UsageError("--top должен быть > 0")
+
+        from valutatrade_hub.infra.rates_cache import RatesCache
+
+        book = RatesCache().rate_book()
+        currency, base = args.get("--currency"), args.get("--base")
+        items = book.select(currency, base) if top is None else book.top(top, currency, base)
+        return CommandResult(
+            cmd,
+            {
+                "last_refresh": book.last_refresh,
+                "cache_empty": len(book) == 0,
+                "currency": args.get("--currency"),
+                "rates": [{"pair": pair, **data} for pair, data in items],
+            },
+        )
+
+    if cmd == "rate-bars":
+        from valutatrade_hub.core.utils import normalize_currency_code, parse_time
+        from valutatrade_hub.parser_service.storage import RatesStorage
+
+        args = _parse_kv(parts)
+        legs = args["--pair"].split("_")
+        try:
+            # пара — имя файла баров: обе части проверяются как коды валют
+            pair = "_".join(normalize_currency_code(leg) for leg in legs)
+        except ValueError:
+            pair = ""
+        if len(legs) != 2 or not pair:
+            raise UsageError("--pair должен иметь вид FROM_TO, например BTC_USD")
+        interval = args.get("--interval", "1h")
+        limit = int(args["--limit"]) if args.get("--limit") is not None else None
+        if limit is not None and limit <= 0:
+            raise UsageError("--limit должен быть > 0")
+        since = parse_time(args["--since"]) if args.get("--since") else None
+        until = parse_time(args["--until"]) if args.get("--until") else None
+
+        bars = RatesStorage().read_bars(pair, interval, since, until, limit)
+        return CommandResult(cmd, {"pair": pair, "interval": interval, "bars": bars})
+
+    if cmd == "get-rate":
+        from valutatrade_hub.core.usecases import get_rate
+
+        args = _parse_kv(parts)
+        if args.get("--at") is not None:
+            from valutatrade_hub.core.usecases import get_rate_at
+            from valutatrade_hub.core.utils import parse_time
+
+            mode = args.get("--mode", "last")
+            if mode not in {"last", "nearest", "linear"}:
+                raise UsageError("--mode должен быть: last, nearest или linear")
+            info = get_rate_at(args["--from"], args["--to"], parse_time(args["--at"]), mode)
+        else:
+            info = get_rate(args["--from"], args["--to"])
+        rate = float(info["rate"])
+        return CommandResult(cmd, {**info, "inverse": 1 / rate if rate != 0 else None})
+
+    if cmd == "metrics":
+        args = _parse_kv(parts)
+        source = args.get("--file", SettingsLoader().get("METRICS_PATH"))
+        return CommandResult(cmd, _collect_metrics(source, args.get("--export")))
+
+    raise UsageError("Неизвестная команда. help")
+
+
+def render(result: CommandResult, out: TextIO | None = None) -> None:
+    """Человекочитаемый вывод результата команды (как в интерактивном режиме)."""
+    cmd, data = result.command, result.data
+
+    if cmd == "help":
+        print("Команды:", file=out)
+        for line in data["commands"]:
+            print(f"  {line}", file=out)
+
+    elif cmd == "register":
+        uname = data["username"]
+        print(
+            f"Пользователь '{uname}' зарегистрирован (id={data['user_id']}). "
+            f"Войдите: login --username {uname} --password ****",
+            file=out,
+        )
+
+    elif cmd == "login":
+        print(f"Вы вошли как '{data['username']}'", file=out)
+
+    elif cmd == "show-portfolio":
+        table = _table(["Currency", "Balance", f"Value ({data['base']})"])
+        for row in data["rows"]:
+            table.add_row([row["currency"], row["balance"], row["value_in_base"]])
+
+        print(f"Портфель пользователя '{data['username']}' (база: {data['base']}):", file=out)
+        if not data["rows"]:
+            print("Портфель пуст", file=out)
+        else:
+            print(table, file=out)
+            print(f"ИТОГО: {data['total']} {data['base']}", file=out)
+
+    elif cmd in {"buy", "sell"}:
+        verb, moved = ("Покупка", "Списано") if cmd == "buy" else ("Продажа", "Начислено")
+        print(f"{verb} выполнена: {data['amount']} {data['currency']}", file=out)
+        print(f"- {data['currency']}: было {data['before']} → стало {data['after']}", file=out)
+        if "rate_pair" in data:
+            print(
+                f"{moved}: {data['estimated_value']} {data['base']} "
+                f"(USD: {data['usd_before']} → {data['usd_after']})",
+                file=out,
+            )
+
+    elif cmd == "orders":
+        table = _table(["#", "Side", "Currency", "Amount", "Status", "Details"])
+        for res in data["results"]:
+            detail = res.get("result", {})
+            if res["status"] == "error":
+                info = res["error"]
+            elif "rate_pair" in detail:
+                info = f"{detail['before']} → {detail['after']}, {detail['estimated_value']} {detail['base']}"
+            else:
+                info = f"{detail['before']} → {detail['after']}"
+            table.add_row([
+                res["index"] + 1,
+                res.get("side") or "-",
+                detail.get("currency", res.get("currency") or "-"),
+                detail.get("amount", res.get("amount") or "-"),
+                res["status"],
+                info,
+            ])
+        print(table, file=out)
+
+        if data["saved"]:
+            print(f"Исполнено заявок: {data['applied']}, с ошибками: {data['failed']}. Портфель сохранён.", file=out)
+        else:
+            print(f"Заявок с ошибками: {data['failed']}. Портфель не изменён.", file=out)
+
+    elif cmd == "update-rates":
+        for err in data["errors"]:
+            print(f"ERROR: {err}", file=out)
+
+        if data["updated_count"] == 0 and data["errors"]:
+            print("Обновление завершилось с ошибками. Подробности в логах.", file=out)
+        elif data["errors"]:
+            print("Обновление завершилось с ошибками, но часть данных обновлена.", file=out)
+        else:
+            print("Обновление успешно.", file=out)
+
+        if data["unchanged"]:
+            print(f"Без изменений (304): {', '.join(data['unchanged'])}", file=out)
+        if data.get("confirmed_count"):
+            print(f"Подтверждено без изменений пар: {data['confirmed_count']}", file=out)
+
+        print(f"Всего обновлено пар: {data['updated_count']}", file=out)
+        print(f"Last refresh: {data['last_refresh']}", file=out)
+
+    elif cmd == "show-rates":
+        if data["cache_empty"]:
+            print("Локальный кеш курсов пуст. Выполните 'update-rates'.", file=out)
+        elif not data["rates"]:
+            if data["currency"]:
+                print(f"Курс для '{data['currency'].upper()}' не найден в кеше.", file=out)
+            else:
+                print("Нет данных по заданным фильтрам.", file=out)
+        else:
+            table = _table(["Pair", "Rate", "Updated at", "Source"])
+            for row in data["rates"]:
+                table.add_row([row["pair"], row["rate"], row["updated_at"], row["source"]])
+
+            print(f"Rates from cache (last refresh: {data['last_refresh']}):", file=out)
+            print(table, file=out)
+
+    elif cmd == "rate-bars":
+        if not data["bars"]:
+            print(f"Нет баров {data['interval']} для {data['pair']} за этот период.", file=out)
+            return
+        table = _table(["Start (UTC)", "Open", "High", "Low", "Close", "Ticks"])
+        for bar in data["bars"]:
+            start = bar["start"] if bar["closed"] else f"{bar['start']} *"
+            table.add_row([start, bar["open"], bar["high"], bar["low"], bar["close"], bar["count"]])
+        print(f"{data['pair']}, бары {data['interval']}:", file=out)
+        print(table, file=out)
+        if not data["bars"][-1]["closed"]:
+            print("* бар ещё открыт", file=out)
+
+    elif cmd == "get-rate":
+        fr, to = data["pair"].split("_", 1)
+        if "at" in data:
+            tick = (
+                f"интерполяция между {data['between'][0]} и {data['between'][1]}"
+                if "between" in data
+                else f"тик: {data['updated_at']}"
+            )
+            print(f"Курс {fr}→{to} на {data['at']}: {float(data['rate'])} ({tick}, {data['source']})", file=out)
+        else:
+            print(f"Курс {fr}→{to}: {float(data['rate'])} (обновлено: {data['updated_at']})", file=out)
+        if data["inverse"] is not None:
+            print(f"Обратный курс {to}→{fr}: {data['inverse']:.8f}", file=out)
+
+    elif cmd == "metrics":
+        if data["export_path"]:
+            print(f"Метрики процесса записаны в {data['export_path']}", file=out)
+        if not data["histograms"] and not data["values"]:
+            print("Метрик пока нет: запустите планировщик или выполните хотя бы одну команду.", file=out)
+            return
+        print(f"Источник: {data['source'] or 'текущий процесс'}", file=out)
+
+        if data["histograms"]:
+            table = _table(["Metric", "Labels", "Count", "p50, ms", "p99, ms", "Mean, ms"])
+            for row in data["histograms"]:
+                labels = ", ".join(f"{k}={v}" for k, v in row["labels"].items())
+                table.add_row([row["metric"], labels, row["count"], _ms(row["p50"]), _ms(row["p99"]), _ms(row["mean"])])
+            print(table, file=out)
+        if data["values"]:
+            table = _table(["Metric", "Labels", "Value"])
+            for row in data["values"]:
+                labels = ", ".join(f"{k}={v}" for k, v in row["labels"].items())
+                table.add_row([row["metric"], labels, f"{row['value']:.15g}"])
+            print(table, file=out)
+
+
+def classify_error(exc: Exception) -> tuple[int, list[str]]:
+    """Код выхода и строки сообщения для ошибки команды."""
+    if isinstance(exc, KeyError):
+        return EXIT_USAGE, ["Не хватает аргументов"]
+    if isinstance(exc, LoginRequiredError):
+        return EXIT_AUTH, [str(exc)]
+    if isinstance(exc, InsufficientFundsError):
+        return EXIT_FUNDS, [str(exc)]
+    if isinstance(exc, CurrencyNotFoundError):
+        from valutatrade_hub.core.currencies import list_supported_codes
+
+        codes = list_supported_codes()
+        shown = ", ".join(codes[:_SHOWN_CODES]) + (f" … (всего {len(codes)})" if len(codes) > _SHOWN_CODES else "")
+        return EXIT_CURRENCY, [
+            str(exc),
+            "Подсказка: help get-rate",
+            f"Поддерживаемые коды: {shown}",
+        ]
+    if isinstance(exc, ApiRequestError):
+        return EXIT_API, [str(exc), "Повторите попытку позже или проверьте сеть"]
+    if isinstance(exc, UsageError):
+        return EXIT_USAGE, [str(exc)]
+    # LockTimeoutError — подкласс TimeoutError, то есть OSError: проверяется раньше
+    if isinstance(exc, (LockTimeoutError, VersionConflictError)):
+        return EXIT_BUSY, [str(exc), "Данные заняты другим процессом, повторите команду"]
+    if isinstance(exc, OSError):
+        return EXIT_IO, [f"Ошибка ввода-вывода: {exc}"]
+    return EXIT_ERROR, [str(exc)]
+
+
+_HANDLED_ERRORS = (
+    KeyError,
+    LoginRequiredError,
+    InsufficientFundsError,
+    CurrencyNotFoundError,
+    ApiRequestError,
+    LockTimeoutError,
+    VersionConflictError,
+    OSError,
+    ValueError,
+)
 
 
 def run() -> None:
+    from valutatrade_hub.logging_config import setup_logging
+
     setup_logging()
-    current_user_id: int | None = None
-    current_username: str | None = None
+    session = Session()
 
     print("ValutaTrade Hub CLI")
     print("Type 'help' to see available commands.")
@@ -75,177 +553,128 @@ def run() -> None:
             print("Некорректная команда")
             continue
 
-        cmd = tokens[0]
-        parts = tokens[1:]
-
-        if cmd in {"exit", "quit"}:
+        if tokens[0] in {"exit", "quit"}:
             break
 
-        if cmd == "help":
-            _print_help()
+        try:
+            render(execute(session, tokens))
+        except _HANDLED_ERRORS as e:
+            for line in classify_error(e)[1]:
+                print(line)
+
+
+def _emit_json(out: TextIO, payload: dict[str, Any]) -> None:
+    out.write(json.dumps(payload, ensure_ascii=False, default=str) + "\n")
+    out.flush()
+
+
+def run_batch(
+    lines: Iterable[str],
+    out: TextIO | None = None,
+    output_format: str = "json",
+    stop_on_error: bool = False,
+    session: Session | None = None,
+) -> int:
+    """Выполняет команды построчно в одном процессе; вход сохраняется между строками.
+
+    Пустые строки и строки, начинающиеся с '#', пропускаются. В формате json
+    на каждую команду пишется одна строка JSON. Возвращает код первой неудачной
+    команды или 0.
+    """
+    out = out or sys.stdout
+    session = session or Session()
+    exit_code = EXIT_OK
+
+    for lineno, raw in enumerate(lines, start=1):
+        raw = raw.strip()
+        if raw == "" or raw.startswith("#"):
             continue
 
+        record: dict[str, Any] = {"line": lineno}
         try:
-            if cmd == "register":
-                args = _parse_kv(parts)
-                uid, uname = register_user(args["--username"], args["--password"])
-                print(f"Пользователь '{uname}' зарегистрирован (id={uid}). Войдите: login --username {uname} --password ****")
-
-            elif cmd == "login":
-                args = _parse_kv(parts)
-                user = login_user(args["--username"], args["--password"])
-                current_user_id = user.user_id
-                current_username = user.username
-                print(f"Вы вошли как '{current_username}'")
-
-            elif cmd == "show-portfolio":
-                if current_user_id is None:
-                    print("Сначала выполните login")
-                    continue
-                args = _parse_kv(parts) if parts else {}
-                base = args.get("--base", "USD")
-                data = show_portfolio(current_user_id, base)
-
-                table = PrettyTable()
-                table.field_names = ["Currency", "Balance", f"Value ({data['base']})"]
-                for row in data["rows"]:
-                    table.add_row([row["currency"], row["balance"], row["value_in_base"]])
-
-                print(f"Портфель пользователя '{current_username}' (база: {data['base']}):")
-                if not data["rows"]:
-                    print("Портфель пуст")
-                else:
-                    print(table)
-                    print(f"ИТОГО: {data['total']} {data['base']}")
-
-            elif cmd == "buy":
-                if current_user_id is None:
-                    print("Сначала выполните login")
-                    continue
-                args = _parse_kv(parts)
-                res = buy_currency(current_user_id, args["--currency"], float(args["--amount"]))
-                print(f"Покупка выполнена: {res['amount']} {res['currency']}")
-                print(f"- {res['currency']}: было {res['before']} → стало {res['after']}")
-                if "rate_pair" in res:
-                    print(f"Списано: {res['estimated_value']} {res['base']} (USD: {res['usd_before']} → {res['usd_after']})")
-
-            elif cmd == "sell":
-                if current_user_id is None:
-                    print("Сначала выполните login")
-                    continue
-                args = _parse_kv(parts)
-                res = sell_currency(current_user_id, args["--currency"], float(args["--amount"]))
-                print(f"Продажа выполнена: {res['amount']} {res['currency']}")
-                print(f"- {res['currency']}: было {res['before']} → стало {res['after']}")
-                if "rate_pair" in res:
-                    print(f"Начислено: {res['estimated_value']} {res['base']} (USD: {res['usd_before']} → {res['usd_after']})")
-
-            elif cmd == "update-rates":
-                args = _parse_kv(parts) if parts else {}
-                source = args.get("--source")
-
-                if source is not None and source not in {"coingecko", "exchangerate"}:
-                    raise ValueError("source должен быть: coingecko или exchangerate")
-
-                config = ParserConfig()
-                storage = RatesStorage()
-                clients = [
-                    CoinGeckoClient(config),
-                    ExchangeRateApiClient(config),
-                ]
-                updater = RatesUpdater(clients, storage)
-
-                result = updater.run_update(source=source)
-                if result["errors"]:
-                    for err in result["errors"]:
-                        print(f"ERROR: {err}")
-
-                if result["updated_count"] == 0 and result["errors"]:
-                    print("Обновление завершилось с ошибками. Подробности в логах.")
-                elif result["errors"]:
-                    print("Обновление завершилось с ошибками, но часть данных обновлена.")
-                else:
-                    print("Обновление успешно.")
-
-                print(f"Всего обновлено пар: {result['updated_count']}")
-                print(f"Last refresh: {result['last_refresh']}")
-
-            elif cmd == "show-rates":
-                args = _parse_kv(parts) if parts else {}
-                currency = args.get("--currency")
-                top_raw = args.get("--top")
-                base = args.get("--base")
-
-                top: int | None = None
-                if top_raw is not None:
-                    top = int(top_raw)
-                    if top <= 0:
-                        raise ValueError("--top должен быть > 0")
-
-                storage = RatesStorage()
-                cache = storage.read_cache()
-                pairs = cache.get("pairs", {})
-                last_refresh = cache.get("last_refresh")
-
-                if not pairs:
-                    print("Локальный кеш курсов пуст. Выполните 'update-rates'.")
-                    continue
-
-                items = []
-                for pair, data in pairs.items():
-                    if base and not pair.endswith(f"_{base.upper()}"):
-                        continue
-                    if currency:
-                        cur = currency.upper()
-                        if not (pair.startswith(f"{cur}_") or pair.endswith(f"_{cur}")):
-                            continue
-                    items.append((pair, data))
-
-                if not items:
-                    if currency:
-                        print(f"Курс для '{currency.upper()}' не найден в кеше.")
-                    else:
-                        print("Нет данных по заданным фильтрам.")
-                    continue
-
-                if top is not None:
-                    items.sort(key=lambda x: float(x[1]["rate"]), reverse=True)
-                    items = items[:top]
-                else:
-                    items.sort(key=lambda x: x[0])
-
-                table = PrettyTable()
-                table.field_names = ["Pair", "Rate", "Updated at", "Source"]
-                for pair, data in items:
-                    table.add_row([pair, data["rate"], data["updated_at"], data["source"]])
-
-                print(f"Rates from cache (last refresh: {last_refresh}):")
-                print(table)
-
-
-            elif cmd == "get-rate":
-                args = _parse_kv(parts)
-                info = get_rate(args["--from"], args["--to"])
-                fr, to = info["pair"].split("_", 1)
-                rate = float(info["rate"])
-                print(f"Курс {fr}→{to}: {rate} (обновлено: {info['updated_at']})")
-                if rate != 0:
-                    inv = 1 / rate
-                    print(f"Обратный курс {to}→{fr}: {inv:.8f}")
-
+            tokens = shlex.split(raw)
+            if tokens[0] in {"exit", "quit"}:
+                break
+            record["command"] = tokens[0]
+            result = execute(session, tokens)
+        except _HANDLED_ERRORS as e:
+            code, messages = classify_error(e)
+            if isinstance(e, ValueError) and "command" not in record:
+                code, messages = EXIT_USAGE, ["Некорректная команда"]
+            record.update(
+                ok=False,
+                exit_code=code,
+                error={"type": type(e).__name__, "message": messages[0], "details": messages[1:]},
+            )
+            if output_format == "json":
+                _emit_json(out, record)
+            else:
+                print("\n".join(messages), file=out)
+        else:
+            code = result.exit_code
+            if output_format == "json":
+                _emit_json(out, {**record, "ok": code == EXIT_OK, "exit_code": code, "result": result.data})
             else:
-                print("Неизвестная команда. help")
-
-        except KeyError:
-            print("Не хватает аргументов")
-        except InsufficientFundsError as e:
-            print(str(e))
-        except CurrencyNotFoundError as e:
-            print(str(e))
-            print("Подсказка: help get-rate")
-            print("Поддерживаемые коды:", ", ".join(list_supported_codes()))
-        except ApiRequestError as e:
-            print(str(e))
-            print("Повторите попытку позже или проверьте сеть")
-        except ValueError as e:
-            print(str(e))
+                render(result, out)
+
+        if code != EXIT_OK:
+            exit_code = exit_code or code
+            if stop_on_error:
+                break
+
+    return exit_code
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Точка входа `project`.
+
+    project                                              — интерактивный режим
+    project [--json] <command> [--arg value ...]         — одна команда
+    project --script <file|-> [--text] [--stop-on-error] — команды из файла или stdin
+    """
+    args = list(sys.argv[1:] if argv is None else argv)
+    if not args:
+        run()
+        return EXIT_OK
+
+    script: str | None = None
+    output_format: str | None = None
+    stop_on_error = False
+    while args and args[0] in {"--json", "--text", "--stop-on-error", "--script"}:
+        opt = args.pop(0)
+        if opt == "--script":
+            if not args:
+                print("Нет значения для --script", file=sys.stderr)
+                return EXIT_USAGE
+            script = args.pop(0)
+        elif opt == "--stop-on-error":
+            stop_on_error = True
+        else:
+            output_format = opt.removeprefix("--")
+
+    from valutatrade_hub.logging_config import setup_logging
+
+    setup_logging()
+
+    if script is None:
+        if not args:
+            print("Не указана команда", file=sys.stderr)
+            return EXIT_USAGE
+        return run_batch([shlex.join(args)], output_format=output_format or "text")
+
+    if args:
+        print("--script нельзя совмещать с командой", file=sys.stderr)
+        return EXIT_USAGE
+    if script == "-":
+        return run_batch(sys.stdin, output_format=output_format or "json", stop_on_error=stop_on_error)
+    try:
+        f = open(script, "r", encoding="utf-8")
+    except OSError as e:
+        print(classify_error(e)[1][0], file=sys.stderr)
+        return EXIT_IO
+    with f:
+        return run_batch(f, output_format=output_format or "json", stop_on_error=stop_on_error)
+
+
+def cli() -> None:
+    sys.exit(main())
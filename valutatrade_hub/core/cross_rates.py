@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import math
+from array import array
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+from .utils import parse_iso
+
+
+def _epoch(updated_at: Any) -> int | None:
+    if not isinstance(updated_at, str):
+        return None
+    try:
+        dt = parse_iso(updated_at)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+class CrossRateMatrix:
+    """Кросс-курсы для всех валют из кеша: по одному значению на валюту.
+
+    Каждая валюта оценивается в опорной валюте своей компоненты графа котировок
+    (USD, затем остальные опорные для компонент без USD) обходом в ширину.
+    Курс i->j считается при запросе как value[i] / value[j], его updated_at —
+    самый старый из курсов на путях i и j до опорной. Построение O(n + пар),
+    поиск O(1), память O(n). Пары из разных компонент не конвертируются.
+    """
+
+    _NO_LEG = 2**62  # у опорной валюты нет курсов на пути до самой себя
+
+    def __init__(self, pairs: dict[str, Any], pivots: Iterable[str] = ("USD",)) -> None:
+        graph: dict[str, list[tuple[str, float, int]]] = {}
+        for key, entry in pairs.items():
+            parts = key.split("_")
+            if len(parts) != 2 or not isinstance(entry, dict):
+                continue
+            rate = entry.get("rate")
+            ts = _epoch(entry.get("updated_at"))
+            if isinstance(rate, bool) or not isinstance(rate, (int, float)) or ts is None:
+                continue
+            if not rate > 0 or math.isinf(rate):
+                continue
+            a, b = parts
+            graph.setdefault(a, []).append((b, 1.0 / rate, ts))
+            graph.setdefault(b, []).append((a, float(rate), ts))
+
+        order = [p for p in pivots if p in graph]
+        order += sorted((c for c in graph if c not in order), key=lambda c: (-len(graph[c]), c))
+
+        self.codes: list[str] = []
+        self._index: dict[str, int] = {}
+        self._value = array("d")
+        self._oldest = array("q")
+        self._component = array("l")
+        self._pivot_of: list[str] = []
+
+        for pivot in order:
+            if pivot in self._index:
+                continue
+            comp_id = len(self._pivot_of)
+            self._pivot_of.append(pivot)
+            self._add(pivot, 1.0, self._NO_LEG, comp_id)
+            queue = deque([pivot])
+            while queue:
+                u = self._index[queue.popleft()]
+                for v, factor, ts in graph[self.codes[u]]:
+                    if v in self._index:
+                        continue
+                    self._add(v, self._value[u] * factor, min(self._oldest[u], ts), comp_id)
+                    queue.append(v)
+
+    def _add(self, code: str, value: float, oldest: int, component: int) -> None:
+        self._index[code] = len(self.codes)
+        self.codes.append(code)
+        self._value.append(value)
+        self._oldest.append(oldest)
+        self._component.append(component)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._index
+
+    def lookup(self, from_code: str, to_code: str) -> dict[str, Any] | None:
+        """Курс from->to в формате кеша или None, если пара не выводится."""
+        i = self._index.get(from_code)
+        j = self._index.get(to_code)
+        if i is None or j is None:
+            return None
+        if i == j:
+            return {"rate": 1.0, "updated_at": datetime.now(timezone.utc).isoformat(), "source": "identity"}
+        if self._component[i] != self._component[j]:
+            return None
+
+        ts = min(self._oldest[i], self._oldest[j])
+        return {
+            "rate": self._value[i] / self._value[j],
+            "updated_at": datetime.fromtimestamp(ts, timezone.utc).isoformat(),
+            "source": f"cross via {self._pivot_of[self._component[i]]}",
+        }
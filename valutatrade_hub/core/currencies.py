@@ -1,8 +1,17 @@
 from __future__ import annotations
 
+import time
 from abc import ABC, abstractmethod
+from typing import Any
+
+from valutatrade_hub.infra.settings import SettingsLoader
 
 from .exceptions import CurrencyNotFoundError
+from .utils import file_stamp, load_json
+
+FIAT_SCALE = 2
+CRYPTO_SCALE = 8
+DEFAULT_SCALE = CRYPTO_SCALE
 
 
 def _validate_code(code: str) -> str:
@@ -23,12 +32,19 @@ def _validate_name(name: str) -> str:
     return value
 
 
+def _validate_scale(scale: int) -> int:
+    if isinstance(scale, bool) or not isinstance(scale, int) or not (0 <= scale <= 18):
+        raise ValueError("scale должен быть целым от 0 до 18")
+    return scale
+
+
 class Currency(ABC):
-    """Валюта."""
+    """Валюта; scale — число знаков после запятой (баланс хранится в 10**-scale единицах)."""
 
-    def __init__(self, name: str, code: str) -> None:
+    def __init__(self, name: str, code: str, scale: int = DEFAULT_SCALE) -> None:
         self.name = _validate_name(name)
         self.code = _validate_code(code)
+        self.scale = _validate_scale(scale)
 
     @abstractmethod
     def get_display_info(self) -> str:
@@ -39,8 +55,8 @@ class Currency(ABC):
 class FiatCurrency(Currency):
     """Фиат."""
 
-    def __init__(self, name: str, code: str, issuing_country: str) -> None:
-        super().__init__(name, code)
+    def __init__(self, name: str, code: str, issuing_country: str, scale: int = FIAT_SCALE) -> None:
+        super().__init__(name, code, scale)
         self.issuing_country = _validate_name(issuing_country)
 
     def get_display_info(self) -> str:
@@ -50,8 +66,15 @@ class FiatCurrency(Currency):
 class CryptoCurrency(Currency):
     """Крипто."""
 
-    def __init__(self, name: str, code: str, algorithm: str, market_cap: float) -> None:
-        super().__init__(name, code)
+    def __init__(
+        self,
+        name: str,
+        code: str,
+        algorithm: str,
+        market_cap: float,
+        scale: int = CRYPTO_SCALE,
+    ) -> None:
+        super().__init__(name, code, scale)
         self.algorithm = _validate_name(algorithm)
         self.market_cap = float(market_cap)
 
@@ -67,13 +90,81 @@ _REGISTRY: dict[str, Currency] = {
     "ETH": CryptoCurrency("Ethereum", "ETH", "Ethash", 4.50e11),
 }
 
+# Остальные валюты — из файла реестра (CURRENCIES_PATH), который ведёт парсер курсов.
+# Файл читается при первом обращении и перечитывается, если изменился; проверка
+# изменения (stat) выполняется не чаще раза в _RELOAD_CHECK_SECONDS.
+_RELOAD_CHECK_SECONDS = 1.0
+
+_loaded: dict[str, Currency] = dict(_REGISTRY)
+_loaded_stamp: Any = None
+_checked_at: float | None = None
+
+
+def _from_entry(code: str, info: Any) -> Currency | None:
+    if not isinstance(info, dict):
+        return None
+    try:
+        name = str(info.get("name") or code)
+        scale = info.get("scale")
+        if info.get("type") == "crypto":
+            return CryptoCurrency(
+                name,
+                code,
+                str(info.get("algorithm") or "unknown"),
+                float(info.get("market_cap") or 0.0),
+                CRYPTO_SCALE if scale is None else scale,
+            )
+        country = str(info.get("issuing_country") or "unknown")
+        return FiatCurrency(name, code, country, FIAT_SCALE if scale is None else scale)
+    except (CurrencyNotFoundError, ValueError, TypeError):
+        return None
+
+
+def _registry() -> dict[str, Currency]:
+    global _loaded, _loaded_stamp, _checked_at
+
+    now = time.monotonic()
+    if _checked_at is not None and now - _checked_at < _RELOAD_CHECK_SECONDS:
+        return _loaded
+    _checked_at = now
+
+    path = SettingsLoader().get("CURRENCIES_PATH")
+    stamp = file_stamp(path) if isinstance(path, str) else None
+    if stamp == _loaded_stamp:
+        return _loaded
+
+    data = load_json(path, {}) if stamp is not None else {}
+    entries = data.get("currencies", {}) if isinstance(data, dict) else {}
+    registry: dict[str, Currency] = {}
+    for code, info in entries.items() if isinstance(entries, dict) else ():
+        currency = _from_entry(code, info)
+        if currency is not None:
+            registry[currency.code] = currency
+    registry.update(_REGISTRY)
+
+    _loaded, _loaded_stamp = registry, stamp
+    return registry
+
+
+def reload_registry() -> None:
+    """Перечитать файл реестра при следующем обращении (после его записи в этом процессе)."""
+    global _checked_at
+    _checked_at = None
+
 
 def get_currency(code: str) -> Currency:
     key = _validate_code(code)
-    if key not in _REGISTRY:
+    registry = _registry()
+    if key not in registry:
         raise CurrencyNotFoundError(key)
-    return _REGISTRY[key]
+    return registry[key]
+
+
+def currency_scale(code: str) -> int:
+    """Знаков после запятой для валюты; для кодов вне реестра — DEFAULT_SCALE."""
+    currency = _registry().get(code.strip().upper()) if isinstance(code, str) else None
+    return currency.scale if currency is not None else DEFAULT_SCALE
 
 
 def list_supported_codes() -> list[str]:
-    return sorted(_REGISTRY.keys())
+    return sorted(_registry().keys())
@@ -16,5 +16,6 @@ class CurrencyNotFoundError(Exception):
 class ApiRequestError(Exception):
     """Сбой API."""
 
-    def __init__(self, reason: str) -> None:
+    def __init__(self, reason: str, retryable: bool = True) -> None:
         super().__init__(f"Ошибка при обращении к внешнему API: {reason}")
+        self.retryable = retryable
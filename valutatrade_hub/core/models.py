@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+import math
 from datetime import datetime
-from typing import Dict
+from fractions import Fraction
+from typing import Any, Dict, Mapping
 
 from .utils import (
     validate_username,
@@ -10,6 +12,7 @@ from .utils import (
     make_salt,
     parse_iso,
 )
+from .currencies import currency_scale
 from .exceptions import InsufficientFundsError
 
 class User:
@@ -76,40 +79,117 @@ class User:
         self._salt = new_salt
         self._hashed_password = new_hash
 
+def to_minor(amount: float | int, scale: int) -> int:
+    """Сумма в целых минимальных единицах (10**-scale), округление до ближайшего."""
+    if isinstance(amount, int):
+        return amount * 10**scale
+    return round(amount * 10**scale)
+
+
+def from_minor(minor: int, scale: int) -> float:
+    return minor / 10**scale
+
+
+def rounded_to_scale(amount: float | int, scale: int) -> float | None:
+    """Значение amount после округления до scale или None, если округлять нечего."""
+    rounded = from_minor(to_minor(amount, scale), scale)
+    return None if rounded == amount else rounded
+
+
+def format_minor(minor: int, scale: int, places: int | None = None) -> str:
+    """Сумма из минимальных единиц строкой с places знаками после точки, без float; округление банковское."""
+    places = scale if places is None else places
+    value = round(Fraction(minor, 10**scale) * 10**places)
+    whole, frac = divmod(abs(value), 10**places)
+    sign = "-" if value < 0 else ""
+    return f"{sign}{whole}.{frac:0{places}d}" if places else f"{sign}{whole}"
+
+
+def convert_minor(amount_minor: int, from_scale: int, rate: str | float, to_scale: int) -> int:
+    """amount * rate между валютами с разными scale: точно в рациональных числах, округление банковское."""
+    value = Fraction(amount_minor) * Fraction(str(rate)) * 10**to_scale / 10**from_scale
+    return round(value)
+
+
 class Wallet:
-    """Кошелёк валюты для баланса конкретной валюты."""
+    """Кошелёк валюты для баланса конкретной валюты.
+
+    Баланс хранится целым числом минимальных единиц валюты (scale из реестра
+    валют), так что пополнения и списания не накапливают ошибку float;
+    свойство balance отдаёт и принимает обычное число.
+    """
 
-    def __init__(self, currency_code: str, balance: float = 0.0) -> None:
+    __slots__ = ("currency_code", "_scale", "_minor")
+
+    def __init__(self, currency_code: str, balance: float = 0.0, scale: int | None = None) -> None:
         self.currency_code = currency_code
-        self._balance = 0.0
+        self._scale = currency_scale(currency_code) if scale is None else scale
+        self._minor = 0
         self.balance = balance
 
+    @classmethod
+    def of_minor(cls, currency_code: str, minor: int, scale: int | None = None) -> "Wallet":
+        wallet = cls(currency_code, 0, scale)
+        wallet.balance_minor = minor
+        return wallet
+
+    @property
+    def scale(self) -> int:
+        return self._scale
+
     @property
     def balance(self) -> float:
-        return self._balance
+        return from_minor(self._minor, self._scale)
 
     @balance.setter
     def balance(self, value: float) -> None:
         if isinstance(value, bool) or not isinstance(value, (int, float)):
             raise ValueError("Баланс должен быть числом")
-        value_f = float(value)
-        if value_f < 0:
+        if not math.isfinite(value):
+            raise ValueError("Баланс должен быть конечным числом")
+        if value < 0:
             raise ValueError("Баланс не может быть отрицательным")
-        self._balance = value_f
+        self._minor = to_minor(value, self._scale)
 
-    def deposit(self, amount: float) -> None:
+    @property
+    def balance_minor(self) -> int:
+        return self._minor
+
+    @balance_minor.setter
+    def balance_minor(self, value: int) -> None:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError("Баланс должен быть целым числом минимальных единиц")
+        if value < 0:
+            raise ValueError("Баланс не может быть отрицательным")
+        self._minor = value
+
+    def minor_units(self, amount: float) -> int:
+        """Положительная сумма в минимальных единицах этого кошелька."""
         amount_f = float(amount)
-        if amount_f <= 0:
+        if not math.isfinite(amount_f) or amount_f <= 0:
             raise ValueError("'amount' должен быть положительным числом")
-        self.balance = self.balance + amount_f
+        minor = to_minor(amount_f, self._scale)
+        if minor <= 0:
+            raise ValueError(f"'amount' меньше минимальной единицы {self.currency_code} (10^-{self._scale})")
+        return minor
+
+    def deposit(self, amount: float) -> None:
+        self.deposit_minor(self.minor_units(amount))
 
     def withdraw(self, amount: float) -> None:
-        amount_f = float(amount)
-        if amount_f <= 0:
+        self.withdraw_minor(self.minor_units(amount))
+
+    def deposit_minor(self, amount: int) -> None:
+        if amount <= 0:
+            raise ValueError("'amount' должен быть положительным числом")
+        self._minor += amount
+
+    def withdraw_minor(self, amount: int) -> None:
+        if amount <= 0:
             raise ValueError("'amount' должен быть положительным числом")
-        if amount_f > self.balance:
-            raise InsufficientFundsError(self.balance, amount_f, self.currency_code)
-        self.balance = self.balance - amount_f
+        if amount > self._minor:
+            raise InsufficientFundsError(self.balance, from_minor(amount, self._scale), self.currency_code)
+        self._minor -= amount
 
     def get_balance_info(self) -> str:
         return f"{self.currency_code}: {self.balance:.4f}"
@@ -117,6 +197,8 @@ class Wallet:
 class Portfolio:
     """Портфель пользователя с набором валютных кошельков.."""
 
+    __slots__ = ("_user_id", "_wallets", "_user")
+
     def __init__(
         self,
         user_id: int,
@@ -142,6 +224,14 @@ class Portfolio:
     def wallets(self) -> dict[str, Wallet]:
         return dict(self._wallets)
 
+    def balances_minor(self) -> dict[str, int]:
+        """Снимок балансов в минимальных единицах (для отката изменений)."""
+        return {code: wallet.balance_minor for code, wallet in self._wallets.items()}
+
+    def restore_minor(self, balances: dict[str, int]) -> None:
+        """Возвращает кошельки к снимку balances_minor()."""
+        self._wallets = {code: Wallet.of_minor(code, minor) for code, minor in balances.items()}
+
     def add_currency(self, currency_code: str) -> None:
         code = currency_code.strip().upper()
         if code in self._wallets:
@@ -154,25 +244,38 @@ class Portfolio:
             raise ValueError(f"Кошелёк '{code}' не найден")
         return self._wallets[code]
 
-    def get_total_value(self, base_currency: str = "USD") -> float:
-        base = base_currency.strip().upper()
-        exchange_rates = {
-            "EUR_USD": 1.08,
-            "BTC_USD": 60000.0,
-            "ETH_USD": 3000.0,
-            "RUB_USD": 0.011,
-        }
-
-        total = 0.0
-        for code, wallet in self._wallets.items():
-            if code == base:
-                total += wallet.balance
-                continue
-
-            pair = f"{code}_{base}"
-            if pair not in exchange_rates:
-                raise ValueError(f"Нет курса для {code}->{base}")
-            total += wallet.balance * exchange_rates[pair]
+    def value_minor(self, currency_code: str, base_currency: str, rates: Mapping[str, Any] | None = None) -> int:
+        """Стоимость кошелька в минимальных единицах базовой валюты.
 
-        return total
+        rates — курсы {"FROM_TO": курс или {"rate": курс}} (как у get_rates);
+        без них курс берётся из кеша курсов (прямой или кросс-курс).
+        """
+        wallet = self.get_wallet(currency_code)
+        base = base_currency.strip().upper()
+        base_scale = currency_scale(base)
+        if wallet.currency_code == base:
+            return convert_minor(wallet.balance_minor, wallet.scale, 1, base_scale)
+
+        pair = f"{wallet.currency_code}_{base}"
+        if rates is not None:
+            entry = rates.get(pair)
+        else:
+            from valutatrade_hub.infra.rates_cache import RatesCache
+
+            cache = RatesCache()
+            entry = cache.rate_book().lookup(wallet.currency_code, base)
+            if entry is None:
+                entry = cache.cross_rates().lookup(wallet.currency_code, base)
+        rate = entry.get("rate") if isinstance(entry, dict) else entry
+        if isinstance(rate, bool) or not isinstance(rate, (int, float, str)):
+            raise ValueError(f"Нет курса для {wallet.currency_code}->{base}")
+        return convert_minor(wallet.balance_minor, wallet.scale, rate, base_scale)
+
+    def get_total_minor(self, base_currency: str = "USD", rates: Mapping[str, Any] | None = None) -> int:
+        """Сумма всех кошельков в минимальных единицах базовой валюты (см. value_minor)."""
+        return sum(self.value_minor(code, base_currency, rates) for code in self._wallets)
+
+    def get_total_value(self, base_currency: str = "USD", rates: Mapping[str, Any] | None = None) -> float:
+        base = base_currency.strip().upper()
+        return from_minor(self.get_total_minor(base, rates), currency_scale(base))
 
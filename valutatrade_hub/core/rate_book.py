@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import heapq
+from typing import Any
+
+
+class RateBook:
+    """Курсы одного снимка кеша с индексами по валютам пары.
+
+    Пара FROM_TO котирует FROM (базовую валюту) в TO (валюте котировки).
+    Индексы by_base/by_quote дают пары валюты без просмотра всего кеша,
+    курсы дополнительно лежат в бинарной куче, так что top-k по курсу
+    без фильтров стоит O(k log k), а не сортировки всех пар. Книга
+    строится один раз на снимок и не изменяется.
+    """
+
+    def __init__(self, pairs: dict[str, Any], last_refresh: str | None = None) -> None:
+        self.last_refresh = last_refresh
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._rates: dict[str, float] = {}
+        self._by_base: dict[str, list[str]] = {}
+        self._by_quote: dict[str, list[str]] = {}
+        heap: list[tuple[float, str]] = []
+
+        for key, entry in pairs.items():
+            base, sep, quote = key.partition("_")
+            if not sep or not isinstance(entry, dict):
+                continue
+            rate = entry.get("rate")
+            # как и _is_fresh в сценариях: курс — число, не bool и не строка
+            if isinstance(rate, bool) or not isinstance(rate, (int, float)):
+                continue
+            rate = float(rate)
+            self._entries[key] = entry
+            self._rates[key] = rate
+            self._by_base.setdefault(base, []).append(key)
+            self._by_quote.setdefault(quote, []).append(key)
+            heap.append((-rate, key))
+
+        heapq.heapify(heap)
+        self._heap = heap
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def lookup(self, from_code: str, to_code: str) -> dict[str, Any] | None:
+        """Прямая котировка FROM_TO или None (кросс-курсы — CrossRateMatrix)."""
+        return self._entries.get(f"{from_code}_{to_code}")
+
+    def by_base(self, code: str) -> list[str]:
+        return list(self._by_base.get(code.upper(), ()))
+
+    def by_quote(self, code: str) -> list[str]:
+        return list(self._by_quote.get(code.upper(), ()))
+
+    def _candidates(self, currency: str | None, quote: str | None) -> list[str] | None:
+        """Пары под фильтры или None, если фильтров нет (все пары)."""
+        cur = currency.upper() if currency else None
+        quote_c = quote.upper() if quote else None
+
+        if cur and quote_c:
+            if cur == quote_c:
+                return self.by_quote(quote_c)
+            key = f"{cur}_{quote_c}"
+            return [key] if key in self._entries else []
+        if cur:
+            keys = self._by_base.get(cur, []) + self._by_quote.get(cur, [])
+            return list(dict.fromkeys(keys))
+        if quote_c:
+            return self.by_quote(quote_c)
+        return None
+
+    def select(self, currency: str | None = None, quote: str | None = None) -> list[tuple[str, dict[str, Any]]]:
+        """Пары, где есть currency (с любой стороны) и/или котируемые в quote, по имени пары."""
+        keys = self._candidates(currency, quote)
+        keys = sorted(self._entries if keys is None else keys)
+        return [(key, self._entries[key]) for key in keys]
+
+    def top(
+        self,
+        k: int,
+        currency: str | None = None,
+        quote: str | None = None,
+    ) -> list[tuple[str, dict[str, Any]]]:
+        """k пар с наибольшим курсом (при равенстве — по имени) с теми же фильтрами, что select."""
+        if k <= 0:
+            return []
+        keys = self._candidates(currency, quote)
+        if keys is None:
+            ordered = self._top_all(k)
+        else:
+            ordered = heapq.nsmallest(k, keys, key=lambda key: (-self._rates[key], key))
+        return [(key, self._entries[key]) for key in ordered]
+
+    def _top_all(self, k: int) -> list[str]:
+        # обход кучи как дерева: у извлечённого узла в кандидаты попадают только его дети
+        heap = self._heap
+        result: list[str] = []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(result) < k:
+            (_, key), i = heapq.heappop(frontier)
+            result.append(key)
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child], child))
+        return result
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
-from typing import Any
+import logging
+from datetime import datetime
+from typing import Any, Iterable
 
 from valutatrade_hub.decorators import log_action
 from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.metrics import timed
+from valutatrade_hub.infra.rates_cache import RatesCache
 from valutatrade_hub.infra.settings import SettingsLoader
 
-from .currencies import get_currency
-from .exceptions import ApiRequestError
-from .models import User, Wallet, Portfolio
+from .currencies import currency_scale, get_currency
+from .exceptions import ApiRequestError, CurrencyNotFoundError, InsufficientFundsError
+from .rate_book import RateBook
+from .models import User, Wallet, Portfolio, convert_minor, format_minor, from_minor, rounded_to_scale
 from .utils import (
     validate_username,
     validate_password,
@@ -18,6 +23,8 @@ from .utils import (
     parse_iso,
     validate_amount,
     normalize_currency_code,
+    from_epoch,
+    to_epoch,
 )
 
 
@@ -29,6 +36,9 @@ EXCHANGE_RATES = {
 }
 
 
+_usecase_timed = timed("valutatrade_usecase", "Сценарии использования")
+
+
 def _db() -> DatabaseManager:
     return DatabaseManager()
 
@@ -37,12 +47,6 @@ def _settings() -> SettingsLoader:
     return SettingsLoader()
 
 
-def _next_user_id(users: list[dict[str, Any]]) -> int:
-    if not users:
-        return 1
-    return max(int(u["user_id"]) for u in users) + 1
-
-
 def _pair_key(from_code: str, to_code: str) -> str:
     return f"{from_code}_{to_code}"
 
@@ -54,52 +58,33 @@ def _ensure_wallet(portfolio: Portfolio, currency: str) -> Wallet:
 
 
 @log_action("REGISTER")
+@_usecase_timed
 def register_user(username: str, password: str) -> tuple[int, str]:
     username_v = validate_username(username)
     password_v = validate_password(password)
 
     db = _db()
-    users = db.read_users()
 
-    if any(u["username"] == username_v for u in users):
+    if db.find_user(username_v) is not None:
         raise ValueError(f"Имя пользователя '{username_v}' уже занято")
 
-    user_id = _next_user_id(users)
     salt = make_salt()
     hashed = hash_password(password_v, salt)
     reg_date = now_iso()
 
-    users.append(
-        {
-            "user_id": user_id,
-            "username": username_v,
-            "hashed_password": hashed,
-            "salt": salt,
-            "registration_date": reg_date,
-        }
-    )
-    db.write_users(users)
-
-    portfolios = db.read_portfolios()
-    portfolios.append({"user_id": user_id, "wallets": {}})
-    db.write_portfolios(portfolios)
+    user_id = db.add_user(username_v, hashed, salt, reg_date)
+    db.add_portfolio(user_id)
 
     return user_id, username_v
 
 
 @log_action("LOGIN")
+@_usecase_timed
 def login_user(username: str, password: str) -> User:
     username_v = validate_username(username)
     password_v = validate_password(password)
 
-    db = _db()
-    users = db.read_users()
-
-    found = None
-    for u in users:
-        if u["username"] == username_v:
-            found = u
-            break
+    found = _db().find_user(username_v)
 
     if found is None:
         raise ValueError(f"Пользователь '{username_v}' не найден")
@@ -118,88 +103,197 @@ def login_user(username: str, password: str) -> User:
     return user
 
 
+@_usecase_timed
 def load_portfolio(user_id: int) -> Portfolio:
-    db = _db()
-    portfolios = db.read_portfolios()
+    wallets_data = _db().read_portfolio(int(user_id))
 
-    found = None
-    for p in portfolios:
-        if int(p["user_id"]) == int(user_id):
-            found = p
-            break
-
-    if found is None:
+    if wallets_data is None:
         raise ValueError("Портфель не найден")
 
-    wallets_data: dict[str, Any] = found.get("wallets", {})
     wallets: dict[str, Wallet] = {}
 
     for code, w in wallets_data.items():
         code_u = str(code).upper()
         balance = w.get("balance", 0.0) if isinstance(w, dict) else 0.0
-        wallets[code_u] = Wallet(code_u, balance)
+        wallets[code_u] = wallet = Wallet(code_u, balance)
+        if rounded_to_scale(balance, wallet.scale) is not None:
+            logging.getLogger("valutatrade").warning(
+                "Баланс %s пользователя %s точнее %s знаков: %r -> %r при загрузке; "
+                "см. python -m valutatrade_hub.infra.migrate --round-balances",
+                code_u, user_id, wallet.scale, balance, wallet.balance,
+            )
 
     return Portfolio(int(user_id), wallets)
 
 
+@_usecase_timed
 def save_portfolio(portfolio: Portfolio) -> None:
-    db = _db()
-    portfolios = db.read_portfolios()
-
-    idx = None
-    for i, p in enumerate(portfolios):
-        if int(p["user_id"]) == int(portfolio.user_id):
-            idx = i
-            break
-
-    if idx is None:
-        raise ValueError("Портфель не найден")
-
     wallets_out: dict[str, Any] = {}
     for code, wallet in portfolio.wallets.items():
         wallets_out[code] = {"balance": wallet.balance}
 
-    portfolios[idx] = {"user_id": portfolio.user_id, "wallets": wallets_out}
-    db.write_portfolios(portfolios)
+    _db().write_portfolio(portfolio.user_id, wallets_out)
+
+
+def _lookup_rate(
+    book: RateBook,
+    from_c: str,
+    to_c: str,
+    now: datetime,
+    max_age_seconds: int,
+) -> dict[str, str]:
+    key = _pair_key(from_c, to_c)
+    entry = book.lookup(from_c, to_c)
+    if not _is_fresh(entry, now, max_age_seconds):
+        entry = RatesCache().cross_rates().lookup(from_c, to_c)
+
+    if _is_fresh(entry, now, max_age_seconds):
+        return {
+            "pair": key,
+            "rate": str(entry["rate"]),
+            "updated_at": entry["updated_at"],
+            "source": str(entry.get("source", "cache")),
+        }
+
+    raise ApiRequestError("Данные устарели или отсутствуют. Выполните update-rates.")
+
+
+def _is_fresh(entry: Any, now: datetime, max_age_seconds: int) -> bool:
+    if isinstance(entry, dict):
+        updated_at = entry.get("updated_at")
+        rate = entry.get("rate")
+
+        if isinstance(updated_at, str) and isinstance(rate, (int, float)):
+            age = (now - parse_iso(updated_at)).total_seconds()
+            return age <= max_age_seconds
+
+    return False
 
 
 @log_action("GET_RATE")
+@_usecase_timed
 def get_rate(from_currency: str, to_currency: str, max_age_seconds: int | None = None) -> dict[str, str]:
     """Возвращает курс валюты из локального кеша с учётом TTL."""
+    return next(iter(get_rates([(from_currency, to_currency)], max_age_seconds).values()))
+
+
+@log_action("GET_RATE_AT")
+@_usecase_timed
+def get_rate_at(from_currency: str, to_currency: str, at: str | int, mode: str = "last") -> dict[str, str]:
+    """Курс на момент at (ISO или секунды unix) по истории курсов.
+
+    mode: last — последний тик не позже at, nearest — ближайший тик,
+    linear — интерполяция между соседними тиками. Пары без своей истории
+    выводятся через обратную пару или пивоты CROSS_RATE_PIVOTS на тот же момент.
+    """
+    # история курсов ведётся парсером: модули нужны только этому сценарию
+    from valutatrade_hub.parser_service.columnar import AS_OF_MODES
+    from valutatrade_hub.parser_service.storage import RatesStorage
+
+    if mode not in AS_OF_MODES:
+        raise ValueError(f"Неизвестный режим '{mode}', есть: {', '.join(AS_OF_MODES)}")
     from_c = normalize_currency_code(from_currency)
     to_c = normalize_currency_code(to_currency)
-
     get_currency(from_c)
     get_currency(to_c)
-
-    ttl = int(_settings().get("RATES_TTL_SECONDS", 300))
+    at_s = at if isinstance(at, int) else to_epoch(at)
+
+    if from_c == to_c:
+        found: dict[str, Any] | None = {"rate": 1.0, "timestamp": from_epoch(at_s), "source": "identity"}
+    else:
+        pivots = tuple(_settings().get("CROSS_RATE_PIVOTS", ("USD",)))
+        with RatesStorage().open_columns() as columns:
+            found = _history_rate(columns, from_c, to_c, at_s, mode, pivots)
+    if found is None:
+        raise ApiRequestError(f"Нет истории курса {from_c}→{to_c} на {from_epoch(at_s)}")
+
+    result = {
+        "pair": _pair_key(from_c, to_c),
+        "rate": str(found["rate"]),
+        "updated_at": found["timestamp"],
+        "source": str(found["source"]),
+        "at": from_epoch(at_s),
+        "mode": mode,
+    }
+    if "between" in found:
+        result["between"] = found["between"]
+    return result
+
+
+def _history_rate(
+    columns: Any,
+    from_c: str,
+    to_c: str,
+    at: int,
+    mode: str,
+    pivots: tuple[str, ...],
+) -> dict[str, Any] | None:
+    direct = columns.rate_at(_pair_key(from_c, to_c), at, mode)
+    if direct is not None:
+        return direct
+    inverse = columns.rate_at(_pair_key(to_c, from_c), at, mode)
+    if inverse is not None and inverse["rate"]:
+        return {**inverse, "rate": 1 / inverse["rate"]}
+
+    for pivot in pivots:
+        if pivot in (from_c, to_c):
+            continue
+        leg_from = columns.rate_at(_pair_key(from_c, pivot), at, mode)
+        leg_to = columns.rate_at(_pair_key(to_c, pivot), at, mode)
+        if leg_from is not None and leg_to is not None and leg_to["rate"]:
+            return {
+                "rate": leg_from["rate"] / leg_to["rate"],
+                "timestamp": min(leg_from["timestamp"], leg_to["timestamp"]),
+                "source": f"cross via {pivot}",
+            }
+    return None
+
+
+@_usecase_timed
+def get_rates(
+    pairs: Iterable[tuple[str, str]],
+    max_age_seconds: int | None = None,
+) -> dict[str, dict[str, str]]:
+    """Курсы для набора пар по одному снимку кеша: {"FROM_TO": {...}}."""
+    result: dict[str, dict[str, str]] = {}
+    for key, entry in _resolve_rates(pairs, max_age_seconds).items():
+        if isinstance(entry, Exception):
+            raise entry
+        result[key] = entry
+    return result
+
+
+def _resolve_rates(
+    pairs: Iterable[tuple[str, str]],
+    max_age_seconds: int | None = None,
+) -> dict[str, dict[str, str] | ApiRequestError]:
+    """Как get_rates, но устаревшая пара даёт ошибку в значении, а не прерывает весь набор."""
     if max_age_seconds is None:
-        max_age_seconds = ttl
+        max_age_seconds = int(_settings().get("RATES_TTL_SECONDS", 300))
 
-    key = _pair_key(from_c, to_c)
-    db = _db()
-    rates: dict[str, Any] = db.read_rates()
+    book = RatesCache().rate_book()
+    now = parse_iso(now_iso())
 
-    pairs = rates.get("pairs", {})
-    if isinstance(pairs, dict) and key in pairs and isinstance(pairs[key], dict):
-        updated_at = pairs[key].get("updated_at")
-        rate = pairs[key].get("rate")
-        source = pairs[key].get("source", "cache")
+    result: dict[str, dict[str, str] | ApiRequestError] = {}
+    for from_currency, to_currency in pairs:
+        from_c = normalize_currency_code(from_currency)
+        to_c = normalize_currency_code(to_currency)
 
-        if isinstance(updated_at, str) and isinstance(rate, (int, float)):
-            age = (parse_iso(now_iso()) - parse_iso(updated_at)).total_seconds()
-            if age <= max_age_seconds:
-                return {
-                    "pair": key,
-                    "rate": str(rate),
-                    "updated_at": updated_at,
-                    "source": str(source),
-                }
+        get_currency(from_c)
+        get_currency(to_c)
 
-    raise ApiRequestError("Данные устарели или отсутствуют. Выполните update-rates.")
+        key = _pair_key(from_c, to_c)
+        if key not in result:
+            try:
+                result[key] = _lookup_rate(book, from_c, to_c, now, max_age_seconds)
+            except ApiRequestError as e:
+                result[key] = e
+
+    return result
 
 
 @log_action("BUY", verbose=True)
+@_usecase_timed
 def buy_currency(user_id: int, currency: str, amount: float, base: str = "USD") -> dict[str, str]:
     """Покупка валюты с использованием курса из кеша."""
     cur = normalize_currency_code(currency)
@@ -210,8 +304,21 @@ def buy_currency(user_id: int, currency: str, amount: float, base: str = "USD")
 
     amount_f = validate_amount(amount)
 
-    portfolio = load_portfolio(user_id)
+    with _db().transaction():
+        portfolio = load_portfolio(user_id)
+        result = _apply_buy(portfolio, cur, base_c, amount_f)
+        save_portfolio(portfolio)
+
+    return result
 
+
+def _apply_buy(
+    portfolio: Portfolio,
+    cur: str,
+    base_c: str,
+    amount_f: float,
+    rate_info: dict[str, str] | None = None,
+) -> dict[str, str]:
     base_wallet = _ensure_wallet(portfolio, base_c)
     cur_wallet = _ensure_wallet(portfolio, cur)
 
@@ -219,7 +326,6 @@ def buy_currency(user_id: int, currency: str, amount: float, base: str = "USD")
         before = base_wallet.balance
         base_wallet.deposit(amount_f)
         after = base_wallet.balance
-        save_portfolio(portfolio)
         return {
             "currency": cur,
             "amount": f"{amount_f:.4f}",
@@ -227,17 +333,16 @@ def buy_currency(user_id: int, currency: str, amount: float, base: str = "USD")
             "after": f"{after:.4f}",
         }
 
-    rate_info = get_rate(cur, base_c)
-    rate = float(rate_info["rate"])
-    cost = rate * amount_f
+    if rate_info is None:
+        rate_info = get_rate(cur, base_c)
+    amount_minor = cur_wallet.minor_units(amount_f)
+    cost_minor = _trade_value(amount_minor, cur_wallet, base_wallet, rate_info)
 
     usd_before = base_wallet.balance
     cur_before = cur_wallet.balance
 
-    base_wallet.withdraw(cost)
-    cur_wallet.deposit(amount_f)
-
-    save_portfolio(portfolio)
+    base_wallet.withdraw_minor(cost_minor)
+    cur_wallet.deposit_minor(amount_minor)
 
     return {
         "currency": cur,
@@ -246,14 +351,25 @@ def buy_currency(user_id: int, currency: str, amount: float, base: str = "USD")
         "after": f"{cur_wallet.balance:.4f}",
         "rate_pair": rate_info["pair"],
         "rate": rate_info["rate"],
-        "estimated_value": f"{cost:.2f}",
+        "estimated_value": f"{from_minor(cost_minor, base_wallet.scale):.2f}",
         "base": base_c,
         "usd_before": f"{usd_before:.2f}",
         "usd_after": f"{base_wallet.balance:.2f}",
     }
 
 
+def _trade_value(amount_minor: int, cur_wallet: Wallet, base_wallet: Wallet, rate_info: dict[str, str]) -> int:
+    """Стоимость amount_minor в минимальных единицах базовой валюты по курсу rate_info."""
+    value = convert_minor(amount_minor, cur_wallet.scale, rate_info["rate"], base_wallet.scale)
+    if value <= 0:
+        raise ValueError(
+            f"Сумма сделки меньше минимальной единицы {base_wallet.currency_code} (10^-{base_wallet.scale})"
+        )
+    return value
+
+
 @log_action("SELL", verbose=True)
+@_usecase_timed
 def sell_currency(user_id: int, currency: str, amount: float, base: str = "USD") -> dict[str, str]:
     """Продажа валюты с конвертацией в базовую валюту."""
     cur = normalize_currency_code(currency)
@@ -264,8 +380,21 @@ def sell_currency(user_id: int, currency: str, amount: float, base: str = "USD")
 
     amount_f = validate_amount(amount)
 
-    portfolio = load_portfolio(user_id)
+    with _db().transaction():
+        portfolio = load_portfolio(user_id)
+        result = _apply_sell(portfolio, cur, base_c, amount_f)
+        save_portfolio(portfolio)
+
+    return result
 
+
+def _apply_sell(
+    portfolio: Portfolio,
+    cur: str,
+    base_c: str,
+    amount_f: float,
+    rate_info: dict[str, str] | None = None,
+) -> dict[str, str]:
     if cur not in portfolio.wallets:
         raise ValueError(f"У вас нет кошелька '{cur}'.")
 
@@ -276,7 +405,6 @@ def sell_currency(user_id: int, currency: str, amount: float, base: str = "USD")
         before = base_wallet.balance
         base_wallet.withdraw(amount_f)
         after = base_wallet.balance
-        save_portfolio(portfolio)
         return {
             "currency": cur,
             "amount": f"{amount_f:.4f}",
@@ -284,17 +412,16 @@ def sell_currency(user_id: int, currency: str, amount: float, base: str = "USD")
             "after": f"{after:.4f}",
         }
 
-    rate_info = get_rate(cur, base_c)
-    rate = float(rate_info["rate"])
-    revenue = rate * amount_f
+    if rate_info is None:
+        rate_info = get_rate(cur, base_c)
+    amount_minor = cur_wallet.minor_units(amount_f)
+    revenue_minor = _trade_value(amount_minor, cur_wallet, base_wallet, rate_info)
 
     usd_before = base_wallet.balance
     cur_before = cur_wallet.balance
 
-    cur_wallet.withdraw(amount_f)
-    base_wallet.deposit(revenue)
-
-    save_portfolio(portfolio)
+    cur_wallet.withdraw_minor(amount_minor)
+    base_wallet.deposit_minor(revenue_minor)
 
     return {
         "currency": cur,
@@ -303,13 +430,111 @@ def sell_currency(user_id: int, currency: str, amount: float, base: str = "USD")
         "after": f"{cur_wallet.balance:.4f}",
         "rate_pair": rate_info["pair"],
         "rate": rate_info["rate"],
-        "estimated_value": f"{revenue:.2f}",
+        "estimated_value": f"{from_minor(revenue_minor, base_wallet.scale):.2f}",
         "base": base_c,
         "usd_before": f"{usd_before:.2f}",
         "usd_after": f"{base_wallet.balance:.2f}",
     }
 
 
+ORDER_SIDES = ("buy", "sell")
+
+
+def _validate_order(order: Any) -> tuple[str, str, str, float]:
+    if not isinstance(order, dict):
+        raise ValueError("Заявка должна быть объектом {side, currency, amount[, base]}")
+    side = str(order.get("side", "")).strip().lower()
+    if side not in ORDER_SIDES:
+        raise ValueError(f"side должен быть одним из: {', '.join(ORDER_SIDES)}")
+    cur = normalize_currency_code(order.get("currency"))
+    base_c = normalize_currency_code(order.get("base", "USD"))
+    get_currency(cur)
+    get_currency(base_c)
+    return side, cur, base_c, validate_amount(order.get("amount"))
+
+
+@log_action("ORDERS")
+@_usecase_timed
+def execute_orders(user_id: int, orders: list[dict[str, Any]], atomic: bool = True) -> dict[str, Any]:
+    """Пакет заявок buy/sell: один снимок курсов, применение в памяти, одна запись портфеля.
+
+    atomic=True — портфель сохраняется, только если исполнены все заявки;
+    atomic=False — неудачные заявки пропускаются, остальные сохраняются.
+    Ошибка заявки не прерывает пакет: её изменения откатываются, а причина
+    попадает в результат этой заявки.
+    """
+    if not isinstance(orders, list) or not orders:
+        raise ValueError("Нужна хотя бы одна заявка")
+
+    results: list[dict[str, Any]] = []
+    validated: list[tuple[str, str, str, float] | None] = []
+    for index, order in enumerate(orders):
+        try:
+            validated.append(_validate_order(order))
+        except (ValueError, CurrencyNotFoundError) as e:
+            validated.append(None)
+            results.append(_order_error(index, order, e))
+            continue
+        results.append({"index": index})
+
+    rates = _resolve_rates((v[1], v[2]) for v in validated if v is not None and v[1] != v[2])
+
+    with _db().transaction():
+        portfolio = load_portfolio(user_id)
+        applied = 0
+
+        for index, item in enumerate(validated):
+            if item is None:
+                continue
+            side, cur, base_c, amount_f = item
+            rate_info = rates.get(_pair_key(cur, base_c))
+            checkpoint = portfolio.balances_minor()
+            try:
+                if isinstance(rate_info, Exception):
+                    raise rate_info
+                apply = _apply_buy if side == "buy" else _apply_sell
+                detail = apply(portfolio, cur, base_c, amount_f, rate_info)
+            except (ValueError, InsufficientFundsError, ApiRequestError) as e:
+                portfolio.restore_minor(checkpoint)
+                results[index] = _order_error(index, orders[index], e)
+                continue
+            results[index] = {"index": index, "side": side, "status": "ok", "result": detail}
+            applied += 1
+
+        failed = len(orders) - applied
+        saved = applied > 0 and (failed == 0 or not atomic)
+        if saved:
+            save_portfolio(portfolio)
+
+    if not saved:
+        for res in results:
+            if res["status"] == "ok":
+                res["status"] = "rolled_back"
+
+    return {
+        "user_id": int(user_id),
+        "atomic": atomic,
+        "saved": saved,
+        "applied": applied if saved else 0,
+        "failed": failed,
+        "results": results,
+    }
+
+
+def _order_error(index: int, order: Any, error: Exception) -> dict[str, Any]:
+    fields = order if isinstance(order, dict) else {}
+    return {
+        "index": index,
+        "side": fields.get("side"),
+        "currency": fields.get("currency"),
+        "amount": fields.get("amount"),
+        "status": "error",
+        "error_type": type(error).__name__,
+        "error": str(error),
+    }
+
+
+@_usecase_timed
 def show_portfolio(user_id: int, base: str = "USD") -> dict[str, object]:
     base_c = normalize_currency_code(base)
     get_currency(base_c)
@@ -317,23 +542,21 @@ def show_portfolio(user_id: int, base: str = "USD") -> dict[str, object]:
     portfolio = load_portfolio(user_id)
 
     rows: list[dict[str, str]] = []
-    total = 0.0
+    total = 0  # в минимальных единицах base: суммы и строки считаются без float
 
-    for code, wallet in sorted(portfolio.wallets.items()):
-        get_currency(code)
-        bal = wallet.balance
+    wallets = sorted(portfolio.wallets.items())
+    rates = get_rates((code, base_c) for code, _ in wallets if code != base_c)
+    base_scale = currency_scale(base_c)
 
-        if code == base_c:
-            value_base = bal
-        else:
-            rate_info = get_rate(code, base_c)
-            value_base = bal * float(rate_info["rate"])
+    for code, wallet in wallets:
+        get_currency(code)
+        value_base = portfolio.value_minor(code, base_c, rates)
 
         rows.append(
             {
                 "currency": code,
-                "balance": f"{bal:.4f}" if code in {"BTC", "ETH"} else f"{bal:.2f}",
-                "value_in_base": f"{value_base:.2f}",
+                "balance": format_minor(wallet.balance_minor, wallet.scale, 4 if code in {"BTC", "ETH"} else 2),
+                "value_in_base": format_minor(value_base, base_scale, 2),
                 "base": base_c,
             }
         )
@@ -342,5 +565,5 @@ def show_portfolio(user_id: int, base: str = "USD") -> dict[str, object]:
     return {
         "base": base_c,
         "rows": rows,
-        "total": f"{total:.2f}",
+        "total": format_minor(total, base_scale, 2),
     }
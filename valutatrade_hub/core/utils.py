@@ -2,10 +2,15 @@ from __future__ import annotations
 
 import json
 import os
+import re
 import secrets
+import tempfile
+import time
 import hashlib
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Iterator
+
+_CURRENCY_CODE_RE = re.compile(r"[A-Z0-9]{2,5}")
 
 
 def now_iso() -> str:
@@ -18,6 +23,30 @@ def parse_iso(dt_str: str) -> datetime:
     return datetime.fromisoformat(dt_str)
 
 
+def to_epoch(value: str) -> int:
+    """ISO-время (с 'Z', смещением или без зоны — тогда UTC) -> секунды unix."""
+    dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def parse_time(value: str, now: float | None = None) -> int:
+    """Момент времени из аргумента: ISO-дата/время или «столько назад» (90m, 24h, 7d)."""
+    text = value.strip()
+    unit = {"m": 60, "h": 3600, "d": 86400}.get(text[-1:].lower())
+    if unit is not None and text[:-1].isdigit():
+        return int((time.time() if now is None else now) - int(text[:-1]) * unit)
+    try:
+        return to_epoch(text)
+    except ValueError:
+        raise ValueError(f"Некорректное время '{value}': нужен ISO (2024-05-01T12:00Z) или 90m/24h/7d") from None
+
+
+def from_epoch(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
 def validate_username(username: str) -> str:
     """Проверка имени."""
     if not isinstance(username, str):
@@ -43,7 +72,7 @@ def normalize_currency_code(code: str) -> str:
     value = code.strip().upper()
     if value == "":
         raise ValueError("currency_code не может быть пустым")
-    if " " in value or not (2 <= len(value) <= 5):
+    if not _CURRENCY_CODE_RE.fullmatch(value):
         raise ValueError(f"Некорректный код валюты '{value}'")
     return value
 
@@ -91,12 +120,179 @@ def load_json(path: str, default: Any) -> Any:
         return json.loads(raw)
 
 
+_NUMBER_CHARS = "0123456789+-.eE"
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Элементы JSON-массива из файла по одному, без загрузки всего документа.
+
+    В памяти — прочитанный кусок файла и текущий элемент. Нет файла или он
+    пуст — ничего; битый JSON (в том числе лишние запятые и данные после
+    закрывающей скобки) — ValueError после уже выданных элементов.
+    """
+    if not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+        # None — до '[', "value" — ждём элемент (или ']' сразу после '['),
+        # "separator" — ждём ',' или ']', "closed" — после ']' допустимы только пробелы
+        state: str | None = None
+        empty = True
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    if state not in (None, "closed"):
+                        raise ValueError(f"{path}: массив JSON не закрыт")
+                    return
+                buf, pos = f.read(chunk_size), 0
+                eof = buf == ""
+                continue
+
+            char = buf[pos]
+            if state is None:
+                if char != "[":
+                    raise ValueError(f"{path}: ожидался JSON-массив")
+                state, pos = "value", pos + 1
+                continue
+            if state == "closed":
+                raise ValueError(f"{path}: данные после конца JSON-массива")
+            if char == "]" and (state == "separator" or empty):
+                state, pos = "closed", pos + 1
+                continue
+            if state == "separator":
+                if char != ",":
+                    raise ValueError(f"{path}: ожидалась ',' или ']'")
+                state, pos = "value", pos + 1
+                continue
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+                # элемент не дочитан: дописываем следующий кусок и пробуем снова
+                chunk = f.read(chunk_size)
+                eof = chunk == ""
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            # число или литерал на границе куска могли прочитаться не полностью ("2." из "2.5"):
+            # до конца куска остались только символы числа
+            cut = len(buf) - end <= 32 and buf[end:].strip(_NUMBER_CHARS) == ""
+            if cut and not isinstance(item, (dict, list, str)):
+                if eof:
+                    if end != len(buf):
+                        raise ValueError(f"{path}: некорректное число в конце файла")
+                else:
+                    chunk = f.read(chunk_size)
+                    eof = chunk == ""
+                    buf, pos = buf[pos:] + chunk, 0
+                    continue
+            yield item
+            pos, state, empty = end, "separator", False
+
+
+def iter_json_lines(path: str) -> Iterator[Any]:
+    """Объекты JSONL-файла по строке; недописанная последняя строка и битые строки пропускаются."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def file_stamp(path: str) -> tuple[int, int, int] | None:
+    """(inode, mtime_ns, size) файла или None, если файла нет."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
 def save_json(path: str, data: Any) -> None:
     """Сохранение JSON."""
-    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    folder = os.path.dirname(path) or "."
+    os.makedirs(folder, exist_ok=True)
+
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def append_json_item(path: str, item: Any) -> tuple[int, int, int] | None:
+    """Дописывание элемента в конец JSON-массива без разбора и пересериализации файла.
+
+    Байты массива до закрывающей скобки копируются во временный файл, за ними
+    пишется элемент, и файл подменяется через os.replace: читатель без
+    блокировки видит либо старый, либо новый массив целиком. Цена записи —
+    копия файла, линейная по его размеру (без JSON-разбора); параллельных
+    писателей исключает вызывающий (file_lock на path).
+
+    Возвращает file_stamp нового файла, чтобы кеш не делал лишний stat.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        save_json(path, [item])
+        return file_stamp(path)
+
+    block = json.dumps(item, ensure_ascii=False, indent=2)
+    block = "\n".join(f"  {line}" for line in block.splitlines())
+
+    folder = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+            size = src.seek(0, os.SEEK_END)
+            close_pos = _last_non_space(src, size)
+            if close_pos < 0 or _byte_at(src, close_pos) != b"]":
+                raise ValueError(f"Файл {path} не является JSON-массивом")
+
+            prev_pos = _last_non_space(src, close_pos)
+            if prev_pos < 0:
+                raise ValueError(f"Файл {path} не является JSON-массивом")
+            sep = "\n" if _byte_at(src, prev_pos) == b"[" else ",\n"
+
+            src.seek(0)
+            left = prev_pos + 1
+            while left > 0:
+                chunk = src.read(min(left, 1 << 20))
+                if not chunk:
+                    raise ValueError(f"Файл {path} изменился во время дозаписи")
+                dst.write(chunk)
+                left -= len(chunk)
+            dst.write(f"{sep}{block}\n]".encode("utf-8"))
+            dst.flush()
+            st = os.fstat(dst.fileno())
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+        return st.st_ino, st.st_mtime_ns, st.st_size
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _byte_at(f: Any, pos: int) -> bytes:
+    f.seek(pos)
+    return f.read(1)
 
-    tmp = f"{path}.tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
 
-    os.replace(tmp, path)
+def _last_non_space(f: Any, end: int) -> int:
+    pos = end - 1
+    while pos >= 0 and _byte_at(f, pos) in b" \t\r\n":
+        pos -= 1
+    return pos
@@ -5,43 +5,89 @@ import logging
 from functools import wraps
 from typing import Any, Callable
 
-from valutatrade_hub.core.utils import now_iso
+_FIELDS = (
+    "username",
+    "user_id",
+    "currency",
+    "currency_code",
+    "from_currency",
+    "to_currency",
+    "amount",
+    "base",
+    "rate",
+)
+
+
+def _binding_plan(func: Callable[..., Any]) -> dict[str, int | None]:
+    """Позиция каждого логируемого параметра (None — только по имени)."""
+    plan: dict[str, int | None] = {}
+    for pos, param in enumerate(inspect.signature(func).parameters.values()):
+        if param.name not in _FIELDS:
+            continue
+        positional = param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD)
+        plan[param.name] = pos if positional else None
+    return plan
+
+
+def _extract(plan: dict[str, int | None], args: tuple, kwargs: dict[str, Any]) -> dict[str, Any]:
+    data: dict[str, Any] = {}
+    for name, pos in plan.items():
+        if name in kwargs:
+            data[name] = kwargs[name]
+        elif pos is not None and pos < len(args):
+            data[name] = args[pos]
+    return data
 
 
 def log_action(action: str, verbose: bool = False) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        plan = _binding_plan(func)
+        logger = logging.getLogger("valutatrade")
+
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
-            logger = logging.getLogger("valutatrade")
-            ts = now_iso()
+            if not logger.isEnabledFor(logging.INFO):
+                return func(*args, **kwargs)
 
-            bound = inspect.signature(func).bind_partial(*args, **kwargs)
-            data = bound.arguments
+            data = _extract(plan, args, kwargs)
 
             user = data.get("username", data.get("user_id"))
             currency = data.get("currency", data.get("currency_code"))
             if currency is None and "from_currency" in data and "to_currency" in data:
                 currency = f"{data['from_currency']}->{data['to_currency']}"
 
-            amount = data.get("amount")
-            base = data.get("base")
-            rate = data.get("rate")
+            event = {
+                "action": action,
+                "user": user,
+                "currency": currency,
+                "amount": data.get("amount"),
+                "rate": data.get("rate"),
+                "base": data.get("base"),
+            }
 
             try:
                 result = func(*args, **kwargs)
-                msg = f"{ts} {action} user='{user}' currency='{currency}' amount={amount} rate={rate} base='{base}' result=OK"
-                logger.info(msg)
-                if verbose:
-                    logger.info(f"{ts} {action} verbose result={result}")
-                return result
             except Exception as e:
-                msg = (
-                    f"{ts} {action} user='{user}' currency='{currency}' amount={amount} "
-                    f"rate={rate} base='{base}' result=ERROR error_type={type(e).__name__} error_message='{e}'"
+                event.update(result="ERROR", error_type=type(e).__name__, error_message=str(e))
+                logger.info(
+                    "%s user='%s' currency='%s' amount=%s rate=%s base='%s' "
+                    "result=ERROR error_type=%s error_message='%s'",
+                    action, user, currency, event["amount"], event["rate"], event["base"],
+                    event["error_type"], event["error_message"],
+                    extra={"event": event},
                 )
-                logger.info(msg)
                 raise
 
+            event["result"] = "OK"
+            logger.info(
+                "%s user='%s' currency='%s' amount=%s rate=%s base='%s' result=OK",
+                action, user, currency, event["amount"], event["rate"], event["base"],
+                extra={"event": event},
+            )
+            if verbose:
+                logger.info("%s verbose result=%s", action, result, extra={"event": event})
+            return result
+
         return wrapper
 
     return decorator
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import threading
+from typing import Any
+
+from .locks import read_version
+
+
+def _copy_wallets(wallets: dict[str, Any]) -> dict[str, Any]:
+    return {code: dict(w) if isinstance(w, dict) else w for code, w in wallets.items()}
+
+
+class CachedStore:
+    """Портфели в памяти поверх хранилища, запись сквозная (write-through).
+
+    Документ с портфелями загружается в память целиком при первом обращении.
+    Закешированные портфели привязаны к версии своего документа
+    (locks.read_version): если документ записал другой процесс, версия
+    меняется и портфели этого документа перечитываются. Хранилища без
+    версий документов (SQLite) читаются напрямую. Остальные методы
+    делегируются хранилищу как есть.
+    """
+
+    def __init__(self, store: Any) -> None:
+        self._store = store
+        self._lock = threading.Lock()
+        self._docs: dict[str, tuple[int, dict[int, dict[str, Any]]]] = {}
+
+    @property
+    def inner(self) -> Any:
+        return self._store
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._store, name)
+
+    def read_portfolio(self, user_id: int) -> dict[str, Any] | None:
+        uid = int(user_id)
+        doc = self._store.portfolio_document(uid)
+        if doc is None:
+            return self._store.read_portfolio(uid)
+
+        # в транзакции документ блокируется до сверки версии, как при обычном чтении
+        self._store.hold_document(doc)
+        version = read_version(doc)
+        with self._lock:
+            cached = self._docs.get(doc)
+            if cached is not None and cached[0] == version:
+                wallets = cached[1].get(uid)
+                return None if wallets is None else _copy_wallets(wallets)
+
+        # промах: документ загружается целиком, следующие пользователи из него — из памяти
+        portfolios = self._store.read_portfolio_document(doc)
+        with self._lock:
+            self._docs[doc] = (version, portfolios)
+            wallets = portfolios.get(uid)
+            return None if wallets is None else _copy_wallets(wallets)
+
+    def write_portfolio(self, user_id: int, wallets: dict[str, Any]) -> None:
+        uid = int(user_id)
+        self._write_through(uid, wallets, lambda: self._store.write_portfolio(uid, wallets))
+
+    def add_portfolio(self, user_id: int) -> None:
+        uid = int(user_id)
+        self._write_through(uid, {}, lambda: self._store.add_portfolio(uid))
+
+    def write_portfolios(self, portfolios: list[dict[str, Any]]) -> None:
+        self._store.write_portfolios(portfolios)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._docs.clear()
+
+    def _write_through(self, uid: int, wallets: dict[str, Any], write: Any) -> None:
+        doc = self._store.portfolio_document(uid)
+        if doc is None:
+            write()
+            return
+
+        before = read_version(doc)
+        try:
+            write()
+        except BaseException:
+            with self._lock:
+                self._docs.pop(doc, None)
+            raise
+        after = read_version(doc)
+
+        with self._lock:
+            cached = self._docs.get(doc)
+            # между чтениями версии документ писали только мы: остальной кеш документа актуален
+            if cached is not None and cached[0] == before and after == before + 1:
+                cached[1][uid] = _copy_wallets(wallets)
+                self._docs[doc] = (after, cached[1])
+            else:
+                self._docs.pop(doc, None)
@@ -1,13 +1,33 @@
 from __future__ import annotations
 
+from contextlib import AbstractContextManager
 from typing import Any
 
-from valutatrade_hub.core.utils import load_json, save_json
+from .cached_store import CachedStore
+from .json_store import JsonStore
+from .metrics import timed
 from .settings import SettingsLoader
+from .sharded_store import ShardedJsonStore
+from .sqlite_store import SqliteStore
+
+
+_storage_timed = timed("valutatrade_storage", "Операции хранилища")
+
+
+def make_store(settings: SettingsLoader, backend: str | None = None) -> JsonStore | SqliteStore:
+    """Хранилище по имени бэкенда (по умолчанию STORAGE_BACKEND из настроек)."""
+    name = str(backend or settings.get("STORAGE_BACKEND", "json")).strip().lower()
+    if name == "json":
+        return JsonStore(settings)
+    if name == "sharded":
+        return ShardedJsonStore(settings)
+    if name == "sqlite":
+        return SqliteStore(settings)
+    raise ValueError(f"Неизвестный бэкенд хранилища: {name}")
 
 
 class DatabaseManager:
-    """Доступ к JSON."""
+    """Доступ к хранилищу (JSON, шардированный JSON или SQLite)."""
 
     _instance: "DatabaseManager | None" = None
 
@@ -15,28 +35,79 @@ class DatabaseManager:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._settings = SettingsLoader()
+            cls._instance._store = make_store(cls._instance._settings)
         return cls._instance
 
-    def _path(self, key: str) -> str:
-        value = self._settings.get(key)
-        if not isinstance(value, str) or value.strip() == "":
-            raise ValueError(f"Некорректный путь: {key}")
-        return value
+    @property
+    def store(self) -> JsonStore | SqliteStore:
+        return self._store
 
+    def enable_portfolio_cache(self) -> None:
+        """Держать портфели в памяти со сквозной записью (для долгоживущего процесса)."""
+        if not isinstance(self._store, CachedStore):
+            self._store = CachedStore(self._store)
+
+    def transaction(self) -> AbstractContextManager[Any]:
+        """Атомарная группа операций (одна сделка)."""
+        return self._store.transaction()
+
+    @_storage_timed
     def read_users(self) -> list[dict[str, Any]]:
-        return load_json(self._path("USERS_PATH"), [])
+        return self._store.read_users()
 
+    @_storage_timed
     def write_users(self, users: list[dict[str, Any]]) -> None:
-        save_json(self._path("USERS_PATH"), users)
+        self._store.write_users(users)
+
+    @_storage_timed
+    def find_user(self, username: str) -> dict[str, Any] | None:
+        return self._store.find_user(username)
 
+    @_storage_timed
+    def add_user(
+        self,
+        username: str,
+        hashed_password: str,
+        salt: str,
+        registration_date: str,
+    ) -> int:
+        return self._store.add_user(username, hashed_password, salt, registration_date)
+
+    @_storage_timed
     def read_portfolios(self) -> list[dict[str, Any]]:
-        return load_json(self._path("PORTFOLIOS_PATH"), [])
+        return self._store.read_portfolios()
 
+    @_storage_timed
     def write_portfolios(self, portfolios: list[dict[str, Any]]) -> None:
-        save_json(self._path("PORTFOLIOS_PATH"), portfolios)
+        self._store.write_portfolios(portfolios)
+
+    @_storage_timed
+    def add_portfolio(self, user_id: int) -> None:
+        self._store.add_portfolio(user_id)
+
+    @_storage_timed
+    def read_portfolio(self, user_id: int) -> dict[str, Any] | None:
+        return self._store.read_portfolio(user_id)
+
+    @_storage_timed
+    def write_portfolio(self, user_id: int, wallets: dict[str, Any]) -> None:
+        self._store.write_portfolio(user_id, wallets)
 
+    @_storage_timed
     def read_rates(self) -> dict[str, Any]:
-        return load_json(self._path("RATES_PATH"), {})
+        return self._store.read_rates()
 
+    @_storage_timed
     def write_rates(self, rates: dict[str, Any]) -> None:
-        save_json(self._path("RATES_PATH"), rates)
+        self._store.write_rates(rates)
+
+    @_storage_timed
+    def merge_rates(self, pairs_update: dict[str, dict], refresh_ts: str) -> None:
+        self._store.merge_rates(pairs_update, refresh_ts)
+
+    @_storage_timed
+    def touch_rates(self, pairs: list[str], updated_at: str) -> None:
+        self._store.touch_rates(pairs, updated_at)
+
+    def rates_stamp(self) -> Any:
+        return self._store.rates_stamp()
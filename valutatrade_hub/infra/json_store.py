@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Iterator
+
+from valutatrade_hub.core.utils import append_json_item, file_stamp, load_json, save_json
+from .locks import VersionConflictError, bump_version, file_lock, read_version
+from .settings import SettingsLoader
+from .users import UserRepository
+
+
+class JsonStore:
+    """Хранилище в JSON-файлах (users.json, portfolios.json, rates.json).
+
+    Несколько процессов работают с одними файлами безопасно: каждая запись
+    идёт под advisory-блокировкой документа и увеличивает его версию.
+    Read-modify-write выполняется оптимистично — чтение и изменение без
+    блокировки, запись под блокировкой только если версия не изменилась,
+    иначе повтор. Внутри transaction() документ блокируется при первом
+    обращении и остаётся заблокированным до конца транзакции.
+    """
+
+    def __init__(self, settings: SettingsLoader) -> None:
+        self._settings = settings
+        self._users: UserRepository | None = None
+        self._lock_timeout = float(settings.get("LOCK_TIMEOUT_SECONDS", 10.0))
+        self._retries = int(settings.get("OPTIMISTIC_RETRIES", 5))
+        self._local = threading.local()
+
+    def _path(self, key: str) -> str:
+        value = self._settings.get(key)
+        if not isinstance(value, str) or value.strip() == "":
+            raise ValueError(f"Некорректный путь: {key}")
+        return value
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """Блокировки документов, затронутых внутри, держатся до выхода."""
+        if getattr(self._local, "tx", None) is not None:
+            yield
+            return
+
+        with ExitStack() as stack:
+            self._local.tx = (stack, set())
+            try:
+                yield
+            finally:
+                self._local.tx = None
+
+    def _hold(self, path: str) -> None:
+        """В транзакции: блокирует документ до её конца (повторно — без эффекта)."""
+        tx = getattr(self._local, "tx", None)
+        if tx is not None and path not in tx[1]:
+            tx[0].enter_context(file_lock(path, self._lock_timeout))
+            tx[1].add(path)
+
+    def hold_document(self, path: str) -> None:
+        """Публичный вариант _hold: для обёрток, читающих документ мимо хранилища."""
+        self._hold(path)
+
+    @contextmanager
+    def _locked(self, path: str) -> Iterator[None]:
+        self._hold(path)
+        with file_lock(path, self._lock_timeout):
+            yield
+
+    def _read(self, path: str, default: Any) -> Any:
+        self._hold(path)
+        return load_json(path, default)
+
+    def _save(self, path: str, data: Any) -> None:
+        with self._locked(path):
+            save_json(path, data)
+            bump_version(path)
+
+    def _update(self, path: str, default: Any, mutate: Callable[[Any], Any]) -> None:
+        """Оптимистичный read-modify-write документа с повтором при конфликте версий."""
+        for attempt in range(self._retries):
+            version = read_version(path)
+            data = mutate(self._read(path, default))
+            with self._locked(path):
+                if read_version(path) == version:
+                    save_json(path, data)
+                    bump_version(path)
+                    return
+            time.sleep(random.uniform(0, 0.005 * 2 ** attempt))
+        raise VersionConflictError(path, self._retries)
+
+    def read_users(self) -> list[dict[str, Any]]:
+        return self._read(self._path("USERS_PATH"), [])
+
+    def write_users(self, users: list[dict[str, Any]]) -> None:
+        self._save(self._path("USERS_PATH"), users)
+        self._user_repository().invalidate()
+
+    def _user_repository(self) -> UserRepository:
+        if self._users is None:
+            self._users = UserRepository(
+                self._path("USERS_PATH"),
+                self._path("USERS_SEQ_PATH"),
+            )
+        return self._users
+
+    def find_user(self, username: str) -> dict[str, Any] | None:
+        return self._user_repository().get(username)
+
+    def add_user(
+        self,
+        username: str,
+        hashed_password: str,
+        salt: str,
+        registration_date: str,
+    ) -> int:
+        path = self._path("USERS_PATH")
+        with self._locked(path):
+            user_id = self._user_repository().add(username, hashed_password, salt, registration_date)
+            bump_version(path)
+        return user_id
+
+    def read_portfolios(self) -> list[dict[str, Any]]:
+        return self._read(self._path("PORTFOLIOS_PATH"), [])
+
+    def write_portfolios(self, portfolios: list[dict[str, Any]]) -> None:
+        self._save(self._path("PORTFOLIOS_PATH"), portfolios)
+
+    def add_portfolio(self, user_id: int) -> None:
+        path = self._path("PORTFOLIOS_PATH")
+        with self._locked(path):
+            append_json_item(path, {"user_id": user_id, "wallets": {}})
+            bump_version(path)
+
+    def portfolio_document(self, user_id: int) -> str | None:
+        """Файл, в котором лежит портфель пользователя (для кеша по версии документа)."""
+        return self._path("PORTFOLIOS_PATH")
+
+    def read_portfolio_document(self, path: str) -> dict[int, dict[str, Any]]:
+        """Все портфели документа: {user_id: wallets}."""
+        return {int(p["user_id"]): p.get("wallets", {}) for p in self._read(path, [])}
+
+    def read_portfolio(self, user_id: int) -> dict[str, Any] | None:
+        for p in self.read_portfolios():
+            if int(p["user_id"]) == int(user_id):
+                return p.get("wallets", {})
+        return None
+
+    def write_portfolio(self, user_id: int, wallets: dict[str, Any]) -> None:
+        def replace(portfolios: list[dict[str, Any]]) -> list[dict[str, Any]]:
+            for i, p in enumerate(portfolios):
+                if int(p["user_id"]) == int(user_id):
+                    portfolios[i] = {"user_id": user_id, "wallets": wallets}
+                    return portfolios
+            raise ValueError("Портфель не найден")
+
+        self._update(self._path("PORTFOLIOS_PATH"), [], replace)
+
+    def read_rates(self) -> dict[str, Any]:
+        return load_json(self._path("RATES_PATH"), {})
+
+    def write_rates(self, rates: dict[str, Any]) -> None:
+        self._save(self._path("RATES_PATH"), rates)
+
+    def rates_stamp(self) -> Any:
+        """Метка версии кеша курсов: меняется при любой перезаписи rates.json."""
+        return file_stamp(self._path("RATES_PATH"))
+
+    def merge_rates(self, pairs_update: dict[str, dict], refresh_ts: str) -> None:
+        """Сливает свежие пары в кеш: запись заменяется только более новой."""
+        def merge(cache: dict[str, Any]) -> dict[str, Any]:
+            pairs = cache.get("pairs", {})
+            for pair, data in pairs_update.items():
+                current = pairs.get(pair)
+                if current is None or data["updated_at"] > current["updated_at"]:
+                    pairs[pair] = data
+            cache["pairs"] = pairs
+            cache["last_refresh"] = refresh_ts
+            return cache
+
+        path = self._path("RATES_PATH")
+        try:
+            self._update(path, {}, merge)
+        except json.JSONDecodeError:
+            self._save(path, merge({}))
+
+    def touch_rates(self, pairs: list[str], updated_at: str) -> None:
+        """Продлевает свежесть пар, подтверждённых источником (304): меняется только updated_at."""
+        def touch(cache: dict[str, Any]) -> dict[str, Any]:
+            current = cache.get("pairs", {})
+            for pair in pairs:
+                data = current.get(pair)
+                if isinstance(data, dict) and updated_at > data.get("updated_at", ""):
+                    data["updated_at"] = updated_at
+            cache["last_refresh"] = updated_at
+            return cache
+
+        self._update(self._path("RATES_PATH"), {}, touch)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: advisory-блокировки недоступны, работаем как раньше
+    fcntl = None  # type: ignore[assignment]
+
+LOCK_SUFFIX = ".lock"
+
+_held = threading.local()
+
+
+class LockTimeoutError(TimeoutError):
+    """Не удалось взять блокировку документа за отведённое время."""
+
+    def __init__(self, path: str, timeout: float) -> None:
+        super().__init__(f"Документ {path} заблокирован другим процессом дольше {timeout:.0f} с")
+
+
+class VersionConflictError(RuntimeError):
+    """Документ всё время меняется другими процессами: повторы исчерпаны."""
+
+    def __init__(self, path: str, attempts: int) -> None:
+        super().__init__(f"Конфликт версий {path}: не удалось записать за {attempts} попыток")
+
+
+def _held_locks() -> dict[str, list[int]]:
+    locks = getattr(_held, "locks", None)
+    if locks is None:
+        locks = _held.locks = {}
+    return locks
+
+
+def _acquire(fd: int, path: str, timeout: float) -> None:
+    if fcntl is None:
+        return
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            if time.monotonic() >= deadline:
+                raise LockTimeoutError(path, timeout) from None
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+
+@contextmanager
+def file_lock(path: str, timeout: float = 10.0) -> Iterator[None]:
+    """Эксклюзивная advisory-блокировка документа через <path>.lock.
+
+    Блокируется отдельный файл, а не сам документ: save_json подменяет
+    документ через os.replace, и блокировка на старом inode ничего бы не защищала.
+    Повторный вход в том же потоке не блокирует.
+    """
+    lock_path = path + LOCK_SUFFIX
+    locks = _held_locks()
+    entry = locks.get(lock_path)
+    if entry is not None:
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+        return
+
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        _acquire(fd, path, timeout)
+        locks[lock_path] = [fd, 1]
+        try:
+            yield
+        finally:
+            del locks[lock_path]
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def read_version(path: str) -> int:
+    """Счётчик версий документа (хранится в его lock-файле); 0 — ещё не писался."""
+    try:
+        with open(path + LOCK_SUFFIX, "rb") as f:
+            raw = f.read(32).strip()
+    except FileNotFoundError:
+        return 0
+    return int(raw) if raw.isdigit() else 0
+
+
+def bump_version(path: str) -> int:
+    """Увеличивает версию документа; вызывать только под file_lock(path)."""
+    entry = _held_locks().get(path + LOCK_SUFFIX)
+    if entry is None:
+        raise RuntimeError(f"bump_version без блокировки {path}")
+    fd = entry[0]
+    raw = os.pread(fd, 32, 0).strip()
+    version = (int(raw) if raw.isdigit() else 0) + 1
+    data = str(version).encode("ascii")
+    os.pwrite(fd, data, 0)
+    os.ftruncate(fd, len(data))
+    return version
@@ -0,0 +1,349 @@
+from __future__ import annotations
+
+import bisect
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Iterator
+
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels_key(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Family:
+    TYPE = ""
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+
+class Counter(_Family):
+    """Монотонный счётчик (по набору меток)."""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        super().__init__(name, help_text)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_labels_key(labels), 0.0)
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, labels, value
+
+
+class Gauge(_Family):
+    """Текущее значение (может расти и убывать)."""
+
+    TYPE = "gauge"
+
+    def __init__(self, name: str, help_text: str) -> None:
+        super().__init__(name, help_text)
+        self._values: dict[Labels, float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[_labels_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_labels_key(labels), 0.0)
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, labels, value
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(_Family):
+    """Гистограмма с фиксированными границами корзин (последняя — +Inf)."""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: dict[Labels, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _labels_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets))
+            series.counts[idx] += 1
+            series.total += value
+            series.count += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def series(self) -> dict[Labels, tuple[list[int], float, int]]:
+        with self._lock:
+            return {k: (list(s.counts), s.total, s.count) for k, s in sorted(self._series.items())}
+
+    def quantile(self, q: float, **labels: Any) -> float | None:
+        data = self.series().get(_labels_key(labels))
+        return None if data is None else self._quantile(data[0], data[2], q)
+
+    def _quantile(self, counts: list[int], count: int, q: float) -> float | None:
+        """Оценка квантиля линейной интерполяцией внутри корзины (как histogram_quantile)."""
+        if count == 0:
+            return None
+        rank = q * count
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                upper = self.buckets[i]
+                lower = self.buckets[i - 1] if i else 0.0
+                if upper == float("inf"):
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-2]
+
+    def summary(self) -> list[dict[str, Any]]:
+        rows = []
+        for labels, (counts, total, count) in self.series().items():
+            rows.append(
+                {
+                    "labels": dict(labels),
+                    "count": count,
+                    "mean": total / count if count else None,
+                    "p50": self._quantile(counts, count, 0.50),
+                    "p90": self._quantile(counts, count, 0.90),
+                    "p99": self._quantile(counts, count, 0.99),
+                }
+            )
+        return rows
+
+    def samples(self) -> Iterator[tuple[str, Labels, float]]:
+        for labels, (counts, total, count) in self.series().items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", labels + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+class MetricsRegistry:
+    """Метрики процесса: счётчики, gauge и гистограммы задержек."""
+
+    _instance: "MetricsRegistry | None" = None
+
+    def __new__(cls) -> "MetricsRegistry":
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._families = {}
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def _get(self, kind: type, name: str, help_text: str, **kwargs: Any) -> Any:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = kind(name, help_text, **kwargs)
+            elif not isinstance(family, kind):
+                raise ValueError(f"Метрика {name} уже зарегистрирована как {family.TYPE}")
+            return family
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "") -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str = "",
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def families(self) -> list[Counter | Gauge | Histogram]:
+        with self._lock:
+            return [self._families[k] for k in sorted(self._families)]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._families.clear()
+
+    def render_prometheus(self) -> str:
+        """Текстовый формат экспозиции Prometheus 0.0.4."""
+        lines: list[str] = []
+        for family in self.families():
+            if family.help:
+                lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.TYPE}")
+            for name, labels, value in family.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str) -> None:
+        """Атомарно пишет файл для node_exporter textfile collector."""
+        folder = os.path.dirname(path) or "."
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=".metrics.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.render_prometheus())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+_SAMPLE_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$")
+_LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+_UNESCAPE = {"\\\\": "\\", "\\n": "\n", '\\"': '"'}
+
+
+def parse_prometheus(text: str) -> list[Counter | Gauge | Histogram]:
+    """Семейства метрик из текстового формата Prometheus (обратное render_prometheus)."""
+    kinds: dict[str, str] = {}
+    helps: dict[str, str] = {}
+    samples: list[tuple[str, Labels, float]] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("# HELP "):
+            name, _, help_text = line[7:].partition(" ")
+            helps[name] = help_text
+        elif line.startswith("# TYPE "):
+            name, _, kind = line[7:].partition(" ")
+            kinds[name] = kind.strip()
+        elif line and not line.startswith("#"):
+            match = _SAMPLE_RE.match(line)
+            if match is None:
+                raise ValueError(f"Некорректная строка метрик: {line!r}")
+            labels = tuple(
+                (k, re.sub(r"\\.", lambda m: _UNESCAPE.get(m.group(0), m.group(0)), v))
+                for k, v in _LABEL_RE.findall(match.group(2) or "")
+            )
+            samples.append((match.group(1), labels, float(match.group(3))))
+
+    families: dict[str, Counter | Gauge | Histogram] = {}
+    buckets: dict[str, dict[Labels, dict[float, float]]] = {}
+    totals: dict[str, dict[Labels, list[float]]] = {}
+    for name, labels, value in samples:
+        base, _, suffix = name.rpartition("_")
+        if kinds.get(base) == "histogram" and suffix in {"bucket", "sum", "count"}:
+            if suffix == "bucket":
+                le = dict(labels).get("le", "+Inf")
+                rest = tuple(item for item in labels if item[0] != "le")
+                buckets.setdefault(base, {}).setdefault(rest, {})[float(le)] = value
+            else:
+                pair = totals.setdefault(base, {}).setdefault(labels, [0.0, 0.0])
+                pair[0 if suffix == "sum" else 1] = value
+            continue
+        family = families.get(name)
+        if family is None:
+            cls = Counter if kinds.get(name) == "counter" else Gauge
+            family = families[name] = cls(name, helps.get(name, ""))
+        family._values[labels] = value
+
+    for base, series in buckets.items():
+        bounds = sorted({b for per_labels in series.values() for b in per_labels if b != float("inf")})
+        hist = Histogram(base, helps.get(base, ""), buckets=tuple(bounds))
+        for labels, cumulative in series.items():
+            item = hist._series[labels] = _HistogramSeries(len(hist.buckets))
+            previous = 0.0
+            for i, bound in enumerate(hist.buckets):
+                current = cumulative.get(bound, previous)
+                item.counts[i] = int(current - previous)
+                previous = current
+            item.total, count = totals.get(base, {}).get(labels, [0.0, previous])
+            item.count = int(count)
+        families[base] = hist
+    return [families[k] for k in sorted(families)]
+
+
+def timed(metric: str, help_text: str, **labels: Any) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Длительность вызова в гистограмму <metric>_seconds и исходы в <metric>_total."""
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        op_labels = {"op": func.__name__, **labels}
+
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            outcome = "ok"
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                outcome = "error"
+                raise
+            finally:
+                # реестр берётся на каждый вызов: после сброса синглтона метрики идут в новый
+                registry = MetricsRegistry()
+                registry.histogram(f"{metric}_seconds", f"{help_text}: длительность, с").observe(
+                    time.perf_counter() - start, **op_labels
+                )
+                registry.counter(f"{metric}_total", f"{help_text}: число вызовов").inc(
+                    result=outcome, **op_labels
+                )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import argparse
+from typing import Any
+
+from .database import make_store
+from .settings import SettingsLoader
+
+
+def migrate_json_to_sqlite(settings: SettingsLoader | None = None) -> dict[str, int]:
+    """Однократный перенос data/*.json в SQLite одной транзакцией."""
+    settings = settings or SettingsLoader()
+    source = make_store(settings, "json")
+    target = make_store(settings, "sqlite")
+
+    users = source.read_users()
+    portfolios = source.read_portfolios()
+    rates = source.read_rates()
+
+    with target.transaction():
+        target.write_users(users)
+        target.write_portfolios(portfolios)
+        target.write_rates(rates)
+
+    return {
+        "users": len(users),
+        "portfolios": len(portfolios),
+        "rates": len(rates.get("pairs", {})),
+    }
+
+
+def migrate_json_to_sharded(settings: SettingsLoader | None = None) -> dict[str, int]:
+    """Раскладывает portfolios.json по файлам-корзинам PORTFOLIOS_SHARD_DIR."""
+    settings = settings or SettingsLoader()
+    portfolios = make_store(settings, "json").read_portfolios()
+    make_store(settings, "sharded").write_portfolios(portfolios)
+    return {"portfolios": len(portfolios)}
+
+
+def round_balances(settings: SettingsLoader | None = None, apply: bool = False) -> list[dict[str, Any]]:
+    """Балансы с лишними знаками после scale валюты: (user_id, currency, old, new).
+
+    Кошелёк хранит баланс в минимальных единицах и при загрузке округляет
+    такие значения; миграция показывает эти изменения и при apply=True
+    записывает округлённые балансы портфель за портфелем.
+    """
+    from valutatrade_hub.core.currencies import currency_scale
+    from valutatrade_hub.core.models import rounded_to_scale
+
+    settings = settings or SettingsLoader()
+    store = make_store(settings)
+    changes: list[dict[str, Any]] = []
+    for portfolio in store.read_portfolios():
+        user_id = int(portfolio["user_id"])
+        wallets = portfolio.get("wallets", {})
+        changed = False
+        for code, wallet in wallets.items():
+            balance = wallet.get("balance") if isinstance(wallet, dict) else None
+            if isinstance(balance, bool) or not isinstance(balance, (int, float)):
+                continue
+            rounded = rounded_to_scale(balance, currency_scale(code))
+            if rounded is not None:
+                changes.append({"user_id": user_id, "currency": code, "old": balance, "new": rounded})
+                wallet["balance"] = rounded
+                changed = True
+        if apply and changed:
+            store.write_portfolio(user_id, wallets)
+    return changes
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Миграция хранилища ValutaTrade Hub")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--to", choices=["sqlite", "sharded"])
+    target.add_argument(
+        "--round-balances",
+        action="store_true",
+        help="показать балансы точнее scale валюты (с --apply — округлить их в хранилище)",
+    )
+    parser.add_argument("--apply", action="store_true", help="для --round-balances: записать изменения")
+    args = parser.parse_args(argv)
+
+    if args.round_balances:
+        changes = round_balances(apply=args.apply)
+        for change in changes:
+            print(f"user {change['user_id']} {change['currency']}: {change['old']!r} -> {change['new']!r}")
+        verb = "Округлено" if args.apply else "Будет округлено (запустите с --apply)"
+        print(f"{verb} балансов: {len(changes)}" if changes else "Все балансы уже в пределах scale валют.")
+    elif args.to == "sqlite":
+        counts = migrate_json_to_sqlite()
+        path = SettingsLoader().get("SQLITE_PATH")
+        print(
+            f"Перенесено в {path}: пользователей {counts['users']}, "
+            f"портфелей {counts['portfolios']}, курсов {counts['rates']}"
+        )
+    elif args.to == "sharded":
+        counts = migrate_json_to_sharded()
+        path = SettingsLoader().get("PORTFOLIOS_SHARD_DIR")
+        print(f"Перенесено в {path}: портфелей {counts['portfolios']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import threading
+from typing import Any
+
+from valutatrade_hub.core.cross_rates import CrossRateMatrix
+from valutatrade_hub.core.rate_book import RateBook
+from .database import DatabaseManager
+from .settings import SettingsLoader
+
+
+class RatesCache:
+    """Снимок кеша курсов на процесс; перечитывается только при изменении хранилища."""
+
+    _instance: "RatesCache | None" = None
+
+    def __new__(cls) -> "RatesCache":
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._snapshot = None
+            cls._instance._stamp = None
+            cls._instance._cross = None
+            cls._instance._cross_for = None
+            cls._instance._book = None
+            cls._instance._book_for = None
+            cls._instance._lock = threading.Lock()
+        return cls._instance
+
+    def snapshot(self) -> dict[str, Any]:
+        """Текущий снимок {"pairs": ..., "last_refresh": ...}; не изменять."""
+        db = DatabaseManager()
+        stamp = db.rates_stamp()
+        snapshot = self._snapshot
+        if snapshot is not None and stamp == self._stamp:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is None or stamp != self._stamp:
+                rates = db.read_rates()
+                pairs = rates.get("pairs", {})
+                self._snapshot = {
+                    "pairs": pairs if isinstance(pairs, dict) else {},
+                    "last_refresh": rates.get("last_refresh"),
+                }
+                self._stamp = stamp
+            return self._snapshot
+
+    def cross_rates(self) -> CrossRateMatrix:
+        """Кросс-курсы через опорные валюты для текущего снимка; строится один раз на снимок."""
+        snapshot = self.snapshot()
+        cross = self._cross
+        if cross is not None and self._cross_for is snapshot:
+            return cross
+
+        pivots = SettingsLoader().get("CROSS_RATE_PIVOTS", ("USD",))
+        cross = CrossRateMatrix(snapshot["pairs"], pivots)
+        with self._lock:
+            self._cross = cross
+            self._cross_for = snapshot
+        return cross
+
+    def rate_book(self) -> RateBook:
+        """Индексированная книга курсов текущего снимка; строится один раз на снимок."""
+        snapshot = self.snapshot()
+        book = self._book
+        if book is not None and self._book_for is snapshot:
+            return book
+
+        book = RateBook(snapshot["pairs"], snapshot["last_refresh"])
+        with self._lock:
+            self._book = book
+            self._book_for = snapshot
+        return book
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+            self._stamp = None
+            self._cross = None
+            self._cross_for = None
+            self._book = None
+            self._book_for = None
+            self._book = None
+            self._book_for = None
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from typing import Any
 
 
@@ -12,12 +13,33 @@ class SettingsLoader:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._data = {
+                "STORAGE_BACKEND": os.getenv("VALUTATRADE_STORAGE_BACKEND", "json"),
+                "SQLITE_PATH": "data/valutatrade.db",
                 "USERS_PATH": "data/users.json",
+                "USERS_SEQ_PATH": "data/users.seq",
                 "PORTFOLIOS_PATH": "data/portfolios.json",
+                "PORTFOLIOS_SHARD_DIR": "data/portfolios",
+                "PORTFOLIO_SHARDS": 256,
                 "RATES_PATH": "data/rates.json",
+                "CURRENCIES_PATH": "data/currencies.json",
+                "LOCK_TIMEOUT_SECONDS": 10.0,
+                "OPTIMISTIC_RETRIES": 5,
                 "EXCHANGE_RATES_HISTORY_PATH": "data/exchange_rates.json",
+                "EXCHANGE_RATES_HISTORY_DIR": "data/history",
+                "HISTORY_SEGMENT_BYTES": 8_000_000,
+                "HISTORY_COLUMNS_DIR": "data/history_columns",
+                "ROLLUPS_DIR": "data/rollups",
+                "ROLLUP_INTERVALS": ("1m", "1h", "1d"),
                 "RATES_TTL_SECONDS": 300,
                 "DEFAULT_BASE_CURRENCY": "USD",
+                "CROSS_RATE_PIVOTS": ("USD", "EUR", "BTC"),
+                "SCHEDULER_STATE_PATH": "data/scheduler_state.json",
+                "METRICS_PATH": "data/metrics.prom",
+                "SERVER_HOST": "127.0.0.1",
+                "SERVER_PORT": 8765,
+                "SERVER_WORKERS": 4,
+                "SERVER_MAX_BODY_BYTES": 1_000_000,
+                "SERVER_SESSION_TTL_SECONDS": 3600,
                 "LOG_PATH": "logs/actions.log",
                 "LOG_LEVEL": "INFO",
                 "LOG_ROTATE_BYTES": 200_000,
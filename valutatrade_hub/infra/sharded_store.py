@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+from typing import Any
+
+from valutatrade_hub.core.utils import load_json, save_json
+from .json_store import JsonStore
+from .locks import bump_version, file_lock
+from .settings import SettingsLoader
+
+
+class ShardedJsonStore(JsonStore):
+    """JSON-хранилище, где портфели разложены по файлам-корзинам (user_id % N)."""
+
+    def __init__(self, settings: SettingsLoader) -> None:
+        super().__init__(settings)
+        self._shard_dir = self._path("PORTFOLIOS_SHARD_DIR")
+        self._shards = self._load_shard_count(int(settings.get("PORTFOLIO_SHARDS", 256)))
+
+    def _load_shard_count(self, default: int) -> int:
+        meta_path = os.path.join(self._shard_dir, "_meta.json")
+        with file_lock(meta_path, self._lock_timeout):
+            meta = load_json(meta_path, None)
+            if isinstance(meta, dict) and int(meta.get("shards", 0)) > 0:
+                return int(meta["shards"])
+            if default <= 0:
+                raise ValueError("PORTFOLIO_SHARDS должен быть > 0")
+            save_json(meta_path, {"shards": default})
+        return default
+
+    def _shard_path(self, user_id: int) -> str:
+        return os.path.join(self._shard_dir, f"{int(user_id) % self._shards:04d}.json")
+
+    def portfolio_document(self, user_id: int) -> str | None:
+        return self._shard_path(user_id)
+
+    def read_portfolio_document(self, path: str) -> dict[int, dict[str, Any]]:
+        return {int(uid): wallets for uid, wallets in self._read_shard(path).items()}
+
+    def _read_shard(self, path: str) -> dict[str, Any]:
+        return self._read(path, {})
+
+    def read_portfolio(self, user_id: int) -> dict[str, Any] | None:
+        return self._read_shard(self._shard_path(user_id)).get(str(int(user_id)))
+
+    def write_portfolio(self, user_id: int, wallets: dict[str, Any]) -> None:
+        key = str(int(user_id))
+
+        def replace(shard: dict[str, Any]) -> dict[str, Any]:
+            if key not in shard:
+                raise ValueError("Портфель не найден")
+            shard[key] = wallets
+            return shard
+
+        self._update(self._shard_path(user_id), {}, replace)
+
+    def add_portfolio(self, user_id: int) -> None:
+        key = str(int(user_id))
+
+        def add(shard: dict[str, Any]) -> dict[str, Any]:
+            shard.setdefault(key, {})
+            return shard
+
+        self._update(self._shard_path(user_id), {}, add)
+
+    def read_portfolios(self) -> list[dict[str, Any]]:
+        result: list[dict[str, Any]] = []
+        if not os.path.isdir(self._shard_dir):
+            return result
+        for name in os.listdir(self._shard_dir):
+            if not name.endswith(".json") or name.startswith("_"):
+                continue
+            shard = self._read_shard(os.path.join(self._shard_dir, name))
+            result.extend({"user_id": int(uid), "wallets": w} for uid, w in shard.items())
+        result.sort(key=lambda p: p["user_id"])
+        return result
+
+    def write_portfolios(self, portfolios: list[dict[str, Any]]) -> None:
+        shards: dict[str, dict[str, Any]] = {}
+        for p in portfolios:
+            uid = int(p["user_id"])
+            shards.setdefault(self._shard_path(uid), {})[str(uid)] = p.get("wallets", {})
+
+        if os.path.isdir(self._shard_dir):
+            for name in os.listdir(self._shard_dir):
+                path = os.path.join(self._shard_dir, name)
+                if name.endswith(".json") and not name.startswith("_") and path not in shards:
+                    with self._locked(path):
+                        os.remove(path)
+                        bump_version(path)
+
+        for path, shard in shards.items():
+            self._save(path, shard)
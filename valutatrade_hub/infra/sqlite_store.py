@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from .settings import SettingsLoader
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    hashed_password TEXT NOT NULL,
+    salt TEXT NOT NULL,
+    registration_date TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS portfolios (
+    user_id INTEGER PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS wallets (
+    user_id INTEGER NOT NULL,
+    currency_code TEXT NOT NULL,
+    balance_minor INTEGER NOT NULL,
+    scale INTEGER NOT NULL,
+    PRIMARY KEY (user_id, currency_code)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rates (
+    pair TEXT PRIMARY KEY,
+    rate REAL NOT NULL,
+    updated_at TEXT NOT NULL,
+    source TEXT
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS rates_updated_at ON rates (updated_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+# PRAGMA user_version: 1 — балансы в целых минимальных единицах (balance_minor, scale);
+# 0 — база до этого, с wallets.balance REAL.
+_SCHEMA_VERSION = 1
+
+
+def _wallet_row(user_id: int, code: Any, wallet: Any) -> tuple[int, str, int, int]:
+    """Строка wallets: баланс в минимальных единицах по scale валюты из реестра."""
+    from valutatrade_hub.core.currencies import currency_scale
+    from valutatrade_hub.core.models import to_minor
+
+    code = str(code).upper()
+    scale = currency_scale(code)
+    balance = wallet.get("balance", 0) if isinstance(wallet, dict) else 0
+    if isinstance(balance, bool) or not isinstance(balance, (int, float)):
+        balance = float(balance)
+    return user_id, code, to_minor(balance, scale), scale
+
+
+def _balance(row: sqlite3.Row) -> float:
+    from valutatrade_hub.core.models import from_minor
+
+    return from_minor(int(row["balance_minor"]), int(row["scale"]))
+
+
+class SqliteStore:
+    """Хранилище в SQLite (WAL): пользователи, кошельки и курсы в таблицах.
+
+    Балансы хранятся INTEGER в минимальных единицах валюты вместе с её scale,
+    поэтому повторные чтения и записи не накапливают ошибку REAL.
+    """
+
+    def __init__(self, settings: SettingsLoader) -> None:
+        path = settings.get("SQLITE_PATH")
+        if not isinstance(path, str) or path.strip() == "":
+            raise ValueError("Некорректный путь: SQLITE_PATH")
+        self._db_path = path
+        self._local = threading.local()
+        self._rates_writes = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self._db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self._db_path, timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+            self._upgrade(conn)
+        return conn
+
+    def _upgrade(self, conn: sqlite3.Connection) -> None:
+        """Создаёт схему; wallets.balance REAL старой базы переводит в минимальные единицы."""
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= _SCHEMA_VERSION:
+            return
+        with self.transaction():
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= _SCHEMA_VERSION:
+                return
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(wallets)")}
+            legacy: list[sqlite3.Row] = []
+            if "balance" in columns:
+                legacy = conn.execute("SELECT user_id, currency_code, balance FROM wallets").fetchall()
+                conn.execute("DROP TABLE wallets")
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.executemany(
+                "INSERT INTO wallets (user_id, currency_code, balance_minor, scale) VALUES (?, ?, ?, ?)",
+                [
+                    _wallet_row(int(r["user_id"]), r["currency_code"], {"balance": r["balance"]})
+                    for r in legacy
+                ],
+            )
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """BEGIN IMMEDIATE ... COMMIT; вложенные вызовы идут в ту же транзакцию."""
+        conn = self._conn()
+        if self._local.depth > 0:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    def read_users(self) -> list[dict[str, Any]]:
+        rows = self._conn().execute("SELECT * FROM users ORDER BY user_id").fetchall()
+        return [dict(r) for r in rows]
+
+    def write_users(self, users: list[dict[str, Any]]) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM users")
+            conn.executemany(
+                "INSERT INTO users (user_id, username, hashed_password, salt, registration_date) "
+                "VALUES (:user_id, :username, :hashed_password, :salt, :registration_date)",
+                users,
+            )
+
+    def find_user(self, username: str) -> dict[str, Any] | None:
+        row = self._conn().execute(
+            "SELECT * FROM users WHERE username = ?",
+            (username,),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def add_user(
+        self,
+        username: str,
+        hashed_password: str,
+        salt: str,
+        registration_date: str,
+    ) -> int:
+        with self.transaction() as conn:
+            try:
+                cur = conn.execute(
+                    "INSERT INTO users (username, hashed_password, salt, registration_date) "
+                    "VALUES (?, ?, ?, ?)",
+                    (username, hashed_password, salt, registration_date),
+                )
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Имя пользователя '{username}' уже занято") from e
+            return int(cur.lastrowid)
+
+    def read_portfolios(self) -> list[dict[str, Any]]:
+        conn = self._conn()
+        portfolios: dict[int, dict[str, Any]] = {
+            int(r["user_id"]): {}
+            for r in conn.execute("SELECT user_id FROM portfolios ORDER BY user_id")
+        }
+        for r in conn.execute("SELECT user_id, currency_code, balance_minor, scale FROM wallets"):
+            portfolios.setdefault(int(r["user_id"]), {})[r["currency_code"]] = {"balance": _balance(r)}
+        return [{"user_id": uid, "wallets": w} for uid, w in portfolios.items()]
+
+    def write_portfolios(self, portfolios: list[dict[str, Any]]) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM wallets")
+            conn.execute("DELETE FROM portfolios")
+            for p in portfolios:
+                self._insert_portfolio(conn, int(p["user_id"]), p.get("wallets", {}))
+
+    def add_portfolio(self, user_id: int) -> None:
+        with self.transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO portfolios (user_id) VALUES (?)", (user_id,))
+
+    def portfolio_document(self, user_id: int) -> str | None:
+        """У SQLite нет версий документов: кешировать портфели поверх него нельзя."""
+        return None
+
+    def read_portfolio(self, user_id: int) -> dict[str, Any] | None:
+        conn = self._conn()
+        exists = conn.execute("SELECT 1 FROM portfolios WHERE user_id = ?", (user_id,)).fetchone()
+        if exists is None:
+            return None
+        rows = conn.execute(
+            "SELECT currency_code, balance_minor, scale FROM wallets WHERE user_id = ?",
+            (user_id,),
+        ).fetchall()
+        return {r["currency_code"]: {"balance": _balance(r)} for r in rows}
+
+    def write_portfolio(self, user_id: int, wallets: dict[str, Any]) -> None:
+        with self.transaction() as conn:
+            exists = conn.execute("SELECT 1 FROM portfolios WHERE user_id = ?", (user_id,)).fetchone()
+            if exists is None:
+                raise ValueError("Портфель не найден")
+            conn.execute("DELETE FROM wallets WHERE user_id = ?", (user_id,))
+            self._insert_portfolio(conn, user_id, wallets)
+
+    @staticmethod
+    def _insert_portfolio(conn: sqlite3.Connection, user_id: int, wallets: dict[str, Any]) -> None:
+        conn.execute("INSERT OR IGNORE INTO portfolios (user_id) VALUES (?)", (user_id,))
+        conn.executemany(
+            "INSERT INTO wallets (user_id, currency_code, balance_minor, scale) VALUES (?, ?, ?, ?)",
+            [_wallet_row(user_id, code, w) for code, w in wallets.items()],
+        )
+
+    def read_rates(self) -> dict[str, Any]:
+        conn = self._conn()
+        pairs = {
+            r["pair"]: {"rate": r["rate"], "updated_at": r["updated_at"], "source": r["source"]}
+            for r in conn.execute("SELECT pair, rate, updated_at, source FROM rates ORDER BY pair")
+        }
+        row = conn.execute("SELECT value FROM meta WHERE key = 'last_refresh'").fetchone()
+        return {"pairs": pairs, "last_refresh": row["value"] if row is not None else None}
+
+    def write_rates(self, rates: dict[str, Any]) -> None:
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM rates")
+            self._upsert_rates(conn, rates.get("pairs", {}), rates.get("last_refresh"))
+        self._rates_writes += 1
+
+    def merge_rates(self, pairs_update: dict[str, dict], refresh_ts: str) -> None:
+        """Сливает свежие пары в кеш: запись заменяется только более новой."""
+        with self.transaction() as conn:
+            self._upsert_rates(conn, pairs_update, refresh_ts)
+        self._rates_writes += 1
+
+    def touch_rates(self, pairs: list[str], updated_at: str) -> None:
+        """Продлевает свежесть пар, подтверждённых источником (304): меняется только updated_at."""
+        with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE rates SET updated_at = ? WHERE pair = ? AND updated_at < ?",
+                [(updated_at, pair, updated_at) for pair in pairs],
+            )
+            conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('last_refresh', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (updated_at,),
+            )
+        self._rates_writes += 1
+
+    def rates_stamp(self) -> Any:
+        """Метка версии: data_version меняется при коммитах других соединений, счётчик — при своих."""
+        version = self._conn().execute("PRAGMA data_version").fetchone()[0]
+        return version, self._rates_writes
+
+    @staticmethod
+    def _upsert_rates(conn: sqlite3.Connection, pairs: dict[str, dict], refresh_ts: str | None) -> None:
+        conn.executemany(
+            "INSERT INTO rates (pair, rate, updated_at, source) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(pair) DO UPDATE SET rate = excluded.rate, "
+            "updated_at = excluded.updated_at, source = excluded.source "
+            "WHERE excluded.updated_at > rates.updated_at",
+            [
+                (pair, float(data["rate"]), str(data["updated_at"]), data.get("source"))
+                for pair, data in pairs.items()
+                if isinstance(data, dict)
+            ],
+        )
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('last_refresh', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (refresh_ts,),
+        )
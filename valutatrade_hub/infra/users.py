@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any
+
+from valutatrade_hub.core.utils import append_json_item, file_stamp, load_json, save_json
+
+# Изменение users.json другим процессом проверяется (stat) не чаще раза в секунду;
+# add() проверяет всегда, чтобы не выдать занятое имя.
+_RELOAD_CHECK_SECONDS = 1.0
+
+
+class UserRepository:
+    """Пользователи с индексом username -> запись и сохраняемой последовательностью id.
+
+    Индекс перестраивается под блокировкой потоков: сервер API обращается
+    к репозиторию из нескольких потоков пула.
+    """
+
+    def __init__(self, users_path: str, seq_path: str) -> None:
+        self._users_path = users_path
+        self._seq_path = seq_path
+        self._by_name: dict[str, dict[str, Any]] | None = None
+        self._max_id = 0
+        self._stamp: tuple[int, int, int] | None = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self) -> tuple[list[dict[str, Any]], tuple[int, int, int] | None]:
+        """Пользователи и stamp того же открытого файла (без отдельного stat)."""
+        try:
+            f = open(self._users_path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return [], None
+        with f:
+            st = os.fstat(f.fileno())
+            raw = f.read().strip()
+        return (json.loads(raw) if raw else []), (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _index(self, fresh: bool = False) -> dict[str, dict[str, Any]]:
+        with self._lock:
+            now = time.monotonic()
+            if self._by_name is not None and not fresh and now - self._checked_at < _RELOAD_CHECK_SECONDS:
+                return self._by_name
+            if self._by_name is None or file_stamp(self._users_path) != self._stamp:
+                users, self._stamp = self._load()
+                self._by_name = {str(u["username"]): u for u in users}
+                self._max_id = max((int(u["user_id"]) for u in users), default=0)
+            self._checked_at = now
+            return self._by_name
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._by_name = None
+            self._stamp = None
+
+    def get(self, username: str) -> dict[str, Any] | None:
+        return self._index().get(username)
+
+    def exists(self, username: str) -> bool:
+        return username in self._index()
+
+    def _read_seq(self) -> int:
+        value = load_json(self._seq_path, 0)
+        return int(value) if isinstance(value, int) else 0
+
+    def add(
+        self,
+        username: str,
+        hashed_password: str,
+        salt: str,
+        registration_date: str,
+    ) -> int:
+        """Добавляет пользователя дозаписью в users.json, возвращает новый id."""
+        index = self._index(fresh=True)
+        if username in index:
+            raise ValueError(f"Имя пользователя '{username}' уже занято")
+
+        user_id = max(self._read_seq(), self._max_id) + 1
+        record = {
+            "user_id": user_id,
+            "username": username,
+            "hashed_password": hashed_password,
+            "salt": salt,
+            "registration_date": registration_date,
+        }
+
+        save_json(self._seq_path, user_id)
+        stamp = append_json_item(self._users_path, record)
+
+        with self._lock:
+            index[username] = record
+            self._max_id = user_id
+            self._stamp = stamp
+        return user_id
@@ -1,13 +1,49 @@
 from __future__ import annotations
 
+import atexit
+import copy
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from valutatrade_hub.infra.settings import SettingsLoader
 
 
+class _IsoFormatter(logging.Formatter):
+    """asctime в ISO UTC, как в остальных данных проекта."""
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str | None = None) -> str:
+        return datetime.fromtimestamp(record.created, timezone.utc).replace(microsecond=0).isoformat()
+
+
+class _InProcessQueueHandler(QueueHandler):
+    """Кладёт в очередь копию записи с готовым текстом: оформление и I/O — в потоке слушателя.
+
+    msg % args и текст исключения вычисляются сразу: аргументы и кадры
+    трассировки могут измениться, пока запись ждёт в очереди.
+    """
+
+    _exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener: QueueListener | None = None
+
+
 def setup_logging() -> None:
+    global _listener
+
     settings = SettingsLoader()
     log_path = str(settings.get("LOG_PATH", "logs/actions.log"))
     level_name = str(settings.get("LOG_LEVEL", "INFO")).upper()
@@ -23,9 +59,14 @@ def setup_logging() -> None:
     if logger.handlers:
         return
 
-    fmt = logging.Formatter("%(levelname)s %(asctime)s %(message)s")
+    fmt = _IsoFormatter("%(levelname)s %(asctime)s %(message)s")
 
     handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
     handler.setFormatter(fmt)
-    logger.addHandler(handler)
 
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    logger.addHandler(_InProcessQueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
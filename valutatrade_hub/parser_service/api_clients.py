@@ -1,94 +1,407 @@
 from __future__ import annotations
 
+import re
+import threading
 import time
 from abc import ABC, abstractmethod
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.core.currencies import CryptoCurrency, FiatCurrency, get_currency, list_supported_codes
+from valutatrade_hub.core.exceptions import ApiRequestError, CurrencyNotFoundError
+from valutatrade_hub.infra.settings import SettingsLoader
 from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.registry import read_registry
 from valutatrade_hub.parser_service.storage import utc_now_iso
 
+_CODE_RE = re.compile(r"[A-Z0-9]{2,5}")
+
+
+def _is_retryable_status(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def _is_code(code: str) -> bool:
+    return bool(_CODE_RE.fullmatch(code))
+
+
+def _registered_as(code: str) -> type | None:
+    try:
+        return type(get_currency(code))
+    except CurrencyNotFoundError:
+        return None
+
+
+def _is_fiat(code: str) -> bool:
+    return _registered_as(code) is FiatCurrency
+
+
+def _is_crypto(code: str) -> bool:
+    return _registered_as(code) is CryptoCurrency
+
+
+def _is_fiat_code(code: str, config: ParserConfig) -> bool:
+    """Код фиатной валюты: базовая, из FIAT_CURRENCIES или записанная в реестр как fiat."""
+    return code == config.BASE_CURRENCY or code in config.FIAT_CURRENCIES or _is_fiat(code)
+
 
 class BaseApiClient(ABC):
-    """Базовый клиент API."""
+    """Базовый клиент API: keep-alive сессия и условные запросы (ETag/Last-Modified).
+
+    fetch_rates принимает deadline (time.monotonic()): таймауты запросов не
+    выходят за него, а валидаторы, not_modified и confirmed вызова
+    фиксируются в клиенте только в конце и только до дедлайна — поток,
+    брошенный вызывающим, не меняет состояние, видимое следующему опросу.
+    confirmed — пары, которые источник подтвердил ответом 304: это пары
+    прошлого ответа на тот же запрос.
+    """
+
+    SOURCE_NAME = "API"
+    # тип валют источника: при совпадении пары у двух источников побеждает "fiat"
+    ASSET_TYPE = ""
 
     def __init__(self, config: ParserConfig) -> None:
         self.config = config
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._validators: dict[str, dict[str, str]] = {}
+        self._pairs_by_key: dict[str, list[str]] = {}
+        self._lock = threading.Lock()
+        self.not_modified = False
+        self.confirmed: list[str] = []
+        self._known: set[str] | None = None
+        self._discovered: dict[str, dict[str, Any]] = {}
 
     @abstractmethod
-    def fetch_rates(self) -> dict[str, dict[str, Any]]:
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, dict[str, Any]]:
         pass
 
-
-class CoinGeckoClient(BaseApiClient):
-    """Клиент CoinGecko."""
-
-    def fetch_rates(self) -> dict[str, dict[str, Any]]:
-        ids = [
-            self.config.CRYPTO_ID_MAP[c]
-            for c in self.config.CRYPTO_CURRENCIES
-        ]
-
-        params = {
-            "ids": ",".join(ids),
-            "vs_currencies": self.config.BASE_CURRENCY.lower(),
-        }
-
+    def pop_discovered(self) -> dict[str, dict[str, Any]]:
+        """Новые или обновлённые записи реестра валют с прошлого вызова."""
+        discovered, self._discovered = self._discovered, {}
+        return discovered
+
+    def _registry_entries(self) -> dict[str, dict[str, Any]]:
+        return read_registry(SettingsLoader().get("CURRENCIES_PATH"))
+
+    def _known_codes(self) -> set[str]:
+        if self._known is None:
+            self._known = set(list_supported_codes())
+        return self._known
+
+    def _discover(self, code: str, info: dict[str, Any], force: bool = False) -> None:
+        """Запоминает валюту для реестра; известные коды — только при force (свежие метаданные)."""
+        known = self._known_codes()
+        if force or code not in known:
+            known.add(code)
+            self._discovered[code] = {**self._discovered.get(code, {}), **info}
+
+    def _parallel(self, func: Callable[[Any], Any], items: list[Any], partial: bool = False) -> list[Any]:
+        """func по элементам в FETCH_PARALLELISM потоков, результаты в порядке items.
+
+        partial=True — упавшие элементы пропускаются, пока успешен хотя бы один;
+        иначе (и если упали все) пробрасывается первая ошибка.
+        """
+        if len(items) <= 1:
+            return [func(item) for item in items]
+
+        workers = max(1, min(self.config.FETCH_PARALLELISM, len(items)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rates-chunk") as executor:
+            futures = [executor.submit(func, item) for item in items]
+            results: list[Any] = []
+            errors: list[ApiRequestError] = []
+            for fut in futures:
+                try:
+                    results.append(fut.result())
+                except ApiRequestError as e:
+                    errors.append(e)
+
+        if errors and (not partial or not results):
+            raise errors[0]
+        return results
+
+    def close(self) -> None:
+        self.session.close()
+
+    def _timeout(self, deadline: float | None) -> float:
+        """Таймаут запроса: REQUEST_TIMEOUT, но не дальше дедлайна вызова."""
+        if deadline is None:
+            return self.config.REQUEST_TIMEOUT
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise ApiRequestError(f"{self.SOURCE_NAME}: дедлайн истёк до запроса", retryable=False)
+        return min(self.config.REQUEST_TIMEOUT, left)
+
+    def _conditional_get(
+        self,
+        url: str,
+        params: dict[str, str] | None = None,
+        deadline: float | None = None,
+    ) -> tuple[requests.Response | None, int, str]:
+        """GET с If-None-Match/If-Modified-Since; при 304 вместо ответа возвращает None."""
+        key = requests.Request("GET", url, params=params).prepare().url or url
+        headers: dict[str, str] = {}
+        cached = self._validators.get(key, {})
+        if "etag" in cached:
+            headers["If-None-Match"] = cached["etag"]
+        if "last_modified" in cached:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        timeout = self._timeout(deadline)
         start = time.perf_counter()
         try:
-            response = requests.get(
-                self.config.COINGECKO_URL,
+            response = self.session.get(
+                url,
                 params=params,
-                timeout=self.config.REQUEST_TIMEOUT,
+                headers=headers,
+                timeout=timeout,
             )
         except requests.exceptions.RequestException as e:
-            raise ApiRequestError(f"CoinGecko network error: {e}") from e
+            raise ApiRequestError(f"{self.SOURCE_NAME} network error: {e}") from e
 
         elapsed_ms = int((time.perf_counter() - start) * 1000)
 
-        if response.status_code != 200:
-            raise ApiRequestError(
-                f"CoinGecko API error: {response.status_code}"
-            )
+        if response.status_code == 304 and cached:
+            return None, elapsed_ms, key
+        return response, elapsed_ms, key
+
+    @staticmethod
+    def _validators_of(response: requests.Response) -> dict[str, str]:
+        validators: dict[str, str] = {}
+        if response.headers.get("ETag"):
+            validators["etag"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["last_modified"] = response.headers["Last-Modified"]
+        return validators
+
+    def _commit(
+        self,
+        validators: dict[str, dict[str, str]],
+        pairs: dict[str, list[str]],
+        unchanged: list[str],
+        deadline: float | None,
+    ) -> None:
+        """Фиксирует итог вызова.
+
+        validators и pairs — валидаторы и пары успешно разобранных ответов
+        по ключу запроса, unchanged — ключи запросов, получивших 304. Ответ
+        после дедлайна вызывающий уже не ждёт: его валидаторы не сохраняются
+        (иначе следующий опрос получил бы 304 на курсы, которых нет в кеше),
+        а вызов завершается ошибкой.
+        """
+        with self._lock:
+            if deadline is not None and time.monotonic() > deadline:
+                raise ApiRequestError(f"{self.SOURCE_NAME}: ответ после дедлайна отброшен", retryable=False)
+            for key, values in validators.items():
+                if values:
+                    self._validators[key] = values
+                    self._pairs_by_key[key] = pairs.get(key, [])
+                else:
+                    self._validators.pop(key, None)
+                    self._pairs_by_key.pop(key, None)
+            self.not_modified = bool(unchanged) and not validators
+            self.confirmed = [pair for key in unchanged for pair in self._pairs_by_key.get(key, [])]
 
-        data = response.json()
-        timestamp = utc_now_iso()
 
-        result: dict[str, dict[str, Any]] = {}
+class CoinGeckoClient(BaseApiClient):
+    """Клиент CoinGecko.
 
-        for code in self.config.CRYPTO_CURRENCIES:
-            raw_id = self.config.CRYPTO_ID_MAP[code]
-            if raw_id not in data:
-                continue
+    При INGEST_FULL_UNIVERSE набор монет — CRYPTO_CURRENCIES плюс топ
+    CRYPTO_UNIVERSE_SIZE по капитализации (/coins/markets, раз в
+    UNIVERSE_REFRESH_SECONDS). Цены запрашиваются через simple/price
+    порциями id, чтобы URL не превышал MAX_URL_LENGTH; порции — параллельно.
+    """
 
-            price = data[raw_id].get(self.config.BASE_CURRENCY.lower())
-            if not isinstance(price, (int, float)):
-                continue
+    SOURCE_NAME = "CoinGecko"
+    ASSET_TYPE = "crypto"
 
-            pair = f"{code}_{self.config.BASE_CURRENCY}"
-            result[pair] = {
-                "rate": float(price),
-                "updated_at": timestamp,
-                "source": "CoinGecko",
-                "meta": {
-                    "raw_id": raw_id,
-                    "request_ms": elapsed_ms,
-                    "status_code": response.status_code,
-                    "etag": response.headers.get("ETag"),
+    # после неудачного обновления списка монет повторить не раньше чем через
+    _UNIVERSE_RETRY_SECONDS = 300.0
+
+    def __init__(self, config: ParserConfig) -> None:
+        super().__init__(config)
+        self._universe: dict[str, str] = {}
+        self._universe_at: float | None = None
+
+    def _ids(self, deadline: float | None = None) -> dict[str, str]:
+        """{код: id CoinGecko} для текущего запроса."""
+        ids = {
+            code: self.config.CRYPTO_ID_MAP[code]
+            for code in self.config.CRYPTO_CURRENCIES
+            if code in self.config.CRYPTO_ID_MAP
+        }
+        if self.config.INGEST_FULL_UNIVERSE:
+            self._refresh_universe(deadline)
+            for code, raw_id in self._universe.items():
+                ids.setdefault(code, raw_id)
+        return ids
+
+    def _refresh_universe(self, deadline: float | None = None) -> None:
+        now = time.monotonic()
+        if self._universe_at is not None and now - self._universe_at < self.config.UNIVERSE_REFRESH_SECONDS:
+            return
+
+        if self._universe_at is None:
+            # до первого ответа /coins/markets — монеты, уже известные реестру
+            for code, info in self._registry_entries().items():
+                if info.get("type") == "crypto" and info.get("coingecko_id"):
+                    self._universe.setdefault(code, str(info["coingecko_id"]))
+        self._universe_at = now
+
+        try:
+            coins = self._fetch_markets(deadline)
+        except ApiRequestError:
+            self._universe_at = now - self.config.UNIVERSE_REFRESH_SECONDS + self._UNIVERSE_RETRY_SECONDS
+            return
+
+        universe: dict[str, str] = {}
+        for coin in coins:
+            code = str(coin.get("symbol") or "").upper()
+            raw_id = coin.get("id")
+            if code in universe or not isinstance(raw_id, str) or not _is_code(code):
+                continue
+            if _is_fiat_code(code, self.config):
+                continue  # тикер фиатной валюты: её курс даёт ExchangeRate-API
+            if self.config.CRYPTO_ID_MAP.get(code, raw_id) != raw_id:
+                continue  # для настроенных кодов id из CRYPTO_ID_MAP важнее совпадения тикера
+            universe[code] = raw_id
+            self._discover(
+                code,
+                {
+                    "type": "crypto",
+                    "name": coin.get("name"),
+                    "coingecko_id": raw_id,
+                    "market_cap": coin.get("market_cap"),
                 },
+                force=True,
+            )
+        if universe:
+            self._universe = universe
+
+    def _fetch_markets(self, deadline: float | None = None) -> list[dict[str, Any]]:
+        """Топ монет по капитализации; страницы запрашиваются параллельно."""
+        page_size = max(1, min(self.config.COINGECKO_PAGE_SIZE, self.config.CRYPTO_UNIVERSE_SIZE))
+        pages = -(-self.config.CRYPTO_UNIVERSE_SIZE // page_size)
+
+        def fetch_page(page: int) -> list[dict[str, Any]]:
+            params = {
+                "vs_currency": self.config.BASE_CURRENCY.lower(),
+                "order": "market_cap_desc",
+                "per_page": str(page_size),
+                "page": str(page),
             }
+            try:
+                response = self.session.get(
+                    self.config.COINGECKO_MARKETS_URL, params=params, timeout=self._timeout(deadline)
+                )
+            except requests.exceptions.RequestException as e:
+                raise ApiRequestError(f"CoinGecko network error: {e}") from e
+            if response.status_code != 200:
+                raise ApiRequestError(
+                    f"CoinGecko markets error: {response.status_code}",
+                    retryable=_is_retryable_status(response.status_code),
+                )
+            data = response.json()
+            return data if isinstance(data, list) else []
+
+        coins: list[dict[str, Any]] = []
+        for page in self._parallel(fetch_page, list(range(1, pages + 1))):
+            coins.extend(c for c in page if isinstance(c, dict))
+        return coins[: self.config.CRYPTO_UNIVERSE_SIZE]
+
+    def _chunks(self, ids: list[str], vs: str) -> list[list[str]]:
+        """Делит id на порции так, чтобы URL запроса не превышал MAX_URL_LENGTH."""
+        fixed = len(self.config.COINGECKO_URL) + len("?ids=&vs_currencies=") + len(vs)
+        limit = max(1, self.config.MAX_URL_LENGTH - fixed)
+        chunks: list[list[str]] = []
+        current: list[str] = []
+        size = 0
+        for raw_id in ids:
+            extra = len(raw_id) + (3 if current else 0)  # запятая кодируется как %2C
+            if current and size + extra > limit:
+                chunks.append(current)
+                current, size, extra = [], 0, len(raw_id)
+            current.append(raw_id)
+            size += extra
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, dict[str, Any]]:
+        # реестр мог узнать о фиатной валюте после обновления списка монет
+        code_by_id = {
+            raw_id: code for code, raw_id in self._ids(deadline).items() if not _is_fiat_code(code, self.config)
+        }
+        vs = self.config.BASE_CURRENCY.lower()
+        validators: dict[str, dict[str, str]] = {}
+        unchanged: list[str] = []
+
+        def fetch_chunk(chunk: list[str]) -> tuple[str, dict[str, Any], int, int, str | None] | None:
+            params = {"ids": ",".join(chunk), "vs_currencies": vs}
+            response, elapsed_ms, key = self._conditional_get(self.config.COINGECKO_URL, params, deadline)
+            if response is None:
+                unchanged.append(key)
+                return None
+            if response.status_code != 200:
+                raise ApiRequestError(
+                    f"CoinGecko API error: {response.status_code}",
+                    retryable=_is_retryable_status(response.status_code),
+                )
+            data = response.json()
+            validators[key] = self._validators_of(response)  # после успешного разбора ответа
+            return key, data, elapsed_ms, response.status_code, response.headers.get("ETag")
+
+        chunks = self._chunks(sorted(code_by_id), vs)
+        answers = self._parallel(fetch_chunk, chunks, partial=True)
+        timestamp = utc_now_iso()
 
+        result: dict[str, dict[str, Any]] = {}
+        pairs: dict[str, list[str]] = {}
+        for answer in answers:
+            if answer is None:
+                continue
+            key, data, elapsed_ms, status_code, etag = answer
+            if not isinstance(data, dict):
+                continue
+            for raw_id, prices in data.items():
+                code = code_by_id.get(raw_id)
+                price = prices.get(vs) if isinstance(prices, dict) else None
+                if code is None or isinstance(price, bool) or not isinstance(price, (int, float)):
+                    continue
+
+                self._discover(code, {"type": "crypto", "name": code, "coingecko_id": raw_id})
+                pair = f"{code}_{self.config.BASE_CURRENCY}"
+                pairs.setdefault(key, []).append(pair)
+                result[pair] = {
+                    "rate": float(price),
+                    "updated_at": timestamp,
+                    "source": "CoinGecko",
+                    "meta": {
+                        "raw_id": raw_id,
+                        "request_ms": elapsed_ms,
+                        "status_code": status_code,
+                        "etag": etag,
+                    },
+                }
+
+        self._commit(validators, pairs, unchanged, deadline)
         return result
 
 
 class ExchangeRateApiClient(BaseApiClient):
     """Клиент ExchangeRate-API."""
 
-    def fetch_rates(self) -> dict[str, dict[str, Any]]:
+    SOURCE_NAME = "ExchangeRate"
+    ASSET_TYPE = "fiat"
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, dict[str, Any]]:
         if not self.config.EXCHANGERATE_API_KEY:
-            raise ApiRequestError("ExchangeRate API key is missing")
+            raise ApiRequestError("ExchangeRate API key is missing", retryable=False)
 
         url = (
             f"{self.config.EXCHANGERATE_API_URL}/"
@@ -96,16 +409,10 @@ class ExchangeRateApiClient(BaseApiClient):
             f"latest/{self.config.BASE_CURRENCY}"
         )
 
-        start = time.perf_counter()
-        try:
-            response = requests.get(
-                url,
-                timeout=self.config.REQUEST_TIMEOUT,
-            )
-        except requests.exceptions.RequestException as e:
-            raise ApiRequestError(f"ExchangeRate network error: {e}") from e
-
-        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        response, elapsed_ms, key = self._conditional_get(url, deadline=deadline)
+        if response is None:
+            self._commit({}, {}, [key], deadline)
+            return {}
 
         if response.status_code != 200:
             err: dict[str, Any] = {}
@@ -122,7 +429,10 @@ class ExchangeRateApiClient(BaseApiClient):
                 or err.get("message")
                 or "unknown error"
             )
-            raise ApiRequestError(f"ExchangeRate API error {response.status_code}: {detail}")
+            raise ApiRequestError(
+                f"ExchangeRate API error {response.status_code}: {detail}",
+                retryable=_is_retryable_status(response.status_code),
+            )
 
         payload = response.json()
 
@@ -134,9 +444,14 @@ class ExchangeRateApiClient(BaseApiClient):
 
         result: dict[str, dict[str, Any]] = {}
 
-        for code in self.config.FIAT_CURRENCIES:
+        base = self.config.BASE_CURRENCY
+        codes = rates.keys() if self.config.INGEST_FULL_UNIVERSE else self.config.FIAT_CURRENCIES
+        codes = [code for code in codes if code != base and _is_code(code)]
+        self._discover_fiat(codes, deadline)
+
+        for code in codes:
             raw = rates.get(code)
-            if not isinstance(raw, (int, float)):
+            if isinstance(raw, bool) or not isinstance(raw, (int, float)):
                 continue
 
             raw_f = float(raw)
@@ -154,4 +469,30 @@ class ExchangeRateApiClient(BaseApiClient):
                     "base_code": payload.get("base_code", self.config.BASE_CURRENCY),
                 },
             }
+
+        self._commit({key: self._validators_of(response)}, {key: list(result)}, [], deadline)
         return result
+
+    def _discover_fiat(self, codes: list[str], deadline: float | None = None) -> None:
+        """Регистрирует новые коды; названия — из /codes, один запрос на появление новых кодов.
+
+        Код, который реестр знает как монету, перезаписывается как фиат: при
+        коллизии тикеров фиатная валюта побеждает.
+        """
+        collisions = {code for code in codes if _is_crypto(code)}
+        new = [code for code in codes if code in collisions or code not in self._known_codes()]
+        if not new:
+            return
+
+        names: dict[str, str] = {}
+        url = f"{self.config.EXCHANGERATE_API_URL}/{self.config.EXCHANGERATE_API_KEY}/codes"
+        try:
+            response = self.session.get(url, timeout=self._timeout(deadline))
+            if response.status_code == 200:
+                supported = response.json().get("supported_codes") or []
+                names = {str(item[0]): str(item[1]) for item in supported if isinstance(item, list) and len(item) == 2}
+        except (requests.exceptions.RequestException, ApiRequestError, ValueError, AttributeError):
+            pass
+
+        for code in new:
+            self._discover(code, {"type": "fiat", "name": names.get(code, code)}, force=code in collisions)
@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import sys
+from array import array
+from typing import Any, Iterator, TextIO
+
+from valutatrade_hub.core.utils import from_epoch, load_json, parse_time, save_json, to_epoch
+from valutatrade_hub.infra.locks import bump_version, file_lock
+from valutatrade_hub.parser_service.history import HistoryLog
+
+# колонка -> (файл, typecode array/memoryview); все колонки фиксированной ширины
+COLUMNS = {
+    "ts": ("ts.i64", "q"),
+    "rate": ("rate.f64", "d"),
+    "pair": ("pair.u32", "I"),
+    "source": ("source.u16", "H"),
+    "meta_end": ("meta_end.i64", "q"),
+}
+META_FILE = "meta.jsonl"
+INDEX_DIR = "index"
+FLUSH_ROWS = 10_000
+AS_OF_MODES = ("last", "nearest", "linear")
+
+
+def _empty_state() -> dict[str, Any]:
+    return {
+        "rows": 0,
+        "meta_bytes": 0,
+        "indexed_rows": 0,
+        "index_entries": {},
+        "position": [1, 0],
+        "byteorder": sys.byteorder,
+    }
+
+
+class HistoryColumns:
+    """Снимок колоночной истории, отображённый в память (mmap), без копирования.
+
+    ts/rate/pair/source — memoryview длиной rows: секунды unix (int64), курс
+    (float64), id пары и id источника в словарях pairs/sources. Те же файлы
+    читаются как numpy.memmap с dtype int64/float64/uint32/uint16.
+    Пока снимок открыт, новые строки в него не попадают.
+    """
+
+    def __init__(self, directory: str, state: dict[str, Any], dictionary: dict[str, list[str]]) -> None:
+        if state.get("byteorder", sys.byteorder) != sys.byteorder:
+            raise ValueError(f"Колонки {directory} записаны с порядком байт {state['byteorder']}")
+        self.rows = int(state["rows"])
+        self.pairs: list[str] = list(dictionary.get("pairs", []))
+        self.sources: list[str] = list(dictionary.get("sources", []))
+        self._pair_ids = {name: i for i, name in enumerate(self.pairs)}
+        self._source_ids = {name: i for i, name in enumerate(self.sources)}
+        self._dir = directory
+        self._maps: list[mmap.mmap] = []
+        self._views: list[memoryview] = []
+        self._index: dict[int, tuple[memoryview, memoryview, int]] = {}
+        self._index_entries: dict[str, int] = dict(state.get("index_entries", {}))
+
+        views = {
+            name: self._map(os.path.join(directory, fname), code, self.rows)
+            for name, (fname, code) in COLUMNS.items()
+        }
+        self.ts = views["ts"]
+        self.rate = views["rate"]
+        self.pair = views["pair"]
+        self.source = views["source"]
+        self._meta_end = views["meta_end"]
+        self._meta = self._map(os.path.join(directory, META_FILE), "B", int(state["meta_bytes"]))
+
+    def _map(self, path: str, code: str, count: int) -> memoryview:
+        size = count * array(code).itemsize
+        if size == 0 or not os.path.exists(path):
+            return memoryview(b"").cast(code)
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        view = memoryview(mapped).cast(code)
+        self._views.append(view)
+        return view
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        for mapped in self._maps:
+            mapped.close()
+        self._views.clear()
+        self._maps.clear()
+        self._index.clear()
+
+    def __enter__(self) -> HistoryColumns:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def pair_id(self, pair: str) -> int | None:
+        return self._pair_ids.get(pair)
+
+    def source_id(self, source: str) -> int | None:
+        return self._source_ids.get(source)
+
+    def scan(
+        self,
+        pair: str | None = None,
+        source: str | None = None,
+        since: int | None = None,
+        until: int | None = None,
+    ) -> Iterator[int]:
+        """Номера строк под фильтры: пара, источник, время в [since, until)."""
+        pid = self.pair_id(pair) if pair is not None else None
+        sid = self.source_id(source) if source is not None else None
+        if (pair is not None and pid is None) or (source is not None and sid is None):
+            return
+        lo = since if since is not None else -(1 << 63)
+        hi = until if until is not None else 1 << 63
+        ts, pairs, sources = self.ts, self.pair, self.source
+        for i in range(self.rows):
+            if (pid is None or pairs[i] == pid) and (sid is None or sources[i] == sid) and lo <= ts[i] < hi:
+                yield i
+
+    def _pair_index(self, pid: int) -> tuple[memoryview, memoryview, int]:
+        """(timestamps, rows, n) индекса пары: n — число записей, попавших в снимок."""
+        cached = self._index.get(pid)
+        if cached is None:
+            # читаются только зафиксированные в state.json записи: хвост файла
+            # от прерванной записи в снимок не попадает
+            entries = self._index_entries.get(str(pid), 0)
+            view = self._map(os.path.join(self._dir, INDEX_DIR, f"{pid}.i64"), "q", entries * 2)
+            times, rows = view[0::2], view[1::2]
+            self._views += [times, rows]
+            cached = (times, rows, len(times))
+            self._index[pid] = cached
+        return cached
+
+    def neighbors(self, pair: str, at: int) -> tuple[int | None, int | None]:
+        """Строки пары: последняя с ts <= at и первая с ts > at (None, если такой нет). O(log n)."""
+        pid = self.pair_id(pair)
+        if pid is None:
+            return None, None
+        times, rows, n = self._pair_index(pid)
+        i = bisect.bisect_right(times, at, 0, n)
+        return (rows[i - 1] if i > 0 else None), (rows[i] if i < n else None)
+
+    def rate_at(self, pair: str, at: int, mode: str = "last") -> dict[str, Any] | None:
+        """Курс пары на момент at (секунды unix) или None, если истории нет.
+
+        last — последний тик не позже at; nearest — ближайший по времени тик
+        (при равенстве — более ранний); linear — линейная интерполяция между
+        соседними тиками (после последнего тика — как last).
+        """
+        if mode not in AS_OF_MODES:
+            raise ValueError(f"Неизвестный режим '{mode}', есть: {', '.join(AS_OF_MODES)}")
+        before, after = self.neighbors(pair, at)
+
+        if mode == "nearest" and after is not None:
+            if before is None or self.ts[after] - at < at - self.ts[before]:
+                before = after
+        if before is None:
+            return None
+
+        result = {
+            "rate": self.rate[before],
+            "timestamp": from_epoch(self.ts[before]),
+            "source": self.sources[self.source[before]],
+        }
+        if mode == "linear" and after is not None and self.ts[before] != at:
+            t0, t1 = self.ts[before], self.ts[after]
+            r0, r1 = self.rate[before], self.rate[after]
+            result["rate"] = r0 + (r1 - r0) * (at - t0) / (t1 - t0)
+            result["timestamp"] = from_epoch(at)
+            result["between"] = [from_epoch(t0), from_epoch(t1)]
+        return result
+
+    def record(self, i: int) -> dict[str, Any]:
+        """Строка i в формате записи истории (exchange_rates.json)."""
+        pair = self.pairs[self.pair[i]]
+        from_code, _, to_code = pair.partition("_")
+        start = self._meta_end[i - 1] if i > 0 else 0
+        timestamp = from_epoch(self.ts[i])
+        return {
+            "id": f"{pair}_{timestamp}",
+            "from_currency": from_code,
+            "to_currency": to_code,
+            "rate": self.rate[i],
+            "timestamp": timestamp,
+            "source": self.sources[self.source[i]],
+            "meta": json.loads(bytes(self._meta[start:self._meta_end[i]])),
+        }
+
+
+class ColumnarHistory:
+    """Колоночная копия журнала истории курсов (HistoryLog) для сканов и выборок по времени.
+
+    Каждая колонка — отдельный файл массива фиксированной ширины, пара и
+    источник закодированы id из словаря dict.json, meta лежит в meta.jsonl
+    со смещениями концов в колонке meta_end. state.json фиксирует число
+    строк и позицию в журнале, до которой он перенесён: sync дописывает
+    только новые записи журнала, а хвост колонок после сбоя (длиннее rows)
+    отрезается при следующей записи. Так же обрезаются файлы индекса пар:
+    их зафиксированные длины хранятся в index_entries.
+    """
+
+    def __init__(self, directory: str, lock_timeout: float = 10.0) -> None:
+        self._dir = directory
+        self._lock_timeout = lock_timeout
+        self._state_path = os.path.join(directory, "state.json")
+        self._dict_path = os.path.join(directory, "dict.json")
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._dir, name)
+
+    def _load(self) -> tuple[dict[str, Any], dict[str, list[str]]]:
+        state = load_json(self._state_path, None)
+        if not isinstance(state, dict):
+            state = _empty_state()
+        dictionary = load_json(self._dict_path, None)
+        if not isinstance(dictionary, dict):
+            dictionary = {"pairs": [], "sources": []}
+        return state, dictionary
+
+    def open(self, history: HistoryLog | None = None) -> HistoryColumns:
+        """Снимок колонок; с history — сперва догоняет журнал, но только если state.json отстал от него.
+
+        Обычно колонки синхронизирует тот, кто дописал журнал, и чтение
+        ничего не пишет: проверка — stat последнего сегмента.
+        """
+        state, dictionary = self._load()
+        if history is not None and tuple(state["position"]) < history.end_position():
+            self.sync(history)
+            state, dictionary = self._load()
+        return HistoryColumns(self._dir, state, dictionary)
+
+    def sync(self, history: HistoryLog) -> int:
+        """Переносит в колонки записи журнала после сохранённой позиции; возвращает их число."""
+        os.makedirs(self._dir, exist_ok=True)
+        with file_lock(self._state_path, self._lock_timeout):
+            state, dictionary = self._load()
+            rebuild = "index_entries" not in state  # длины файлов индекса не зафиксированы: строится заново
+            if rebuild:
+                state["indexed_rows"] = 0
+            if rebuild or int(state.get("indexed_rows", 0)) < int(state["rows"]):
+                self._catch_up_index(state)
+                save_json(self._state_path, state)
+            segment, offset = state["position"]
+            added = 0
+            batch: list[dict[str, Any]] = []
+            position = None
+            for rec, position in history.read_from(int(segment), int(offset)):
+                batch.append(rec)
+                if len(batch) >= FLUSH_ROWS:
+                    added += self._append(state, dictionary, batch, position)
+                    batch = []
+            if position is not None and (batch or list(position) != state["position"]):
+                added += self._append(state, dictionary, batch, position)
+        return added
+
+    def _append(
+        self,
+        state: dict[str, Any],
+        dictionary: dict[str, list[str]],
+        records: list[dict[str, Any]],
+        position: tuple[int, int],
+    ) -> int:
+        pair_ids = {name: i for i, name in enumerate(dictionary["pairs"])}
+        source_ids = {name: i for i, name in enumerate(dictionary["sources"])}
+        columns = {name: array(code) for name, (_, code) in COLUMNS.items()}
+        meta_parts: list[bytes] = []
+        meta_bytes = int(state["meta_bytes"])
+        known = len(pair_ids) + len(source_ids)
+
+        for rec in records:
+            try:
+                ts = to_epoch(rec["timestamp"])
+                rate = float(rec["rate"])
+                pair = f"{rec['from_currency']}_{rec['to_currency']}"
+                source = str(rec.get("source", ""))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if pair not in pair_ids:
+                pair_ids[pair] = len(dictionary["pairs"])
+                dictionary["pairs"].append(pair)
+            if source not in source_ids:
+                source_ids[source] = len(dictionary["sources"])
+                dictionary["sources"].append(source)
+            meta = json.dumps(rec.get("meta", {}), ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+            meta_bytes += len(meta)
+            meta_parts.append(meta)
+            columns["ts"].append(ts)
+            columns["rate"].append(rate)
+            columns["pair"].append(pair_ids[pair])
+            columns["source"].append(source_ids[source])
+            columns["meta_end"].append(meta_bytes - 1)  # без перевода строки
+
+        rows = int(state["rows"])
+        if meta_parts:
+            # словарь только растёт, поэтому его можно сохранить раньше колонок
+            if len(pair_ids) + len(source_ids) != known:
+                save_json(self._dict_path, dictionary)
+            for name, (fname, code) in COLUMNS.items():
+                self._write_tail(self._path(fname), rows * array(code).itemsize, columns[name].tobytes())
+            self._write_tail(self._path(META_FILE), int(state["meta_bytes"]), b"".join(meta_parts))
+            self._append_index(state["index_entries"], rows, columns["ts"], columns["pair"])
+
+        state.update(
+            rows=rows + len(meta_parts),
+            indexed_rows=rows + len(meta_parts),
+            meta_bytes=meta_bytes,
+            position=list(position),
+        )
+        save_json(self._state_path, state)
+        bump_version(self._state_path)
+        return len(meta_parts)
+
+    def _append_index(self, committed: dict[str, int], first_row: int, ts: array, pairs: array) -> None:
+        """Дописывает (ts, номер строки) в индексы пар: у пары ts растёт вместе с номером строки.
+
+        Журнал пропускает тик, не новее последнего по паре, поэтому файл
+        индекса пары уже отсортирован по времени и ищется бисекцией.
+        committed — число записей каждой пары в state.json: файл сначала
+        обрезается до него (как колонки в _write_tail), затем в committed
+        записываются новые длины; они фиксируются вместе с state.json.
+        """
+        grouped: dict[int, array] = {}
+        for offset, (t, pid) in enumerate(zip(ts, pairs)):
+            entries = grouped.get(pid)
+            if entries is None:
+                entries = grouped[pid] = array("q")
+            entries.append(t)
+            entries.append(first_row + offset)
+
+        os.makedirs(self._path(INDEX_DIR), exist_ok=True)
+        for pid, entries in grouped.items():
+            count = committed.get(str(pid), 0)
+            self._write_tail(os.path.join(self._path(INDEX_DIR), f"{pid}.i64"), count * 16, entries.tobytes())
+            committed[str(pid)] = count + len(entries) // 2
+
+    def _catch_up_index(self, state: dict[str, Any]) -> None:
+        """Строит индекс для строк, записанных без него (колонки до появления индекса)."""
+        start, rows = int(state.get("indexed_rows", 0)), int(state["rows"])
+        if start == 0:
+            state["index_entries"] = {}
+            if os.path.isdir(self._path(INDEX_DIR)):
+                for name in os.listdir(self._path(INDEX_DIR)):
+                    os.remove(os.path.join(self._path(INDEX_DIR), name))
+        while start < rows:
+            count = min(FLUSH_ROWS, rows - start)
+            ts, pairs = array("q"), array("I")
+            for column, path in ((ts, "ts.i64"), (pairs, "pair.u32")):
+                with open(self._path(path), "rb") as f:
+                    f.seek(start * column.itemsize)
+                    column.fromfile(f, count)
+            self._append_index(state["index_entries"], start, ts, pairs)
+            start += count
+        state["indexed_rows"] = rows
+
+    @staticmethod
+    def _write_tail(path: str, committed: int, data: bytes) -> None:
+        with open(path, "ab") as f:
+            if f.tell() != committed:
+                f.truncate(committed)  # хвост незафиксированной записи
+                f.seek(committed)
+            f.write(data)
+
+
+def export_json(columns: HistoryColumns, out: TextIO, rows: Iterator[int] | None = None) -> int:
+    """Пишет строки колонок JSON-массивом в формате exchange_rates.json; возвращает их число."""
+    count = 0
+    out.write("[")
+    for i in rows if rows is not None else range(columns.rows):
+        out.write(",\n  " if count else "\n  ")
+        out.write(json.dumps(columns.record(i), ensure_ascii=False))
+        count += 1
+    out.write("\n]\n" if count else "]\n")
+    return count
+
+
+def main(argv: list[str] | None = None) -> None:
+    from valutatrade_hub.infra.settings import SettingsLoader
+
+    settings = SettingsLoader()
+    parser = argparse.ArgumentParser(description="Колоночная история курсов")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("sync", help="перенести новые записи журнала в колонки")
+    export = sub.add_parser("export", help="выгрузить колонки в JSON (формат exchange_rates.json)")
+    export.add_argument("--out", default="-", help="файл или - (stdout)")
+    export.add_argument("--pair")
+    export.add_argument("--source")
+    export.add_argument("--since", help="ISO или 90m/24h/7d")
+    export.add_argument("--until", help="ISO или 90m/24h/7d")
+    args = parser.parse_args(argv)
+
+    lock_timeout = float(settings.get("LOCK_TIMEOUT_SECONDS", 10.0))
+    store = ColumnarHistory(settings.get("HISTORY_COLUMNS_DIR"), lock_timeout)
+    if args.command == "sync":
+        history = HistoryLog(
+            settings.get("EXCHANGE_RATES_HISTORY_DIR"),
+            int(settings.get("HISTORY_SEGMENT_BYTES", 8_000_000)),
+            lock_timeout,
+        )
+        print(f"Перенесено записей: {store.sync(history)}")
+        return
+
+    with store.open() as columns:
+        rows = columns.scan(
+            args.pair.upper() if args.pair else None,
+            args.source,
+            parse_time(args.since) if args.since else None,
+            parse_time(args.until) if args.until else None,
+        )
+        if args.out == "-":
+            export_json(columns, sys.stdout, rows)
+        else:
+            with open(args.out, "w", encoding="utf-8") as f:
+                count = export_json(columns, f, rows)
+            print(f"Выгружено записей: {count} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@ class ParserConfig:
     EXCHANGERATE_API_KEY: str | None = os.getenv("EXCHANGERATE_API_KEY")
 
     COINGECKO_URL: str = "https://api.coingecko.com/api/v3/simple/price"
+    COINGECKO_MARKETS_URL: str = "https://api.coingecko.com/api/v3/coins/markets"
     EXCHANGERATE_API_URL: str = "https://v6.exchangerate-api.com/v6"
 
     BASE_CURRENCY: str = "USD"
@@ -26,7 +27,46 @@ class ParserConfig:
         }
     )
 
+    # True (по желанию) — все валюты ответа ExchangeRate-API и топ CRYPTO_UNIVERSE_SIZE монет
+    # CoinGecko (реестр валют пополняется в CURRENCIES_PATH); False — только списки выше.
+    # При совпадении тикеров фиатной валюты и монеты побеждает фиат.
+    INGEST_FULL_UNIVERSE: bool = False
+    CRYPTO_UNIVERSE_SIZE: int = 500
+    UNIVERSE_REFRESH_SECONDS: float = 86400.0
+    COINGECKO_PAGE_SIZE: int = 250
+    MAX_URL_LENGTH: int = 2000
+    FETCH_PARALLELISM: int = 4
+
     RATES_FILE_PATH: str = "data/rates.json"
     HISTORY_FILE_PATH: str = "data/exchange_rates.json"
 
+    # таймаут одного запроса; повторы укорачивают его до остатка CLIENT_DEADLINE_SECONDS
     REQUEST_TIMEOUT: int = 20
+    HTTP_POOL_SIZE: int = 4
+
+    CLIENT_DEADLINE_SECONDS: float = 25.0
+    REFRESH_DEADLINE_SECONDS: float = 30.0
+
+    RETRY_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY_SECONDS: float = 0.5
+    RETRY_MAX_DELAY_SECONDS: float = 4.0
+    BREAKER_FAILURE_THRESHOLD: int = 3
+    BREAKER_RESET_SECONDS: float = 120.0
+
+    # хеджирование: второй запрос к тому же источнику, если первый дольше
+    # HEDGE_PERCENTILE-перцентиля своих задержек (до HEDGE_MIN_SAMPLES замеров —
+    # дольше HEDGE_FALLBACK_DELAY_SECONDS)
+    HEDGE_REQUESTS: bool = False
+    HEDGE_PERCENTILE: float = 95.0
+    HEDGE_MIN_SAMPLES: int = 20
+    HEDGE_FALLBACK_DELAY_SECONDS: float = 2.0
+
+    SCHEDULE_INTERVALS: dict[str, float] = field(
+        default_factory=lambda: {
+            "coingecko": 60.0,
+            "exchangerate": 3600.0,
+        }
+    )
+    SCHEDULE_JITTER_SECONDS: float = 5.0
+    SCHEDULE_MAX_BACKOFF_SECONDS: float = 900.0
+    SCHEDULE_MISSED_POLICY: str = "run_once"
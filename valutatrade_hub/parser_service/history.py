@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from typing import Any, Iterable, Iterator
+
+from valutatrade_hub.core.utils import iter_json_array, iter_json_lines, load_json, parse_time, save_json, to_epoch
+from valutatrade_hub.infra.locks import bump_version, file_lock, read_version
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+_logger = logging.getLogger("valutatrade")
+
+
+def segment_name(number: int) -> str:
+    return f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
+
+
+def record_key(rec: Any) -> tuple[str, int]:
+    """Id записи истории: (пара FROM_TO, время в секундах UTC); ValueError — запись некорректна.
+
+    Время сравнивается как число: '...Z' и '...+00:00' — один и тот же тик.
+    """
+    try:
+        return f"{rec['from_currency']}_{rec['to_currency']}", to_epoch(rec["timestamp"])
+    except (KeyError, TypeError) as exc:
+        raise ValueError(f"некорректная запись истории: {exc!r}") from None
+
+
+def iter_history(
+    paths: Iterable[str],
+    pair: str | None = None,
+    source: str | None = None,
+    since: int | None = None,
+    until: int | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Записи истории из файлов по одной, с фильтрами: пара FROM_TO, источник, время в [since, until).
+
+    Файл .jsonl читается построчно, остальные — как JSON-массив (старый
+    exchange_rates.json) потоковым разбором. Память не зависит от размера
+    истории; генератор можно прервать в любой момент (break, islice) —
+    открытый файл закроется.
+    """
+    from_code, _, to_code = pair.upper().partition("_") if pair else ("", "", "")
+    for path in paths:
+        records = iter_json_lines(path) if path.endswith(SEGMENT_SUFFIX) else iter_json_array(path)
+        for rec in records:
+            if not isinstance(rec, dict):
+                continue
+            if pair and (rec.get("from_currency") != from_code or rec.get("to_currency") != to_code):
+                continue
+            if source and rec.get("source") != source:
+                continue
+            if since is not None or until is not None:
+                try:
+                    ts = to_epoch(rec["timestamp"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if (since is not None and ts < since) or (until is not None and ts >= until):
+                    continue
+            yield rec
+
+
+class HistoryLog:
+    """Журнал истории курсов: JSONL-сегменты только на дозапись + маленький индекс.
+
+    Индекс хранит номер текущего сегмента, его длину, последнее время (epoch)
+    по каждой паре и счётчики отброшенных записей. Запись считается
+    дубликатом, если её время не новее последнего сохранённого для этой пары
+    (id записи — record_key); записи без пары или времени — некорректные.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, lock_timeout: float = 10.0) -> None:
+        if segment_bytes <= 0:
+            raise ValueError("HISTORY_SEGMENT_BYTES должен быть > 0")
+        self._dir = directory
+        self._segment_bytes = segment_bytes
+        self._lock_timeout = lock_timeout
+        self._index_path = os.path.join(directory, "index.json")
+        self._index: dict[str, Any] | None = None
+        self._index_version = -1
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self._dir, segment_name(number))
+
+    def segment_paths(self) -> list[str]:
+        if not os.path.isdir(self._dir):
+            return []
+        names = sorted(
+            n for n in os.listdir(self._dir)
+            if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self._dir, n) for n in names]
+
+    def end_position(self) -> tuple[int, int]:
+        """(сегмент, размер) конца журнала по файлам, без чтения индекса; (0, 0) — журнал пуст."""
+        paths = self.segment_paths()
+        if not paths:
+            return 0, 0
+        name = os.path.basename(paths[-1])
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]), os.path.getsize(paths[-1])
+
+    def iter_records(self, **filters: Any) -> Iterator[dict[str, Any]]:
+        """Все записи журнала по порядку, потоково; фильтры — как у iter_history."""
+        return iter_history(self.segment_paths(), **filters)
+
+    def read_from(self, segment: int, offset: int) -> Iterator[tuple[dict[str, Any], tuple[int, int]]]:
+        """Записи журнала начиная с позиции (сегмент, смещение) и позиция после каждой.
+
+        Читаются только целые строки: недописанный хвост остаётся на следующий раз.
+        """
+        for path in self.segment_paths():
+            number = int(os.path.basename(path)[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            if number < segment:
+                continue
+            pos = offset if number == segment else 0
+            with open(path, "rb") as f:
+                f.seek(pos)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    pos += len(line)
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    yield rec, (number, pos)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._index_path)
+
+    def _load_index(self) -> dict[str, Any]:
+        version = read_version(self._index_path)
+        if version != self._index_version:
+            self._index = None
+            self._index_version = version
+        if self._index is None:
+            index = load_json(self._index_path, None)
+            if not isinstance(index, dict):
+                index = {"segment": 1, "offset": 0, "records": 0, "last_ts": {}}
+            index.setdefault("rejected", {"duplicate": 0, "invalid": 0})
+            self._index = index
+            self._upgrade_last_ts(index)
+            self._recover_tail(index)
+        return self._index
+
+    @staticmethod
+    def _upgrade_last_ts(index: dict[str, Any]) -> None:
+        """Индекс старого формата хранил last_ts строками ISO — переводим в epoch."""
+        last_ts = index["last_ts"]
+        for pair, value in list(last_ts.items()):
+            if isinstance(value, str):
+                last_ts[pair] = to_epoch(value)
+
+    def _recover_tail(self, index: dict[str, Any]) -> None:
+        """Учитывает строки, дописанные в сегмент после последнего сохранения индекса.
+
+        Обрезается только недописанная последняя строка (без перевода строки);
+        целая, но неразборчивая строка пропускается — как и при чтении журнала.
+        """
+        path = self._segment_path(int(index["segment"]))
+        if not os.path.exists(path) or os.path.getsize(path) <= int(index["offset"]):
+            return
+
+        last_ts: dict[str, int] = index["last_ts"]
+        with open(path, "rb") as f:
+            f.seek(int(index["offset"]))
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                index["offset"] = int(index["offset"]) + len(line)
+                try:
+                    pair, ts = record_key(json.loads(line))
+                except ValueError:
+                    _logger.warning("Журнал истории %s: пропущена повреждённая строка", path)
+                    continue
+                last_ts[pair] = max(ts, last_ts.get(pair, ts))
+                index["records"] = int(index["records"]) + 1
+
+        if os.path.getsize(path) > int(index["offset"]):
+            with open(path, "r+b") as f:
+                f.truncate(int(index["offset"]))
+        save_json(self._index_path, index)
+
+    def append(self, records: list[dict[str, Any]]) -> int:
+        """Дописывает новые записи, возвращает их количество. Стоимость O(len(records)).
+
+        Запись идёт под блокировкой индекса; если индекс успел поменять другой
+        процесс (версия выросла), он перечитывается перед дозаписью.
+        Дубликаты и некорректные записи не пишутся, а учитываются в
+        index.json (rejected) и в логе.
+        """
+        os.makedirs(self._dir, exist_ok=True)
+        with file_lock(self._index_path, self._lock_timeout):
+            added = self._append_locked(records)
+            if added:
+                self._index_version = bump_version(self._index_path)
+        return added
+
+    def _append_locked(self, records: list[dict[str, Any]]) -> int:
+        index = self._load_index()
+        last_ts: dict[str, int] = index["last_ts"]
+
+        keyed: list[tuple[int, str, dict[str, Any]]] = []
+        invalid = 0
+        for rec in records:
+            try:
+                pair, ts = record_key(rec)
+            except ValueError:
+                invalid += 1
+                continue
+            keyed.append((ts, pair, rec))
+        keyed.sort(key=lambda item: item[0])
+
+        lines: list[bytes] = []
+        duplicate = 0
+        for ts, pair, rec in keyed:
+            if ts <= last_ts.get(pair, -1):
+                duplicate += 1
+                continue
+            last_ts[pair] = ts
+            line = json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n"
+            lines.append(line.encode("utf-8"))
+
+        if invalid:
+            _logger.warning("Журнал истории: отброшено некорректных записей: %d", invalid)
+        if duplicate:
+            _logger.debug("Журнал истории: пропущено дубликатов: %d", duplicate)
+        rejected = index["rejected"]
+        rejected["duplicate"] = int(rejected.get("duplicate", 0)) + duplicate
+        rejected["invalid"] = int(rejected.get("invalid", 0)) + invalid
+
+        if not lines:
+            return 0  # счётчики сохранятся вместе со следующей дозаписью
+
+        if int(index["offset"]) >= self._segment_bytes:
+            index["segment"] = int(index["segment"]) + 1
+            index["offset"] = 0
+
+        data = b"".join(lines)
+        try:
+            with open(self._segment_path(int(index["segment"])), "ab") as f:
+                f.write(data)
+        except OSError:
+            self._index = None
+            raise
+
+        index["offset"] = int(index["offset"]) + len(data)
+        index["records"] = int(index["records"]) + len(lines)
+        save_json(self._index_path, index)
+        return len(lines)
+
+
+_REQUIRED_FIELDS = ("from_currency", "to_currency", "rate", "timestamp", "source")
+
+
+def validate_history(records: Iterable[dict[str, Any]]) -> dict[str, Any]:
+    """Проверка потока записей: обязательные поля, курс > 0, время пары не убывает.
+
+    Помнит только последний timestamp каждой пары, поэтому память не зависит
+    от длины истории.
+    """
+    last_ts: dict[str, int] = {}
+    report: dict[str, Any] = {"records": 0, "invalid": 0, "out_of_order": 0, "examples": []}
+
+    def note(problem: str) -> None:
+        if len(report["examples"]) < 10:
+            report["examples"].append(f"#{report['records']}: {problem}")
+
+    for rec in records:
+        report["records"] += 1
+        missing = [name for name in _REQUIRED_FIELDS if name not in rec]
+        try:
+            ts = to_epoch(rec["timestamp"]) if not missing else None
+            rate = float(rec["rate"]) if not missing else 0.0
+        except (TypeError, ValueError):
+            ts, rate = None, 0.0
+        if ts is None or not rate > 0:
+            report["invalid"] += 1
+            note(f"нет полей {', '.join(missing)}" if missing else "некорректный timestamp или rate")
+            continue
+
+        pair = f"{rec['from_currency']}_{rec['to_currency']}"
+        previous = last_ts.get(pair)
+        if previous is not None and ts < previous:
+            report["out_of_order"] += 1
+            note(f"{pair}: время меньше предыдущего")
+        else:
+            last_ts[pair] = ts
+    report["pairs"] = len(last_ts)
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    import argparse
+    import sys
+    from itertools import islice
+
+    from valutatrade_hub.infra.settings import SettingsLoader
+
+    settings = SettingsLoader()
+    parser = argparse.ArgumentParser(description="Потоковое чтение истории курсов")
+    parser.add_argument("command", choices=("export", "validate"))
+    parser.add_argument("--path", nargs="*", help="файлы истории (.jsonl или JSON-массив); по умолчанию — журнал")
+    parser.add_argument("--pair")
+    parser.add_argument("--source")
+    parser.add_argument("--since", help="ISO или 90m/24h/7d")
+    parser.add_argument("--until", help="ISO или 90m/24h/7d")
+    parser.add_argument("--limit", type=int, help="остановиться после N записей")
+    parser.add_argument("--out", default="-", help="export: файл JSONL или - (stdout)")
+    args = parser.parse_args(argv)
+
+    paths = args.path
+    if not paths:
+        log = HistoryLog(
+            settings.get("EXCHANGE_RATES_HISTORY_DIR"),
+            int(settings.get("HISTORY_SEGMENT_BYTES", 8_000_000)),
+        )
+        paths = log.segment_paths() if log.exists() else [settings.get("EXCHANGE_RATES_HISTORY_PATH")]
+    records: Iterator[dict[str, Any]] = iter_history(
+        paths,
+        pair=args.pair,
+        source=args.source,
+        since=parse_time(args.since) if args.since else None,
+        until=parse_time(args.until) if args.until else None,
+    )
+    if args.limit is not None:
+        records = islice(records, args.limit)
+
+    if args.command == "validate":
+        report = validate_history(records)
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        raise SystemExit(1 if report["invalid"] or report["out_of_order"] else 0)
+
+    out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    try:
+        for rec in records:
+            out.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from valutatrade_hub.core.utils import load_json, now_iso, save_json
+from valutatrade_hub.infra.locks import bump_version, file_lock
+
+
+def read_registry(path: str) -> dict[str, dict[str, Any]]:
+    """Валюты из файла реестра: {"CODE": {"type", "name", ...}}."""
+    data = load_json(path, {})
+    currencies = data.get("currencies") if isinstance(data, dict) else None
+    return currencies if isinstance(currencies, dict) else {}
+
+
+def merge_registry(path: str, entries: dict[str, dict[str, Any]], lock_timeout: float = 10.0) -> int:
+    """Добавляет/обновляет валюты реестра; файл переписывается, только если что-то изменилось.
+
+    Поля существующей записи дополняются новыми значениями, а не заменяются
+    целиком (имя из одного источника не стирается данными другого).
+    Коллизия тикеров решается в пользу фиата: запись "fiat" не становится
+    "crypto", а монета с кодом фиатной валюты в реестр не попадает.
+    Возвращает число изменённых записей.
+    """
+    if not entries:
+        return 0
+
+    with file_lock(path, lock_timeout):
+        data = load_json(path, {})
+        if not isinstance(data, dict):
+            data = {}
+        currencies = data.get("currencies")
+        if not isinstance(currencies, dict):
+            currencies = {}
+
+        changed = 0
+        for code, info in entries.items():
+            current = currencies.get(code, {})
+            if current.get("type") == "fiat" and info.get("type") == "crypto":
+                logging.getLogger("valutatrade").info(
+                    "Реестр валют: %s — фиатная валюта, монета %s с тем же тикером пропущена",
+                    code, info.get("coingecko_id") or info.get("name"),
+                )
+                continue
+            if current.get("type") == "crypto" and info.get("type") == "fiat":
+                current = {}  # поля монеты (coingecko_id и т.п.) фиату не нужны
+            merged = {**current, **{k: v for k, v in info.items() if v is not None}}
+            if merged != current:
+                currencies[code] = merged
+                changed += 1
+
+        if changed:
+            save_json(path, {"updated_at": now_iso(), "currencies": dict(sorted(currencies.items()))})
+            bump_version(path)
+    return changed
@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.parser_service.config import ParserConfig
+
+
+def client_name(client: Any) -> str:
+    """Имя источника для фильтра --source и сообщений (обёртки отдают имя внутреннего клиента)."""
+    return getattr(client, "name", None) or client.__class__.__name__
+
+
+@dataclass
+class RetryPolicy:
+    """Ограниченные повторы с экспоненциальной задержкой и общим бюджетом времени."""
+
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 4.0
+    budget: float = 20.0
+
+    def delay(self, attempt: int, rng: random.Random) -> float:
+        return rng.uniform(0, min(self.base_delay * (2 ** attempt), self.max_delay))
+
+
+class CircuitBreaker:
+    """Размыкатель: после N подряд неудач источник не опрашивается reset_timeout секунд.
+
+    По истечении таймаута пропускается одна пробная попытка (half-open):
+    успех замыкает цепь, неудача снова размыкает её.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 120.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResilientClient:
+    """Обёртка над BaseApiClient: повторы, размыкатель и статистика задержек."""
+
+    def __init__(
+        self,
+        client: Any,
+        retry: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        latency_window: int = 100,
+        rng: random.Random | None = None,
+    ) -> None:
+        self.client = client
+        self.name = client_name(client)
+        self.retry = retry or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self._latencies: deque[float] = deque(maxlen=latency_window)
+        self._rng = rng or random.Random()
+        self._last_error = ""
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self.client, item)
+
+    def latency_percentile(self, percentile: float) -> float | None:
+        samples = sorted(self._latencies)
+        if not samples:
+            return None
+        k = min(len(samples) - 1, max(0, int(round(percentile / 100 * (len(samples) - 1)))))
+        return samples[k]
+
+    def sample_count(self) -> int:
+        return len(self._latencies)
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, dict[str, Any]]:
+        """deadline (time.monotonic()) — передаётся клиенту, повтор после него не начинается.
+
+        Бюджет повторов тоже становится дедлайном попыток: таймаут запроса
+        укорачивается до остатка бюджета, так что повторы вместе с
+        ожиданием ответа не выходят за budget.
+        """
+        if not self.breaker.allow():
+            raise ApiRequestError(
+                f"{self.name}: источник временно отключён после ошибок ({self._last_error}), "
+                f"повтор через {self.breaker.retry_in():.0f} с",
+                retryable=False,
+            )
+
+        attempts = 1 if self.breaker.state == CircuitBreaker.HALF_OPEN else self.retry.attempts
+        start = time.monotonic()
+        ends = start + self.retry.budget if deadline is None else min(deadline, start + self.retry.budget)
+        attempt = 0
+        while True:
+            t0 = time.monotonic()
+            try:
+                result = self.client.fetch_rates(ends)
+            except ApiRequestError as e:
+                attempt += 1
+                delay = self.retry.delay(attempt - 1, self._rng)
+                if not e.retryable or attempt >= attempts or time.monotonic() + delay >= ends:
+                    self._last_error = str(e.args[0]).removeprefix("Ошибка при обращении к внешнему API: ")
+                    self.breaker.record_failure()
+                    raise
+                time.sleep(delay)
+                continue
+
+            self._latencies.append(time.monotonic() - t0)
+            self.breaker.record_success()
+            return result
+
+
+class HedgedClient:
+    """Хеджированный запрос: если основной источник отвечает дольше своего
+    перцентиля задержки (или упал), параллельно запускается запасной;
+    возвращается первый успешный ответ.
+
+    Запасной клиент — второй экземпляр того же источника со своей сессией
+    (build_updater при HEDGE_REQUESTS). Потоки создаются на вызов: проигравший
+    запрос дорабатывает до своего дедлайна, но его ответ не используется.
+    """
+
+    def __init__(
+        self,
+        primary: ResilientClient,
+        secondary: Any,
+        percentile: float = 95.0,
+        min_samples: int = 20,
+        fallback_delay: float = 2.0,
+    ) -> None:
+        self.primary = primary
+        self.secondary = secondary
+        self.name = primary.name
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.fallback_delay = fallback_delay
+        self.not_modified = False
+        self.confirmed: list[str] = []
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self.primary, item)
+
+    def pop_discovered(self) -> dict[str, dict[str, Any]]:
+        discovered: dict[str, dict[str, Any]] = {}
+        for client in (self.secondary, self.primary):
+            pop = getattr(client, "pop_discovered", None)
+            if callable(pop):
+                discovered.update(pop())
+        return discovered
+
+    def hedge_delay(self) -> float:
+        if self.primary.sample_count() < self.min_samples:
+            return self.fallback_delay
+        value = self.primary.latency_percentile(self.percentile)
+        return self.fallback_delay if value is None else value
+
+    def fetch_rates(self, deadline: float | None = None) -> dict[str, dict[str, Any]]:
+        def left() -> float | None:
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rates-hedge")
+        try:
+            first: Future = executor.submit(self.primary.fetch_rates, deadline)
+            owners: dict[Future, Any] = {first: self.primary}
+            limit = left()
+            wait([first], timeout=self.hedge_delay() if limit is None else min(self.hedge_delay(), limit))
+
+            if not (first.done() and first.exception() is None) and left() != 0.0:
+                owners[executor.submit(self.secondary.fetch_rates, deadline)] = self.secondary
+
+            pending = set(owners)
+            last_error: ApiRequestError | None = None
+            while pending:
+                done, pending = wait(pending, timeout=left(), return_when=FIRST_COMPLETED)
+                if not done:
+                    raise ApiRequestError(f"{self.name}: нет ответа ни от одного запроса до дедлайна")
+                for fut in done:
+                    try:
+                        result = fut.result()
+                    except ApiRequestError as e:
+                        last_error = e
+                        continue
+                    self.not_modified = bool(getattr(owners[fut], "not_modified", False))
+                    self.confirmed = list(getattr(owners[fut], "confirmed", []))
+                    return result
+        finally:
+            executor.shutdown(wait=False)
+
+        assert last_error is not None
+        raise last_error
+
+
+def wrap_hedged(primary: Any, secondary: Any, config: ParserConfig) -> HedgedClient:
+    """Основной и запасной клиенты одного источника, каждый — с повторами и размыкателем."""
+    return HedgedClient(
+        wrap_resilient(primary, config),
+        wrap_resilient(secondary, config),
+        percentile=config.HEDGE_PERCENTILE,
+        min_samples=config.HEDGE_MIN_SAMPLES,
+        fallback_delay=config.HEDGE_FALLBACK_DELAY_SECONDS,
+    )
+
+
+def wrap_resilient(client: Any, config: ParserConfig) -> ResilientClient:
+    return ResilientClient(
+        client,
+        retry=RetryPolicy(
+            attempts=config.RETRY_ATTEMPTS,
+            base_delay=config.RETRY_BASE_DELAY_SECONDS,
+            max_delay=config.RETRY_MAX_DELAY_SECONDS,
+            budget=config.CLIENT_DEADLINE_SECONDS,
+        ),
+        breaker=CircuitBreaker(
+            failure_threshold=config.BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=config.BREAKER_RESET_SECONDS,
+        ),
+    )
@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import json
+import os
+from collections import deque
+from typing import Any, BinaryIO, Iterable
+
+from valutatrade_hub.core.utils import from_epoch, load_json, save_json, to_epoch
+from valutatrade_hub.infra.locks import bump_version, file_lock
+
+INTERVAL_SECONDS = {"1m": 60, "1h": 3600, "1d": 86400}
+
+
+def _bar_start(line: bytes) -> float:
+    """Начало бара из строки файла; битая (недописанная) строка считается бесконечно поздней."""
+    if not line.endswith(b"\n"):
+        return float("inf")
+    try:
+        return int(json.loads(line)["t"])
+    except (ValueError, KeyError, TypeError):
+        return float("inf")
+
+
+def _offset_since(f: BinaryIO, size: int, since: int) -> int:
+    """Смещение первой строки с началом бара >= since (бинарный поиск по байтам файла)."""
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        f.seek(mid)
+        if mid > lo:
+            f.readline()  # середина строки: переходим к началу следующей
+        pos = f.tell()
+        if pos >= hi:
+            break  # между lo и hi одна строка — досматриваем линейно
+        line = f.readline()
+        if _bar_start(line) < since:
+            lo = f.tell()
+        else:
+            hi = pos
+
+    f.seek(lo)
+    pos = lo
+    while pos < hi:
+        line = f.readline()
+        if not line or _bar_start(line) >= since:
+            return pos
+        pos += len(line)
+    return hi
+
+
+def _ticks(records: Iterable[dict[str, Any]]) -> list[tuple[int, str, float]]:
+    """(время, пара, курс) корректных записей истории, по времени."""
+    ticks: list[tuple[int, str, float]] = []
+    for rec in records:
+        try:
+            pair = f"{rec['from_currency']}_{rec['to_currency']}"
+            ticks.append((to_epoch(rec["timestamp"]), pair, float(rec["rate"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    ticks.sort()
+    return ticks
+
+
+def _roll(
+    state: dict[str, Any], ticks: list[tuple[int, str, float]], intervals: dict[str, int]
+) -> tuple[dict[tuple[str, str], list[dict[str, Any]]], bool]:
+    """Учитывает тики в открытых барах state; возвращает закрытые бары и признак изменений."""
+    closed: dict[tuple[str, str], list[dict[str, Any]]] = {}
+    changed = False
+    for ts, pair, rate in ticks:
+        for name, seconds in intervals.items():
+            bars = state.setdefault(name, {})
+            bar = bars.get(pair)
+            if bar is not None and ts <= bar["last"]:
+                continue
+            start = ts - ts % seconds
+            if bar is None or start > bar["t"]:
+                if bar is not None:
+                    closed.setdefault((name, pair), []).append(bar)
+                bars[pair] = {"t": start, "o": rate, "h": rate, "l": rate, "c": rate, "n": 1, "last": ts}
+            else:
+                bar["h"] = max(bar["h"], rate)
+                bar["l"] = min(bar["l"], rate)
+                bar["c"] = rate
+                bar["n"] += 1
+                bar["last"] = ts
+            changed = True
+    return closed, changed
+
+
+def bars_from_records(
+    records: Iterable[dict[str, Any]],
+    pair: str,
+    interval: str,
+    since: int | None = None,
+    until: int | None = None,
+    limit: int | None = None,
+) -> list[dict[str, Any]]:
+    """Бары пары, посчитанные в памяти по записям истории, без записи на диск.
+
+    Тот же результат, что RollupStore.bars, для случая, когда баров на диске
+    ещё нет; читает все переданные записи, поэтому им стоит быть одной пары.
+    """
+    if interval not in INTERVAL_SECONDS:
+        raise ValueError(f"Неизвестный интервал '{interval}', есть: {', '.join(INTERVAL_SECONDS)}")
+    state: dict[str, Any] = {}
+    ticks = [tick for tick in _ticks(records) if tick[1] == pair]
+    closed, _ = _roll(state, ticks, {interval: INTERVAL_SECONDS[interval]})
+
+    result: deque[dict[str, Any]] = deque(maxlen=limit)
+    done = [(bar, True) for bar in closed.get((interval, pair), [])]
+    current = state.get(interval, {}).get(pair)
+    for bar, is_closed in done + ([(current, False)] if current is not None else []):
+        if (since is None or bar["t"] >= since) and (until is None or bar["t"] < until):
+            result.append(_public(bar, interval, is_closed))
+    return list(result)
+
+
+def _public(bar: dict[str, Any], interval: str, closed: bool) -> dict[str, Any]:
+    return {
+        "start": from_epoch(int(bar["t"])),
+        "interval": interval,
+        "open": bar["o"],
+        "high": bar["h"],
+        "low": bar["l"],
+        "close": bar["c"],
+        "count": bar["n"],
+        "closed": closed,
+    }
+
+
+class RollupStore:
+    """OHLC-бары курсов (open/high/low/close/count) по парам на нескольких интервалах.
+
+    Бары обновляются инкрементально при каждой дозаписи истории: открытый
+    (текущий) бар каждой пары хранится в open.json, закрытые дописываются
+    в <interval>/<PAIR>.jsonl в порядке времени. Тик не новее последнего
+    учтённого тика пары игнорируется (повтор или опоздание). Запрос за
+    период ищет начало двоичным поиском по файлу, поэтому читает только
+    бары периода, а не всю историю тиков.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        intervals: Iterable[str] = tuple(INTERVAL_SECONDS),
+        lock_timeout: float = 10.0,
+    ) -> None:
+        self._dir = directory
+        self._intervals: dict[str, int] = {}
+        for name in intervals:
+            if name not in INTERVAL_SECONDS:
+                raise ValueError(f"Неизвестный интервал '{name}', есть: {', '.join(INTERVAL_SECONDS)}")
+            self._intervals[name] = INTERVAL_SECONDS[name]
+        self._lock_timeout = lock_timeout
+        self._state_path = os.path.join(directory, "open.json")
+
+    @property
+    def intervals(self) -> tuple[str, ...]:
+        return tuple(self._intervals)
+
+    def exists(self) -> bool:
+        return os.path.exists(self._state_path)
+
+    def _bars_path(self, interval: str, pair: str) -> str:
+        return os.path.join(self._dir, interval, f"{pair}.jsonl")
+
+    def update(self, records: list[dict[str, Any]]) -> int:
+        """Учитывает тики истории в барах; возвращает число закрытых баров."""
+        ticks = _ticks(records)
+        if not ticks:
+            return 0
+
+        os.makedirs(self._dir, exist_ok=True)
+        with file_lock(self._state_path, self._lock_timeout):
+            state = load_json(self._state_path, {})
+            if not isinstance(state, dict):
+                state = {}
+
+            closed, changed = _roll(state, ticks, self._intervals)
+
+            # сначала закрытые бары, потом состояние: после сбоя между ними бар
+            # закроется повторно, а читатель пропустит дубль (начало не растёт)
+            for (name, pair), done in closed.items():
+                os.makedirs(os.path.join(self._dir, name), exist_ok=True)
+                lines = [
+                    json.dumps({k: v for k, v in bar.items() if k != "last"}, separators=(",", ":")) + "\n"
+                    for bar in done
+                ]
+                with open(self._bars_path(name, pair), "ab") as f:
+                    f.write("".join(lines).encode("utf-8"))
+
+            if changed:
+                save_json(self._state_path, state)
+                bump_version(self._state_path)
+        return sum(len(done) for done in closed.values())
+
+    def bars(
+        self,
+        pair: str,
+        interval: str,
+        since: int | None = None,
+        until: int | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Бары пары, начавшиеся в [since, until) (секунды unix), по времени; limit — последние N."""
+        if interval not in self._intervals:
+            raise ValueError(f"Интервал '{interval}' не ведётся, есть: {', '.join(self._intervals)}")
+
+        result: deque[dict[str, Any]] = deque(maxlen=limit)
+        last_start = None
+        path = self._bars_path(interval, pair)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(_offset_since(f, f.tell(), since) if since is not None else 0)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # недописанная последняя строка
+                    bar = json.loads(line)
+                    start = bar["t"]
+                    if last_start is not None and start <= last_start:
+                        continue
+                    if until is not None and start >= until:
+                        break
+                    result.append(_public(bar, interval, True))
+                    last_start = start
+
+        state = load_json(self._state_path, {})
+        bar = state.get(interval, {}).get(pair) if isinstance(state, dict) else None
+        if bar is not None and (last_start is None or bar["t"] > last_start):
+            if (since is None or bar["t"] >= since) and (until is None or bar["t"] < until):
+                result.append(_public(bar, interval, False))
+        return list(result)
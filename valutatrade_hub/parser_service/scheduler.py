@@ -1,12 +1,269 @@
 from __future__ import annotations
 
+import argparse
+import heapq
+import logging
+import random
+import signal
+import threading
 import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable
 
+from valutatrade_hub.core.utils import save_json
+from valutatrade_hub.infra.metrics import MetricsRegistry
+from valutatrade_hub.parser_service.storage import utc_now_iso
 from valutatrade_hub.parser_service.updater import RatesUpdater
 
+MISSED_POLICIES = ("skip", "run_once", "catch_up")
+
+
+@dataclass
+class SourceSchedule:
+    """Расписание одного источника.
+
+    missed_policy: что делать, если пропущено одно или несколько окон
+    (например, после долгого обновления или сна машины):
+    skip — дождаться следующего окна сетки, run_once — выполнить один раз
+    сразу и вернуться на сетку, catch_up — отработать все пропущенные окна подряд.
+    """
+
+    source: str | None
+    interval: float
+    jitter: float = 0.0
+    max_backoff: float = 900.0
+    missed_policy: str = "run_once"
+
+    def __post_init__(self) -> None:
+        if self.interval <= 0:
+            raise ValueError("interval должен быть > 0")
+        if self.missed_policy not in MISSED_POLICIES:
+            raise ValueError(f"missed_policy должен быть одним из: {', '.join(MISSED_POLICIES)}")
+
+    @property
+    def name(self) -> str:
+        return self.source or "all"
+
+
+@dataclass
+class SourceStats:
+    """Метрики источника за время жизни планировщика."""
+
+    runs: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    skipped_slots: int = 0
+    updated_pairs: int = 0
+    last_duration: float = 0.0
+    total_duration: float = 0.0
+    last_run_at: str | None = None
+    next_due_in: float = 0.0
+
+
+@dataclass
+class _State:
+    schedule: SourceSchedule
+    slot: float
+    stats: SourceStats = field(default_factory=SourceStats)
+    # повтор после ошибки: отдельный срок, плановый slot остаётся на сетке
+    retry_at: float | None = None
+
+    @property
+    def due(self) -> float:
+        return self.slot if self.retry_at is None else self.retry_at
+
+
+class RatesScheduler:
+    """Планировщик обновлений: своя сетка для каждого источника без дрейфа.
+
+    Плановое время следующего запуска считается от предыдущего планового, а не
+    от момента окончания, поэтому длительность обновления не сдвигает сетку.
+    После ошибки повтор идёт по отдельному сроку с экспоненциальной задержкой
+    (с джиттером) до max_backoff, а сетка источника не сдвигается.
+    """
+
+    def __init__(
+        self,
+        updater: RatesUpdater,
+        schedules: list[SourceSchedule],
+        history_size: int = 200,
+        state_path: str | None = None,
+        metrics_path: str | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        rng: random.Random | None = None,
+    ) -> None:
+        if not schedules:
+            raise ValueError("Нужно хотя бы одно расписание")
+        self.updater = updater
+        self.schedules = list(schedules)
+        self.history: deque[dict[str, Any]] = deque(maxlen=history_size)
+        self._state_path = state_path
+        self._metrics_path = metrics_path
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._stop = threading.Event()
+        self._states: list[_State] = []
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def install_signal_handlers(self) -> None:
+        """SIGTERM/SIGINT завершают цикл после текущего обновления."""
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: self.stop())
+
+    def metrics(self) -> dict[str, dict[str, Any]]:
+        return {st.schedule.name: asdict(st.stats) for st in self._states}
+
+    def _next_slot(self, st: _State, now: float) -> float:
+        sched = st.schedule
+        nxt = st.slot + sched.interval
+        if nxt > now or sched.missed_policy == "catch_up":
+            return nxt
+
+        missed = int((now - nxt) // sched.interval) + 1
+        aligned = nxt + missed * sched.interval
+        if sched.missed_policy == "run_once":
+            st.stats.skipped_slots += missed - 1
+            return aligned - sched.interval
+        st.stats.skipped_slots += missed
+        return aligned
+
+    def _slot_after(self, st: _State, now: float) -> float:
+        """Первое окно сетки позже now; окна, пропущенные за время повторов, не догоняются."""
+        sched = st.schedule
+        missed = int((now - st.slot) // sched.interval) + 1 if now >= st.slot else 0
+        st.stats.skipped_slots += max(0, missed - 1)
+        return st.slot + missed * sched.interval
+
+    def _backoff(self, st: _State) -> float:
+        sched = st.schedule
+        delay = min(sched.interval * (2 ** st.stats.consecutive_failures), sched.max_backoff)
+        return self._rng.uniform(delay / 2, delay)
+
+    def _run_one(self, st: _State) -> float:
+        sched = st.schedule
+        started = self._clock()
+        record: dict[str, Any] = {"source": sched.name, "started_at": utc_now_iso()}
+
+        try:
+            result = self.updater.run_update(source=sched.source)
+            failed = bool(result["errors"]) and result["updated_count"] == 0
+            record.update(
+                status="error" if failed else "ok",
+                updated_count=result["updated_count"],
+                errors=result["errors"],
+            )
+            st.stats.updated_pairs += result["updated_count"]
+        except Exception as e:
+            # ошибка хранилища (блокировка, конфликт версий, диск) не должна останавливать демон
+            failed = True
+            record.update(status="error", updated_count=0, errors=[f"{type(e).__name__}: {e}"])
+            logging.getLogger("valutatrade").exception("Обновление курсов (%s) завершилось ошибкой", sched.name)
+            MetricsRegistry().counter(
+                "valutatrade_scheduler_errors_total", "Планировщик: необработанные ошибки обновления"
+            ).inc(source=sched.name, error=type(e).__name__)
+
+        finished = self._clock()
+        duration = finished - started
+        record["duration"] = round(duration, 3)
+        self.history.append(record)
+
+        stats = st.stats
+        stats.runs += 1
+        stats.last_duration = duration
+        stats.total_duration += duration
+        stats.last_run_at = record["started_at"]
+
+        if failed:
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            st.retry_at = finished + self._backoff(st)
+            return st.due
+
+        stats.consecutive_failures = 0
+        if st.retry_at is not None:
+            # успешный повтор заменяет пропущенные окна: дальше — по исходной сетке
+            st.retry_at = None
+            st.slot = self._slot_after(st, finished)
+        else:
+            st.slot = self._next_slot(st, finished)
+        return st.due
+
+    def _save_state(self) -> None:
+        if self._state_path:
+            save_json(self._state_path, {"metrics": self.metrics(), "history": list(self.history)})
+        if self._metrics_path:
+            MetricsRegistry().export(self._metrics_path)
+
+    def run(self, max_runs: int | None = None) -> None:
+        """Блокирующий цикл до stop() или max_runs запусков."""
+        now = self._clock()
+        self._states = [
+            _State(sched, now + self._rng.uniform(0, sched.jitter))
+            for sched in self.schedules
+        ]
+        heap = [(st.slot, i) for i, st in enumerate(self._states)]
+        heapq.heapify(heap)
+        runs = 0
+
+        while not self._stop.is_set() and (max_runs is None or runs < max_runs):
+            due, i = heap[0]
+            wait_for = due - self._clock()
+            if wait_for > 0 and self._stop.wait(wait_for):
+                break
+
+            heapq.heappop(heap)
+            st = self._states[i]
+            nxt = self._run_one(st)
+            heapq.heappush(heap, (nxt, i))
+            runs += 1
+
+            now = self._clock()
+            for state in self._states:
+                state.stats.next_due_in = max(0.0, state.due - now)
+            self._save_state()
+
 
 def run_periodic(updater: RatesUpdater, interval_seconds: int) -> None:
     """Периодический запуск обновления."""
-    while True:
-        updater.run_update()
-        time.sleep(interval_seconds)
+    RatesScheduler(updater, [SourceSchedule(None, interval_seconds)]).run()
+
+
+def main(argv: list[str] | None = None) -> None:
+    from valutatrade_hub.infra.settings import SettingsLoader
+    from valutatrade_hub.logging_config import setup_logging
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.updater import build_updater
+
+    config = ParserConfig()
+    parser = argparse.ArgumentParser(description="Планировщик обновления курсов")
+    parser.add_argument("--coingecko", type=float, default=config.SCHEDULE_INTERVALS["coingecko"])
+    parser.add_argument("--exchangerate", type=float, default=config.SCHEDULE_INTERVALS["exchangerate"])
+    parser.add_argument("--jitter", type=float, default=config.SCHEDULE_JITTER_SECONDS)
+    parser.add_argument("--max-backoff", type=float, default=config.SCHEDULE_MAX_BACKOFF_SECONDS)
+    parser.add_argument("--missed", choices=MISSED_POLICIES, default=config.SCHEDULE_MISSED_POLICY)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    updater = build_updater(config)
+    schedules = [
+        SourceSchedule(source, interval, args.jitter, args.max_backoff, args.missed)
+        for source, interval in (("coingecko", args.coingecko), ("exchangerate", args.exchangerate))
+        if interval > 0
+    ]
+    scheduler = RatesScheduler(
+        updater,
+        schedules,
+        state_path=SettingsLoader().get("SCHEDULER_STATE_PATH"),
+        metrics_path=SettingsLoader().get("METRICS_PATH"),
+    )
+    scheduler.install_signal_handlers()
+    print("Планировщик запущен. Остановка: Ctrl+C или SIGTERM.")
+    scheduler.run()
+    print("Планировщик остановлен.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,26 @@
 from __future__ import annotations
 
-import json
-import os
+import logging
 from datetime import datetime, timezone
-from typing import Any
+from itertools import islice
+from operator import itemgetter
+from typing import Any, Iterator
 
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.metrics import timed
+from valutatrade_hub.infra.rates_cache import RatesCache
 from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.core.currencies import reload_registry
+from valutatrade_hub.parser_service.columnar import ColumnarHistory, HistoryColumns
+from valutatrade_hub.parser_service.history import HistoryLog, iter_history, record_key
+from valutatrade_hub.parser_service.registry import merge_registry
+from valutatrade_hub.parser_service.rollups import RollupStore, bars_from_records
+
+_IMPORT_BATCH = 10_000
+
+_logger = logging.getLogger("valutatrade")
+
+_rates_timed = timed("valutatrade_rates_storage", "Кеш и история курсов")
 
 
 class RatesStorage:
@@ -14,54 +29,157 @@ class RatesStorage:
     def __init__(self) -> None:
         settings = SettingsLoader()
         self._history_path = settings.get("EXCHANGE_RATES_HISTORY_PATH")
-        self._cache_path = settings.get("RATES_PATH")
-
-    def _atomic_write(self, path: str, data: Any) -> None:
-        tmp_path = f"{path}.tmp"
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        os.replace(tmp_path, path)
-
-    def _read_json(self, path: str, default: Any) -> Any:
-        if not os.path.exists(path):
-            return default
-        with open(path, "r", encoding="utf-8") as f:
-            try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return default
-
+        self._history = HistoryLog(
+            settings.get("EXCHANGE_RATES_HISTORY_DIR"),
+            int(settings.get("HISTORY_SEGMENT_BYTES", 8_000_000)),
+            float(settings.get("LOCK_TIMEOUT_SECONDS", 10.0)),
+        )
+        self._columns = ColumnarHistory(
+            settings.get("HISTORY_COLUMNS_DIR"),
+            float(settings.get("LOCK_TIMEOUT_SECONDS", 10.0)),
+        )
+        self._rollups = RollupStore(
+            settings.get("ROLLUPS_DIR"),
+            settings.get("ROLLUP_INTERVALS", ("1m", "1h", "1d")),
+            float(settings.get("LOCK_TIMEOUT_SECONDS", 10.0)),
+        )
+        self._db = DatabaseManager()
+        self._currencies_path = settings.get("CURRENCIES_PATH")
+        self._lock_timeout = float(settings.get("LOCK_TIMEOUT_SECONDS", 10.0))
+
+    def _import_legacy_history(self) -> None:
+        """Однократно переносит exchange_rates.json в сегментный журнал.
+
+        Журнал принимает тики пары только по возрастанию времени, а старый файл
+        не обязан быть упорядочен, поэтому записи сортируются по всему файлу
+        (разовая миграция: память — O(числа записей)) и пишутся порциями.
+        Повторы (пара, время), некорректные записи и битый хвост — в лог.
+        """
+        keyed: list[tuple[int, dict[str, Any]]] = []
+        seen: set[tuple[str, int]] = set()
+        invalid = duplicate = 0
+        try:
+            for rec in iter_history([self._history_path]):
+                try:
+                    key = record_key(rec)
+                except ValueError:
+                    invalid += 1
+                    continue
+                if key in seen:
+                    duplicate += 1
+                    continue
+                seen.add(key)
+                keyed.append((key[1], rec))
+        except ValueError as exc:
+            _logger.warning("%s: файл обрезан, перенесено прочитанное до ошибки (%s)", self._history_path, exc)
+        if invalid or duplicate:
+            _logger.warning(
+                "%s: пропущено некорректных записей: %d, повторов: %d", self._history_path, invalid, duplicate
+            )
+
+        keyed.sort(key=itemgetter(0))
+        records = (rec for _, rec in keyed)
+        while batch := list(islice(records, _IMPORT_BATCH)):
+            self._history.append(batch)
+
+    def iter_history(
+        self,
+        pair: str | None = None,
+        source: str | None = None,
+        since: int | None = None,
+        until: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """История курсов потоково (журнал, а до первого обновления — exchange_rates.json)."""
+        paths = self._history.segment_paths() if self._history.exists() else [self._history_path]
+        return iter_history(paths, pair=pair, source=source, since=since, until=until)
+
+    def _ensure_journal(self) -> None:
+        if not self._history.exists():
+            self._import_legacy_history()
+
+    def _seed_rollups(self) -> None:
+        """Бары по всей уже накопленной истории: первый запуск после появления баров."""
+        records = self._history.iter_records()
+        while batch := list(islice(records, _IMPORT_BATCH)):
+            self._rollups.update(batch)
+
+    @_rates_timed
     def append_history(self, records: list[dict]) -> None:
-        history: list[dict] = self._read_json(self._history_path, [])
-
-        existing_ids = {item["id"] for item in history if "id" in item}
-        new_records = [r for r in records if r["id"] not in existing_ids]
-
-        if not new_records:
-            return
-
-        history.extend(new_records)
-        self._atomic_write(self._history_path, history)
-
+        self._ensure_journal()
+        self._history.append(records)
+        self._columns.sync(self._history)
+
+    def open_columns(self) -> HistoryColumns:
+        """Колоночный снимок истории (mmap); закрывать после использования (with).
+
+        Колонки синхронизирует append_history, поэтому чтение обычно ничего
+        не пишет. Колонки догоняются здесь, только если отстали от журнала
+        (журнал дописал процесс без колонок), а до первого обновления история
+        один раз переносится в журнал из exchange_rates.json.
+        """
+        self._ensure_journal()
+        return self._columns.open(self._history)
+
+    @_rates_timed
+    def update_rollups(self, records: list[dict]) -> int:
+        """Обновляет OHLC-бары новыми тиками; возвращает число закрытых баров.
+
+        Если баров ещё нет, они строятся по всему журналу (в нём уже есть records).
+        """
+        if not self._rollups.exists():
+            self._ensure_journal()
+            self._seed_rollups()
+            return 0
+        return self._rollups.update(records)
+
+    @_rates_timed
+    def read_bars(
+        self,
+        pair: str,
+        interval: str,
+        since: int | None = None,
+        until: int | None = None,
+        limit: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Бары пары; только чтение.
+
+        Пока бары не засеяны (их строит update_rollups при обновлении курсов),
+        они считаются в памяти по истории пары — без записи журнала и баров.
+        """
+        if not self._rollups.exists():
+            if interval not in self._rollups.intervals:
+                raise ValueError(f"Интервал '{interval}' не ведётся, есть: {', '.join(self._rollups.intervals)}")
+            # бары с началом >= since содержат только тики >= since
+            records = self.iter_history(pair=pair, since=since)
+            return bars_from_records(records, pair, interval, since, until, limit)
+        return self._rollups.bars(pair, interval, since, until, limit)
+
+    @_rates_timed
     def read_cache(self) -> dict:
-        return self._read_json(
-            self._cache_path,
-            {"pairs": {}, "last_refresh": None},
-        )
+        cache = self._db.read_rates()
+        cache.setdefault("pairs", {})
+        cache.setdefault("last_refresh", None)
+        return cache
 
+    @_rates_timed
     def write_cache(self, pairs_update: dict[str, dict], refresh_ts: str) -> None:
-        cache = self.read_cache()
-        pairs = cache.get("pairs", {})
-
-        for pair, data in pairs_update.items():
-            current = pairs.get(pair)
-            if current is None or data["updated_at"] > current["updated_at"]:
-                pairs[pair] = data
-
-        cache["pairs"] = pairs
-        cache["last_refresh"] = refresh_ts
+        self._db.merge_rates(pairs_update, refresh_ts)
+        RatesCache().invalidate()
+
+    @_rates_timed
+    def touch_cache(self, pairs: list[str], refresh_ts: str) -> None:
+        """Отмечает пары, которые источник подтвердил без изменений, свежими на refresh_ts."""
+        self._db.touch_rates(pairs, refresh_ts)
+        RatesCache().invalidate()
+
+    @_rates_timed
+    def update_currencies(self, entries: dict[str, dict[str, Any]]) -> int:
+        """Пополняет файл реестра валют (CURRENCIES_PATH); возвращает число изменённых записей."""
+        changed = merge_registry(self._currencies_path, entries, self._lock_timeout)
+        if changed:
+            reload_registry()
+        return changed
 
-        self._atomic_write(self._cache_path, cache)
 
 def utc_now_iso() -> str:
     return (
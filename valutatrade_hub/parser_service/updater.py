@@ -1,10 +1,41 @@
 from __future__ import annotations
 
-from typing import Iterable
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Iterable
 
 from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.infra.metrics import MetricsRegistry, timed
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.resilience import client_name
 from valutatrade_hub.parser_service.storage import RatesStorage, utc_now_iso
 
+_logger = logging.getLogger("valutatrade")
+
+
+def _fetch(client: Any, deadline: float | None) -> tuple[dict[str, dict[str, Any]], bool, list[str]]:
+    """Ответ клиента, его not_modified и confirmed, прочитанные в том же потоке сразу после вызова."""
+    data = client.fetch_rates(deadline)
+    return data, bool(getattr(client, "not_modified", False)), list(getattr(client, "confirmed", []))
+
+
+def _fiat_last(clients: list, items: list) -> list:
+    """items в порядке клиентов, фиатные источники — последними: их данные перекрывают крипто."""
+    order = sorted(range(len(clients)), key=lambda i: getattr(clients[i], "ASSET_TYPE", "") == "fiat")
+    return [items[i] for i in order]
+
+
+def _record_fetch(client: Any, seconds: float, outcome: str) -> None:
+    registry = MetricsRegistry()
+    source = client_name(client)
+    registry.histogram("valutatrade_source_fetch_seconds", "Опрос источника курсов: длительность, с").observe(
+        seconds, source=source
+    )
+    registry.counter("valutatrade_source_fetch_total", "Опрос источника курсов: число запросов").inc(
+        source=source, result=outcome
+    )
+
 
 class RatesUpdater:
     """Оркестратор обновления курсов и сохранения истории."""
@@ -13,26 +44,101 @@ class RatesUpdater:
         self,
         clients: Iterable,
         storage: RatesStorage,
+        client_deadline: float | None = None,
+        refresh_deadline: float | None = None,
     ) -> None:
         self.clients = list(clients)
         self.storage = storage
+        self.client_deadline = client_deadline
+        self.refresh_deadline = refresh_deadline
 
-    def run_update(self, source: str | None = None) -> dict:
-        collected: dict[str, dict] = {}
-        history_records: list[dict] = []
+    def _deadline_for(self, client: Any, start: float) -> float | None:
+        client_limit = getattr(client, "deadline", None) or self.client_deadline
+        ends = [
+            start + limit
+            for limit in (client_limit, self.refresh_deadline)
+            if limit
+        ]
+        return min(ends, default=None)
 
-        errors: list[str] = []
+    def _fetch_all(
+        self, clients: list
+    ) -> tuple[list[dict[str, dict[str, Any]] | None], list[bool], list[str], list[str]]:
+        """Параллельный опрос клиентов; ждём не дольше дедлайнов, отставших бросаем.
 
-        for client in self.clients:
-            name = client.__class__.__name__.lower()
+        Дедлайн передаётся клиенту: его запросы ограничены оставшимся
+        временем, поэтому брошенный поток завершается вместе с дедлайном,
+        а его поздний ответ клиент отбрасывает, не меняя своё состояние.
+        Возвращает ответы, флаги not_modified, подтверждённые (304) пары и ошибки.
+        """
+        results: list[dict[str, dict[str, Any]] | None] = [None] * len(clients)
+        unchanged = [False] * len(clients)
+        confirmed: list[str] = []
+        errors: list[str | None] = [None] * len(clients)
+        if not clients:
+            return results, unchanged, confirmed, []
 
-            if source and source not in name:
-                continue
+        start = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=len(clients), thread_name_prefix="rates-fetch")
+        deadlines_by_client = [self._deadline_for(client, start) for client in clients]
+        futures: dict[Future, int] = {
+            executor.submit(_fetch, client, deadlines_by_client[i]): i for i, client in enumerate(clients)
+        }
+        deadlines = {fut: deadlines_by_client[i] for fut, i in futures.items()}
+        pending = set(futures)
+        try:
+            while pending:
+                limits = [deadlines[f] for f in pending if deadlines[f] is not None]
+                timeout = max(0.0, min(limits) - time.monotonic()) if limits else None
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for fut in done:
+                    i = futures[fut]
+                    try:
+                        results[i], unchanged[i], pairs = fut.result()
+                        confirmed.extend(pairs)
+                    except ApiRequestError as e:
+                        errors[i] = str(e)
+                    except Exception as e:
+                        # сбой одного источника (ошибка разбора, баг клиента) не должен
+                        # отменять ответы остальных: он учитывается как ошибка источника
+                        errors[i] = f"{client_name(clients[i])}: {type(e).__name__}: {e}"
+                        _logger.exception("Источник %s: непредвиденная ошибка", client_name(clients[i]))
+                    outcome = "error" if errors[i] else "not_modified" if unchanged[i] else "ok"
+                    _record_fetch(clients[i], time.monotonic() - start, outcome)
+
+                now = time.monotonic()
+                for fut in [f for f in pending if deadlines[f] is not None and deadlines[f] <= now]:
+                    pending.discard(fut)
+                    i = futures[fut]
+                    name = client_name(clients[i])
+                    errors[i] = str(ApiRequestError(f"{name}: нет ответа за {now - start:.1f} с (дедлайн)"))
+                    _record_fetch(clients[i], now - start, "deadline")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            try:
-                data = client.fetch_rates()
-            except ApiRequestError as e:
-                errors.append(str(e))
+        return results, unchanged, confirmed, [e for e in errors if e is not None]
+
+    @timed("valutatrade_updater", "Обновление курсов")
+    def run_update(self, source: str | None = None) -> dict:
+        collected: dict[str, dict] = {}
+        records_by_pair: dict[str, dict] = {}
+
+        clients = [
+            client for client in self.clients
+            if not source or source in client_name(client).lower()
+        ]
+        results, not_modified, confirmed, errors = self._fetch_all(clients)
+        unchanged = [
+            client_name(client)
+            for client, data, same in zip(clients, results, not_modified)
+            if data is not None and same
+        ]
+
+        # коллизия тикеров (пара есть у двух источников): курс фиатного источника
+        # побеждает независимо от порядка клиентов
+        for data in _fiat_last(clients, results):
+            if data is None:
                 continue
 
             for pair, payload in data.items():
@@ -42,27 +148,65 @@ class RatesUpdater:
                     "source": payload["source"],
                 }
 
-                history_records.append(
-                    {
-                        "id": f"{pair}_{payload['updated_at']}",
-                        "from_currency": pair.split("_")[0],
-                        "to_currency": pair.split("_")[1],
-                        "rate": payload["rate"],
-                        "timestamp": payload["updated_at"],
-                        "source": payload["source"],
-                        "meta": payload.get("meta", {}),
-                    }
-                )
+                records_by_pair[pair] = {
+                    "id": f"{pair}_{payload['updated_at']}",
+                    "from_currency": pair.split("_")[0],
+                    "to_currency": pair.split("_")[1],
+                    "rate": payload["rate"],
+                    "timestamp": payload["updated_at"],
+                    "source": payload["source"],
+                    "meta": payload.get("meta", {}),
+                }
+        history_records = list(records_by_pair.values())
+
+        discovered: dict[str, dict[str, Any]] = {}
+        for client in _fiat_last(clients, clients):
+            pop = getattr(client, "pop_discovered", None)
+            if callable(pop):
+                discovered.update(pop())
+        if discovered:
+            # реестр — раньше кеша: читатели не должны увидеть пару с неизвестной валютой
+            self.storage.update_currencies(discovered)
 
+        touched = sorted(set(confirmed) - set(collected))
+        refresh_ts = utc_now_iso() if collected or touched else None
+        registry = MetricsRegistry()
         if collected:
-            refresh_ts = utc_now_iso()
             self.storage.write_cache(collected, refresh_ts)
             self.storage.append_history(history_records)
-        else:
-            refresh_ts = None
+            self.storage.update_rollups(history_records)
+            registry.gauge("valutatrade_rates_updated_pairs", "Пар в последнем обновлении").set(len(collected))
+        if touched:
+            # 304: курс тот же — продлеваем только свежесть в кеше, без истории и баров
+            self.storage.touch_cache(touched, refresh_ts)
+        if refresh_ts is not None:
+            registry.gauge(
+                "valutatrade_rates_last_refresh_timestamp_seconds", "Время последнего обновления (unix)"
+            ).set(time.time())
 
         return {
             "updated_count": len(collected),
+            "confirmed_count": len(touched),
             "last_refresh": refresh_ts,
             "errors": errors,
+            "unchanged": unchanged,
         }
+
+
+def build_updater(config: ParserConfig | None = None) -> RatesUpdater:
+    """Стандартный набор источников с повторами и размыкателями."""
+    from valutatrade_hub.parser_service.api_clients import CoinGeckoClient, ExchangeRateApiClient
+    from valutatrade_hub.parser_service.resilience import wrap_hedged, wrap_resilient
+
+    config = config or ParserConfig()
+    sources = (CoinGeckoClient, ExchangeRateApiClient)
+    if config.HEDGE_REQUESTS:
+        clients = [wrap_hedged(source(config), source(config), config) for source in sources]
+    else:
+        clients = [wrap_resilient(source(config), config) for source in sources]
+    return RatesUpdater(
+        clients,
+        RatesStorage(),
+        client_deadline=config.CLIENT_DEADLINE_SECONDS,
+        refresh_deadline=config.REFRESH_DEADLINE_SECONDS,
+    )
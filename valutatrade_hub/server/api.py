@@ -0,0 +1,375 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import secrets
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Awaitable, Callable
+from urllib.parse import parse_qsl, urlsplit
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.exceptions import ApiRequestError, CurrencyNotFoundError, InsufficientFundsError
+from valutatrade_hub.core.utils import parse_time
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.locks import LockTimeoutError, VersionConflictError
+from valutatrade_hub.infra.metrics import MetricsRegistry
+from valutatrade_hub.infra.rates_cache import RatesCache
+from valutatrade_hub.infra.settings import SettingsLoader
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Строка запроса и каждый заголовок ограничены лимитом StreamReader (64 КиБ),
+# число заголовков — этой константой.
+_MAX_HEADERS = 100
+
+_logger = logging.getLogger("valutatrade")
+
+
+class HttpError(Exception):
+    """Ошибка запроса с HTTP-статусом."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class AuthRequiredError(HttpError):
+    def __init__(self) -> None:
+        super().__init__(401, "Нужен заголовок Authorization: Bearer <token> (POST /login)")
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: dict[str, str]
+    headers: dict[str, str]
+    body: bytes = b""
+
+    def json(self) -> dict[str, Any]:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise HttpError(400, f"Некорректный JSON: {e}") from None
+        if not isinstance(data, dict):
+            raise HttpError(400, "Тело запроса должно быть JSON-объектом")
+        return data
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+
+@dataclass
+class ApiSession:
+    user_id: int
+    username: str
+    created_at: float = field(default_factory=time.time)
+
+
+def error_status(exc: Exception) -> int:
+    """HTTP-статус для ошибки сценария.
+
+    4xx — только доменные ошибки и ValueError (неверные входные данные);
+    KeyError, TypeError и прочее — ошибка сервера (500).
+    """
+    if isinstance(exc, HttpError):
+        return exc.status
+    if isinstance(exc, InsufficientFundsError):
+        return 409
+    if isinstance(exc, CurrencyNotFoundError):
+        return 422
+    if isinstance(exc, (ApiRequestError, LockTimeoutError, VersionConflictError)):
+        return 503
+    if isinstance(exc, ValueError):
+        return 400
+    return 500
+
+
+def _required(data: dict[str, Any], *names: str) -> list[Any]:
+    missing = [name for name in names if data.get(name) in (None, "")]
+    if missing:
+        raise HttpError(400, f"Не хватает полей: {', '.join(missing)}")
+    return [data[name] for name in names]
+
+
+Handler = Callable[["ApiServer", Request], Awaitable[Any]]
+
+
+class ApiServer:
+    """Локальный JSON/HTTP API над сценариями core.usecases (asyncio, HTTP/1.1 keep-alive).
+
+    Процесс держит состояние в памяти: пользователей (UserRepository),
+    портфели (CachedStore со сквозной записью в DatabaseManager) и снимок
+    курсов (RatesCache). Сценарии выполняются в пуле потоков: хеширование
+    пароля, перечитывание users.json или снимка курсов и ожидание
+    блокировки документа не останавливают цикл событий.
+    """
+
+    def __init__(self, workers: int = 4, max_body: int = 1_000_000, session_ttl: float = 3600.0) -> None:
+        if session_ttl <= 0:
+            raise ValueError("SERVER_SESSION_TTL_SECONDS должен быть > 0")
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-worker")
+        self._max_body = max_body
+        self._session_ttl = session_ttl
+        self._clock: Callable[[], float] = time.time
+        # токены в порядке выдачи: при общем TTL истёкшие сессии — в начале словаря
+        self._sessions: dict[str, ApiSession] = {}
+        self._routes: dict[tuple[str, str], Handler] = {
+            ("GET", "/health"): ApiServer._health,
+            ("POST", "/register"): ApiServer._register,
+            ("POST", "/login"): ApiServer._login,
+            ("POST", "/logout"): ApiServer._logout,
+            ("GET", "/rate"): ApiServer._rate,
+            ("GET", "/portfolio"): ApiServer._portfolio,
+            ("POST", "/buy"): ApiServer._buy,
+            ("POST", "/sell"): ApiServer._sell,
+            ("POST", "/orders"): ApiServer._orders,
+        }
+        self._registry = MetricsRegistry()
+
+    def warm_up(self) -> None:
+        """Включает кеш портфелей и заранее загружает снимок курсов."""
+        DatabaseManager().enable_portfolio_cache()
+        RatesCache().snapshot()
+
+    async def _in_pool(self, func: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._pool, partial(func, *args))
+
+    def _evict_expired(self) -> None:
+        """Удаляет истёкшие сессии; амортизированно O(1) на вызов."""
+        deadline = self._clock() - self._session_ttl
+        while self._sessions:
+            token, session = next(iter(self._sessions.items()))
+            if session.created_at > deadline:
+                break
+            del self._sessions[token]
+
+    def _session(self, request: Request) -> ApiSession:
+        self._evict_expired()
+        auth = request.headers.get("authorization", "")
+        scheme, _, token = auth.partition(" ")
+        session = self._sessions.get(token.strip()) if scheme.lower() == "bearer" else None
+        if session is None:
+            raise AuthRequiredError()
+        return session
+
+    async def _health(self, request: Request) -> dict[str, Any]:
+        self._evict_expired()
+        return {"status": "ok", "sessions": len(self._sessions)}
+
+    async def _register(self, request: Request) -> dict[str, Any]:
+        username, password = _required(request.json(), "username", "password")
+        user_id, name = await self._in_pool(usecases.register_user, username, password)
+        return {"user_id": user_id, "username": name}
+
+    async def _login(self, request: Request) -> dict[str, Any]:
+        username, password = _required(request.json(), "username", "password")
+        user = await self._in_pool(usecases.login_user, username, password)
+        self._evict_expired()
+        token = secrets.token_urlsafe(24)
+        self._sessions[token] = ApiSession(user.user_id, user.username, self._clock())
+        return {
+            "token": token,
+            "user_id": user.user_id,
+            "username": user.username,
+            "expires_in": self._session_ttl,
+        }
+
+    async def _logout(self, request: Request) -> dict[str, Any]:
+        self._session(request)
+        token = request.headers["authorization"].partition(" ")[2].strip()
+        self._sessions.pop(token, None)
+        return {"logged_out": True}
+
+    async def _rate(self, request: Request) -> dict[str, Any]:
+        from_c, to_c = _required(request.query, "from", "to")
+        if request.query.get("at"):
+            at, mode = parse_time(request.query["at"]), request.query.get("mode", "last")
+            return await self._in_pool(usecases.get_rate_at, from_c, to_c, at, mode)
+        return await self._in_pool(usecases.get_rate, from_c, to_c)
+
+    async def _portfolio(self, request: Request) -> dict[str, Any]:
+        session = self._session(request)
+        return await self._in_pool(usecases.show_portfolio, session.user_id, request.query.get("base", "USD"))
+
+    async def _buy(self, request: Request) -> dict[str, Any]:
+        return await self._trade(request, usecases.buy_currency)
+
+    async def _sell(self, request: Request) -> dict[str, Any]:
+        return await self._trade(request, usecases.sell_currency)
+
+    async def _trade(self, request: Request, usecase: Callable[..., dict[str, str]]) -> dict[str, Any]:
+        session = self._session(request)
+        data = request.json()
+        currency, amount = _required(data, "currency", "amount")
+        return await self._in_pool(usecase, session.user_id, currency, amount, data.get("base", "USD"))
+
+    async def _orders(self, request: Request) -> dict[str, Any]:
+        session = self._session(request)
+        data = request.json()
+        (orders,) = _required(data, "orders")
+        mode = str(data.get("mode", "atomic")).lower()
+        if mode not in ("atomic", "partial"):
+            raise HttpError(400, "mode должен быть atomic или partial")
+        return await self._in_pool(usecases.execute_orders, session.user_id, orders, mode == "atomic")
+
+    async def dispatch(self, request: Request) -> tuple[int, dict[str, Any]]:
+        """Выполняет запрос; возвращает статус и тело ответа."""
+        handler = self._routes.get((request.method, request.path))
+        start = time.perf_counter()
+        try:
+            if handler is None:
+                allowed = [m for m, p in self._routes if p == request.path]
+                if allowed:
+                    raise HttpError(405, f"Метод {request.method} не поддерживается, есть: {', '.join(allowed)}")
+                raise HttpError(404, f"Неизвестный путь {request.path}")
+            status, body = 200, {"ok": True, "result": await handler(self, request)}
+        except Exception as e:
+            status = error_status(e)
+            message = str(e)
+            if status == 500:
+                _logger.exception("API %s %s: необработанная ошибка", request.method, request.path)
+                message = "Внутренняя ошибка сервера"
+            body = {"ok": False, "error": {"type": type(e).__name__, "message": message}}
+        self._registry.histogram("valutatrade_api_request_seconds", "Запросы API: длительность, с").observe(
+            time.perf_counter() - start, route=request.path if handler else "unknown", status=status
+        )
+        return status, body
+
+    @staticmethod
+    async def _readline(reader: asyncio.StreamReader, status: int, message: str) -> bytes:
+        """Строка заголовка запроса; длиннее лимита StreamReader — HttpError(status, message)."""
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):
+            raise HttpError(status, message) from None
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Request | None:
+        line = await self._readline(reader, 400, "Слишком длинная строка запроса")
+        if not line.strip():
+            return None
+        try:
+            method, target, _version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Некорректная строка запроса") from None
+
+        headers: dict[str, str] = {}
+        while True:
+            raw = await self._readline(reader, 431, "Слишком длинный заголовок")
+            if raw in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= _MAX_HEADERS:
+                raise HttpError(431, f"Больше {_MAX_HEADERS} заголовков")
+            name, _, value = raw.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        raw_length = headers.get("content-length", "0").strip() or "0"
+        if not (raw_length.isascii() and raw_length.isdigit()):
+            raise HttpError(400, f"Некорректный Content-Length: {raw_length!r}")
+        length = int(raw_length)
+        if length > self._max_body:
+            raise HttpError(413, f"Тело запроса больше {self._max_body} байт")
+        body = await reader.readexactly(length) if length > 0 else b""
+
+        url = urlsplit(target)
+        return Request(method.upper(), url.path.rstrip("/") or "/", dict(parse_qsl(url.query)), headers, body)
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, body: dict[str, Any], keep_alive: bool) -> None:
+        payload = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    self._write_response(writer, e.status, {"ok": False, "error": {"type": "HttpError", "message": str(e)}}, False)
+                    break
+                if request is None:
+                    break
+                status, body = await self.dispatch(request)
+                self._write_response(writer, status, body, request.keep_alive)
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str | None = None, port: int = 0, unix_path: str | None = None) -> None:
+        """Слушает TCP host:port или Unix-сокет до SIGINT/SIGTERM."""
+        if unix_path:
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+            where = unix_path
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            where = ", ".join(f"http://{s.getsockname()[0]}:{s.getsockname()[1]}" for s in server.sockets)
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        print(f"API-сервер слушает {where}. Остановка: Ctrl+C или SIGTERM.")
+        async with server:
+            await stop.wait()
+        self._pool.shutdown(wait=True)
+        print("API-сервер остановлен.")
+
+
+def main(argv: list[str] | None = None) -> None:
+    from valutatrade_hub.logging_config import setup_logging
+
+    settings = SettingsLoader()
+    parser = argparse.ArgumentParser(description="Локальный JSON/HTTP API ValutaTrade Hub")
+    parser.add_argument("--host", default=settings.get("SERVER_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=settings.get("SERVER_PORT", 8765))
+    parser.add_argument("--unix", help="путь Unix-сокета вместо TCP")
+    parser.add_argument("--workers", type=int, default=settings.get("SERVER_WORKERS", 4))
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    server = ApiServer(
+        args.workers,
+        int(settings.get("SERVER_MAX_BODY_BYTES", 1_000_000)),
+        float(settings.get("SERVER_SESSION_TTL_SECONDS", 3600.0)),
+    )
+    server.warm_up()
+    asyncio.run(server.serve(args.host, args.port, args.unix))
+
+
+if __name__ == "__main__":
+    main()